@@ -1,18 +1,22 @@
 import string
-from Encode import standard_encode
+from Encode import standard_encode, check_ciphertext, BINARY_TYPES, inverse_byte_table
 from Errors import InputError
+from Shard import Shardable
 import secrets
 import math
 
-class Affine:
+class Affine(Shardable):
     def __init__(self, a: int, b: int):
 
-        a = a % 26
-        b = b % 26
-
         if not isinstance(a, int) or not isinstance(b, int):
             raise InputError("The 'a' and 'b' values must be integers. Proper Usage: Affine(int a, int b)")
 
+        # Byte mode works mod 256, a is odd whenever it is invertible mod 26, so it is invertible mod 256 as well
+        self.__byte_encryption_key = bytes((a * byte + b) % 256 for byte in range(256))
+
+        a = a % 26
+        b = b % 26
+
         if math.gcd(26, a) != 1:
             raise InputError("Invalid 'a' value. 'a' must be invertible mod 26, i.e gcd(26, a) = 1, in order to be a valid key.")
 
@@ -25,15 +29,18 @@ class Affine:
 
         self.__encryption_key = str.maketrans(alphabet, shifted_alphabet)
         self.__decryption_key = str.maketrans(shifted_alphabet, alphabet)
+        self.__byte_decryption_key = inverse_byte_table(self.__byte_encryption_key)
 
     def changeKey(self, new_a: int, new_b: int) -> None:
 
-        new_a = new_a % 26
-        new_b = new_b % 26
-
         if not isinstance(new_a, int) or not isinstance(new_b, int):
             raise InputError("The 'a' and 'b' values must be integers. Proper Usage: Affine(int new_a, int new_b)")
 
+        byte_encryption_key = bytes((new_a * byte + new_b) % 256 for byte in range(256))
+
+        new_a = new_a % 26
+        new_b = new_b % 26
+
         if math.gcd(26, new_a) != 1:
             raise InputError("Invalid 'a' value. 'a' must be invertible mod 26, i.e gcd(26, a) = 1, in order to be a valid key.")
 
@@ -46,9 +53,14 @@ class Affine:
 
         self.__encryption_key = str.maketrans(alphabet, shifted_alphabet)
         self.__decryption_key = str.maketrans(shifted_alphabet, alphabet)
+        self.__byte_encryption_key = byte_encryption_key
+        self.__byte_decryption_key = inverse_byte_table(byte_encryption_key)
 
     def encrypt(self, plaintext: str) -> str:
 
+        if isinstance(plaintext, BINARY_TYPES):
+            return bytes(plaintext).translate(self.__byte_encryption_key)
+
         if not isinstance(plaintext, str):
             raise InputError("Plaintext must be a string. Proper Usage: obj.encrypt(string plaintext)")
 
@@ -56,15 +68,15 @@ class Affine:
 
     def decrypt(self, ciphertext: str) -> str:
 
-        if not isinstance(ciphertext, str):
-            raise InputError("Ciphertext must be a string. Proper Usage: obj.decrypt(string ciphertext)")
-        
-        for char in ciphertext:
-            if not char.isupper():
-                raise InputError("Ciphertext must strictly contain upper case letters. Proper Usage: obj.decrypt(string ciphertext)")
+        if isinstance(ciphertext, BINARY_TYPES):
+            return bytes(ciphertext).translate(self.__byte_decryption_key)
 
-        return ciphertext.translate(self.__decryption_key)
+        return check_ciphertext(ciphertext).translate(self.__decryption_key)
     
+    # Parallel hook, see Shard.Shardable
+    def _transform(self, text: str, offset: int, encrypt: bool) -> str:
+        return text.translate(self.__encryption_key if encrypt else self.__decryption_key)
+
     @staticmethod
     def generate_key() -> int:
         a = [1,3,5,7,9,11,15,17,19,21,23,25]
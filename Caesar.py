@@ -1,14 +1,18 @@
 import string
-from Encode import standard_encode
+from Encode import standard_encode, check_ciphertext, BINARY_TYPES, inverse_byte_table
 from Errors import InputError
+from Shard import Shardable
 import secrets
 
-class Caesar:
+class Caesar(Shardable):
     def __init__(self, shift):
 
         if not isinstance(shift, int):
             raise InputError("The Key/Shift must be an integer. Proper Usage: Caesar(int shift)")
 
+        self.__byte_encryption_key = bytes((byte + shift) % 256 for byte in range(256)) # Byte mode shifts mod 256
+        self.__byte_decryption_key = inverse_byte_table(self.__byte_encryption_key)
+
         shift = shift % 26
         alphabet = string.ascii_uppercase
         shifted_alphabet = alphabet[shift:] + alphabet[:shift]
@@ -20,6 +24,9 @@ class Caesar:
         if not isinstance(newShift, int):
             raise InputError("The Key/Shift must be an integer. Proper Usage: obj.changeKey(int newShift)")
 
+        self.__byte_encryption_key = bytes((byte + newShift) % 256 for byte in range(256))
+        self.__byte_decryption_key = inverse_byte_table(self.__byte_encryption_key)
+
         newShift = newShift % 26
         alphabet = string.ascii_uppercase
         shifted_alphabet = alphabet[newShift:] + alphabet[:newShift]
@@ -28,6 +35,9 @@ class Caesar:
 
     def encrypt(self, plaintext: str) -> str:
 
+        if isinstance(plaintext, BINARY_TYPES):
+            return bytes(plaintext).translate(self.__byte_encryption_key)
+
         if not isinstance(plaintext, str):
             raise InputError("Plaintext must be a string. Proper Usage: obj.encrypt(string plaintext)")
 
@@ -35,16 +45,15 @@ class Caesar:
 
     def decrypt(self, ciphertext: str) -> str:
 
-        if not isinstance(ciphertext, str):
-            raise InputError("Ciphertext must be a string. Proper Usage: obj.decrypt(string ciphertext)")
-        
-        for char in ciphertext:
-            if not char.isupper():
-                raise InputError("Ciphertext must strictly contain upper case letters. Proper Usage: obj.decrypt(string ciphertext)")
+        if isinstance(ciphertext, BINARY_TYPES):
+            return bytes(ciphertext).translate(self.__byte_decryption_key)
 
-
-        return ciphertext.translate(self.__decryption_key)
+        return check_ciphertext(ciphertext).translate(self.__decryption_key)
     
+    # Parallel hook, see Shard.Shardable
+    def _transform(self, text: str, offset: int, encrypt: bool) -> str:
+        return text.translate(self.__encryption_key if encrypt else self.__decryption_key)
+
     @staticmethod
     def generate_key() -> int:
         return secrets.randbelow(26)
\ No newline at end of file
@@ -0,0 +1,285 @@
+from Encode import is_encoded, letter_values
+from Errors import InputError
+from Cryptanalysis import AFFINE_INDEX, LOG_FREQUENCIES, check_attack_ciphertext, break_caesar, break_affine, break_vigenere
+from Solvers import check_table, quadgram_codes, break_substitution, break_playfair, break_hill, break_transposition
+import numpy as np
+
+CIPHERS = ("Caesar", "Affine", "SimpleSubstitution", "Vigenere", "OTP", "Hill", "Playfair", "RectangularTransposition")
+MAX_PERIOD = 32 # the longest Vigenere key the periodic profile looks for
+MIN_COLUMN_LENGTH = 8 # letters per column needed to use a period in the profile, shorter columns are too noisy
+HILL_DIMS = (2, 3, 4, 5, 6)
+BATCH_LETTERS = 2 ** 16 # letters per batch, counting every text as long as the longest, bounds the one hot letters
+
+FEATURES = ("length", "coincidence", "periodic_coincidence", "period", "entropy", "has_j", "doubled_digraphs",
+            "identity_fit", "caesar_fit", "affine_fit", "repeated_blocks", "block") + tuple("divisible_" + str(dim) for dim in HILL_DIMS)
+
+# Column k is the log likelihood weight of every ciphertext letter under Affine key k (key 0 is the identity, keys 0-25 the
+# Caesar shifts), so the log likelihoods of all 312 keys are one product with the letter counts
+_AFFINE_WEIGHTS = np.zeros((26, len(AFFINE_INDEX)))
+_AFFINE_WEIGHTS[AFFINE_INDEX, np.arange(len(AFFINE_INDEX))[:, None]] = LOG_FREQUENCIES
+_SORTED_LOG_FREQUENCIES = np.sort(LOG_FREQUENCIES)[::-1]
+
+def _check_ciphertexts(ciphertexts: list) -> list:
+
+    if isinstance(ciphertexts, str) or not all(isinstance(ciphertext, str) for ciphertext in ciphertexts):
+        raise InputError("Ciphertexts must be a list of strings. Proper Usage: classify(list ciphertexts)")
+
+    joined = ''.join(ciphertexts) # one check for the whole batch
+    if not joined.isascii() or not is_encoded(joined) or not all(ciphertexts):
+        raise InputError("Every ciphertext must be a non empty string of the upper case letters A-Z.")
+
+    return list(ciphertexts)
+
+def _batch_features(ciphertexts: list) -> np.ndarray:
+
+    lengths = np.array([len(ciphertext) for ciphertext in ciphertexts])
+    count = len(ciphertexts)
+    values = letter_values(''.join(ciphertexts)).astype(np.int64)
+    owner = np.repeat(np.arange(count), lengths)
+    starts = np.cumsum(lengths) - lengths
+    positions = np.arange(len(values)) - starts[owner] # position of every letter within its own text
+    features = np.zeros((count, len(FEATURES)))
+    column = {name: i for i, name in enumerate(FEATURES)}
+
+    counts = np.bincount(owner * 26 + values, minlength=count * 26).reshape(count, 26)
+    pairs = np.maximum(lengths * (lengths - 1), 1)
+    features[:, column["length"]] = lengths
+    features[:, column["coincidence"]] = 26 * (counts * (counts - 1)).sum(axis=1) / pairs
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        shares = counts / lengths[:, None]
+        features[:, column["entropy"]] = -np.where(counts > 0, shares * np.log2(shares), 0).sum(axis=1)
+
+    # Index of coincidence of the text split into p columns, for every period p whose columns are long enough. The period kept
+    # is the one furthest above random text in standard errors, rather than the highest profile: short columns are noisy, and
+    # the multiples of a key length match it with fewer pairs. The letters are one hot rows of a (position, letter, text)
+    # array, so the counts of a period are a sum of its consecutive slices of period rows. The periods run down from the
+    # longest: the columns of period p are the columns of period 2p taken in two halves, so only the periods above
+    # MAX_PERIOD / 2 sum the letters, the rest add up counts already made
+    longest = min(MAX_PERIOD, lengths.max() // MIN_COLUMN_LENGTH)
+    matches = np.zeros((MAX_PERIOD + 1, count)) # the sum of c * (c - 1) over the cells of every period
+    if longest >= 2:
+        span = lengths.max() + longest # room to round the rows up to a multiple of any period
+        onehot = np.zeros((span, 26, count), dtype=np.uint8)
+        onehot.reshape(-1)[(positions * 26 + values) * count + owner] = 1
+    exact = np.float32 if lengths.max() < 2 ** 12 else float # float32 holds the sums of squares, up to length ** 2, exactly
+    column_counts = {}
+    for period in range(longest, 1, -1):
+        rows = -(-lengths.max() // period) # letters per column of the longest text, the counts can reach it
+        if 2 * period <= longest:
+            halves = column_counts.pop(2 * period)
+            cells = np.add(halves[:period], halves[period:], dtype=np.min_scalar_type(rows))
+        else:
+            cells = onehot[:rows * period].reshape(rows, period, 26, count).sum(axis=0, dtype=np.min_scalar_type(rows))
+        if period % 2 == 0:
+            column_counts[period] = cells
+        cells = cells.astype(exact) # much faster to square and sum than integers
+        matches[period] = np.einsum('ijk,ijk->k', cells, cells) - lengths
+
+    periods = np.arange(2, MAX_PERIOD + 1)[:, None]
+    rows, extra = lengths // periods, lengths % periods # extra columns have one more letter
+    column_pairs = np.maximum(extra * (rows + 1) * rows + (periods - extra) * rows * (rows - 1), 1)
+    profiles = 26 * matches[2:] / column_pairs
+    significance = (profiles - 1) * np.sqrt(column_pairs / 50) # 50 / pairs is the random variance
+    significance[lengths < periods * MIN_COLUMN_LENGTH] = -np.inf
+    best = significance.argmax(axis=0) # on a tie the shorter period wins
+    usable = lengths >= 2 * MIN_COLUMN_LENGTH
+    features[:, column["periodic_coincidence"]] = np.where(usable, profiles[best, np.arange(count)], 0)
+    features[:, column["period"]] = np.where(usable, best + 2, 0)
+
+    features[:, column["has_j"]] = counts[:, 9] > 0
+    following = np.append(owner[1:] == owner[:-1], False) # the next letter is in the same text
+    doubled = (positions % 2 == 0) & following & np.append(values[1:] == values[:-1], False)
+    features[:, column["doubled_digraphs"]] = np.bincount(owner[doubled], minlength=count)
+
+    # Log likelihood per letter of the identity, the best Caesar shift and the best Affine key, relative to the best any
+    # substitution could reach (the most common letter as E, the next as T, ...), so 0 is a perfect fit
+    likelihoods = counts @ _AFFINE_WEIGHTS
+    bound = np.sort(counts, axis=1)[:, ::-1] @ _SORTED_LOG_FREQUENCIES
+    features[:, column["identity_fit"]] = (likelihoods[:, 0] - bound) / lengths
+    features[:, column["caesar_fit"]] = (likelihoods[:, :26].max(axis=1) - bound) / lengths
+    features[:, column["affine_fit"]] = (likelihoods.max(axis=1) - bound) / lengths
+
+    # Repeats among the blocks of dim letters (aligned to the start of the text), in standard errors above the repeats of random
+    # blocks (or simply the excess repeats, when fewer than one is expected), for the dims that divide the length. A block
+    # cipher sends equal plaintext blocks to equal ciphertext blocks, which a stream of key letters does not
+    best_excess = np.full(count, -np.inf)
+    best_dim = np.zeros(count)
+    for dim in HILL_DIMS:
+        divisible = lengths % dim == 0
+        features[:, column["divisible_" + str(dim)]] = divisible
+        if not divisible.any():
+            continue
+        letters = slice(None) if divisible.all() else divisible[owner] # a slice takes views, not copies
+        digits = values[letters].reshape(-1, dim)
+        block_owner = owner[letters][::dim]
+        keys = block_owner.copy() # the owner, then the block letters, as digits base 26
+        for i in range(dim):
+            keys *= 26
+            keys += digits[:, i]
+        keys.sort() # equal blocks of the same text end up next to each other
+        repeats = np.bincount(keys[1:][keys[1:] == keys[:-1]] // 26 ** dim, minlength=count)
+        blocks = np.bincount(block_owner, minlength=count)
+        expected = blocks + 26 ** dim * np.expm1(blocks * np.log1p(-1 / 26 ** dim)) # repeats among random blocks
+        excess = np.where(divisible, (repeats - expected) / np.sqrt(np.maximum(expected, 1)), -np.inf)
+        better = excess > best_excess
+        best_excess[better], best_dim[better] = excess[better], dim
+    features[:, column["repeated_blocks"]] = np.maximum(best_excess, 0)
+    features[:, column["block"]] = best_dim
+
+    return features
+
+def features(ciphertexts: list) -> np.ndarray:
+    """
+
+    Extracts the statistical features of many ciphertexts at once. The texts are sorted by length and split into batches of
+    about BATCH_LETTERS letters, and every feature of a batch is computed for all of its texts together, with counts keyed by
+    text, so there is no per text loop.
+
+    @param: ciphertexts - a list of strings of the upper case letters A-Z.
+
+    @return: A float array of shape (len(ciphertexts), len(FEATURES)), one row per ciphertext and one column per entry of
+             FEATURES. The coincidences are normalized (26 * IoC, about 1.0 for random text and 1.73 for English), the entropy
+             is in bits, the fits are log likelihoods per letter (0 for a perfect fit), and repeated_blocks is in standard
+             errors above random text.
+
+    """
+
+    ciphertexts = _check_ciphertexts(ciphertexts)
+    table = np.zeros((len(ciphertexts), len(FEATURES)))
+
+    # The batches take the texts from the shortest up, so every batch holds texts of about the same length
+    order = np.argsort([len(ciphertext) for ciphertext in ciphertexts], kind='stable')
+    lengths = np.array([len(ciphertexts[i]) for i in order])
+    start = 0
+    while start < len(order):
+        size = max(np.count_nonzero(np.arange(1, len(order) - start + 1) * lengths[start:] <= BATCH_LETTERS), 1)
+        batch = order[start:start + size]
+        table[batch] = _batch_features([ciphertexts[i] for i in batch])
+        start += size
+
+    return table
+
+# Decision thresholds of classify, see features
+MONOALPHABETIC_COINCIDENCE = 1.55 # English is about 1.73, a single substitution keeps it
+PERIODIC_COINCIDENCE = 1.5 # the columns of a Vigenere ciphertext at its key length are single substitutions
+FIT = -0.15 # log likelihood per letter, from 0, of a key that explains the letter frequencies
+REPEATED_BLOCKS = 3
+
+def _classify_features(table: np.ndarray) -> list:
+
+    column = {name: i for i, name in enumerate(FEATURES)}
+    feature = lambda name: table[:, column[name]]
+
+    guesses = np.full(len(table), "OTP", dtype=object)
+    guesses[feature("repeated_blocks") >= REPEATED_BLOCKS] = "Hill"
+    guesses[feature("periodic_coincidence") >= PERIODIC_COINCIDENCE] = "Vigenere"
+
+    # A single substitution is Transposition if no Affine key beats the identity (even a poor fit, the padding skews it), Caesar
+    # or Affine if the best key explains the frequencies, and SimpleSubstitution otherwise
+    monoalphabetic = feature("coincidence") >= MONOALPHABETIC_COINCIDENCE
+    identity = feature("identity_fit") >= feature("affine_fit")
+    explained = (feature("affine_fit") >= FIT) | identity
+    guesses[monoalphabetic] = "SimpleSubstitution"
+    guesses[monoalphabetic & explained] = "Affine"
+    guesses[monoalphabetic & explained & (feature("caesar_fit") >= feature("affine_fit"))] = "Caesar"
+    guesses[monoalphabetic & identity] = "RectangularTransposition"
+
+    # Playfair never encrypts to J, has an even length, and never has two equal letters in a pair (a single substitution can
+    # happen to have that shape too, unless a key explains it)
+    shaped = (feature("has_j") == 0) & (feature("doubled_digraphs") == 0) & (feature("divisible_2") == 1)
+    guesses[shaped & ~(monoalphabetic & explained)] = "Playfair"
+
+    return guesses.tolist()
+
+def classify(ciphertexts: list) -> list:
+    """
+
+    Guesses which of the ciphers of this project produced each ciphertext, from its features. Later rules override earlier ones:
+    random looking text is OTP, unless its aligned blocks repeat (Hill), or it splits into columns with the coincidence of English
+    (Vigenere). Text with the coincidence of English is a single substitution: Transposition if no Affine key beats the identity,
+    Caesar or Affine if one of their keys explains the frequencies, SimpleSubstitution otherwise. Finally, text shaped like a
+    Playfair ciphertext is Playfair.
+
+    @param: ciphertexts - a list of strings of the upper case letters A-Z, a few hundred letters each for reliable guesses.
+
+    @return: A list of the guessed cipher of every ciphertext, each an entry of CIPHERS.
+
+    On one core this handles about 25,000 texts of 300 letters per second. Most of the time goes into the periodic profile,
+    which sums the letters once for each period above MAX_PERIOD / 2; texts too short for the longer periods skip them.
+
+    """
+
+    return _classify_features(features(ciphertexts))
+
+def break_ciphertext(ciphertext: str, table: np.ndarray, cipher: str = None) -> tuple:
+    """
+
+    Breaks a ciphertext of unknown origin: guesses its cipher with classify (unless given), then runs the matching attack from
+    Cryptanalysis or Solvers with their default settings. Transposition is attacked in both modes, keeping the one whose plaintext
+    scores better. Hill is only attacked when its repeated blocks are 2 letters long, break_hill searches 2x2 keys only: for any
+    other block size the key and plaintext are None, as for OTP.
+
+    @param: ciphertext - a string of the upper case letters A-Z.
+    @param: table - the quadgram log probabilities, see Solvers.quadgram_table.
+    @param: cipher - the cipher, an entry of CIPHERS, or None to guess it.
+
+    @return: A tuple (cipher, key, plaintext). The key is usable with the cipher's constructor: (a, b) for Affine, a (key, mode)
+             pair for RectangularTransposition. An OTP ciphertext cannot be broken on its own, its key and plaintext are None.
+
+    """
+
+    ciphertext = check_attack_ciphertext(ciphertext)
+    table = check_table(table, 26 ** 4)
+    if cipher is not None and cipher not in CIPHERS:
+        raise InputError("Unknown cipher " + repr(cipher) + ". Supported: " + ", ".join(CIPHERS))
+
+    row = features([ciphertext])
+    if cipher is None:
+        cipher = _classify_features(row)[0]
+
+    return _break(ciphertext, table, cipher, row[0, FEATURES.index("block")])
+
+def _break(ciphertext: str, table: np.ndarray, cipher: str, block: int) -> tuple:
+
+    if cipher == "Caesar":
+        ranking, plaintext = break_caesar(ciphertext)
+        return cipher, ranking[0][0], plaintext
+    if cipher == "Affine":
+        ranking, plaintext = break_affine(ciphertext)
+        return cipher, ranking[0][0], plaintext
+    if cipher == "SimpleSubstitution":
+        return (cipher,) + break_substitution(ciphertext, table)
+    if cipher == "Vigenere":
+        return (cipher,) + break_vigenere(ciphertext)
+    if cipher == "Hill" and block == 2:
+        return (cipher,) + break_hill(ciphertext, table)
+    if cipher == "Playfair":
+        return (cipher,) + break_playfair(ciphertext, table)
+    if cipher == "RectangularTransposition":
+        candidates = []
+        for mode in ("rows", "columnar"):
+            key, plaintext = break_transposition(ciphertext, table, mode)
+            candidates.append((float(table[quadgram_codes(letter_values(plaintext))].sum()), (key, mode), plaintext))
+        _, key, plaintext = max(candidates, key=lambda candidate: candidate[0])
+        return cipher, key, plaintext
+
+    return cipher, None, None # OTP, or Hill with blocks longer than 2
+
+def break_ciphertexts(ciphertexts: list, table: np.ndarray) -> list:
+    """
+
+    Classifies a batch of ciphertexts in one pass, then breaks each as break_ciphertext does.
+
+    @param: ciphertexts - a list of strings of the upper case letters A-Z.
+    @param: table - the quadgram log probabilities, see Solvers.quadgram_table.
+
+    @return: A list of the (cipher, key, plaintext) tuples of the ciphertexts, see break_ciphertext.
+
+    """
+
+    rows = features(ciphertexts)
+    table = check_table(table, 26 ** 4)
+    blocks = rows[:, FEATURES.index("block")]
+
+    return [_break(ciphertext, table, cipher, block) for ciphertext, cipher, block in zip(ciphertexts, _classify_features(rows), blocks)]
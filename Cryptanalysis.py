@@ -0,0 +1,348 @@
+from Encode import standard_encode, is_encoded, letter_values
+from Errors import InputError
+from Caesar import Caesar
+from Affine import Affine
+from Vigenere import Vigenere
+from Hill import solve_mod_prime, inverse_mod_26
+import numpy as np
+
+# Relative frequencies of the letters A-Z in English text
+ENGLISH_FREQUENCIES = np.array([0.08167, 0.01492, 0.02782, 0.04253, 0.12702, 0.02228, 0.02015, 0.06094, 0.06966,
+                                0.00153, 0.00772, 0.04025, 0.02406, 0.06749, 0.07507, 0.01929, 0.00095, 0.05987,
+                                0.06327, 0.09056, 0.02758, 0.00978, 0.02360, 0.00150, 0.01974, 0.00074])
+ENGLISH_FREQUENCIES = ENGLISH_FREQUENCIES / ENGLISH_FREQUENCIES.sum()
+LOG_FREQUENCIES = np.log(ENGLISH_FREQUENCIES)
+
+METHODS = ("chi_squared", "log_likelihood")
+AFFINE_MULTIPLIERS = np.array([1, 3, 5, 7, 9, 11, 15, 17, 19, 21, 23, 25]) # the values of 'a' invertible mod 26
+
+# _SHIFT_INDEX[k, p] is the ciphertext letter that a shift of k turns the plaintext letter p into. Indexing the letter counts of a
+# ciphertext with it gives the letter counts of the plaintext under every one of the 26 shifts, without decrypting anything.
+_SHIFT_INDEX = (np.arange(26)[:, None] + np.arange(26)[None, :]) % 26
+
+# The same for the 312 Affine keys, row 26 * i + b holds the key (AFFINE_MULTIPLIERS[i], b)
+AFFINE_INDEX = ((AFFINE_MULTIPLIERS[:, None, None] * np.arange(26)[None, None, :] + np.arange(26)[None, :, None]) % 26).reshape(-1, 26)
+
+def check_attack_ciphertext(ciphertext: str) -> str:
+    """
+
+    Validates the ciphertext of an attack, the shared check of this module, Solvers, TwoTimePad and Classifier.
+
+    @param: ciphertext - the ciphertext to be checked.
+
+    @return: The ciphertext, if it is a non empty string of the upper case letters A-Z, otherwise an InputError is raised.
+
+    """
+
+    if not isinstance(ciphertext, str):
+        raise InputError("Ciphertext must be a string. Proper Usage: break_caesar(string ciphertext)")
+
+    if not ciphertext.isascii() or not is_encoded(ciphertext) or not ciphertext:
+        raise InputError("Ciphertext must be a non empty string of the upper case letters A-Z.")
+
+    return ciphertext
+
+def _check_method(method: str) -> None:
+
+    if method not in METHODS:
+        raise InputError("Unknown scoring method " + repr(method) + ". Supported: " + ", ".join(METHODS))
+
+def letter_counts(text: str) -> np.ndarray:
+    """
+
+    Counts the letters of an encoded text.
+
+    @param: text - a string of the upper case letters A-Z.
+
+    @return: An array of the 26 letter counts, A first.
+
+    """
+
+    return np.bincount(letter_values(text), minlength=26)
+
+def score_counts(observed: np.ndarray, method: str = "chi_squared") -> np.ndarray:
+    """
+
+    Scores letter counts against English, for any number of candidate plaintexts at once.
+
+    @param: observed - an array of shape (..., 26), the letter counts of each candidate plaintext.
+    @param: method - "chi_squared" (the chi-squared statistic, lower is better) or "log_likelihood" (higher is better).
+
+    @return: An array of shape (...), the score of every candidate.
+
+    """
+
+    _check_method(method)
+    if method == "log_likelihood":
+        return observed @ LOG_FREQUENCIES
+
+    expected = observed.sum(axis=-1, keepdims=True) * ENGLISH_FREQUENCIES
+    return (((observed - expected) ** 2) / expected).sum(axis=-1)
+
+def rank_scores(scores: np.ndarray, method: str) -> np.ndarray:
+    """
+
+    Orders candidates by their scores from score_counts.
+
+    @param: scores - the scores of the candidates.
+    @param: method - the scoring method that produced them, see score_counts.
+
+    @return: The indices of the candidates, best first. Ties keep their order.
+
+    """
+
+    return np.argsort(scores if method == "chi_squared" else -scores, kind='stable')
+
+def break_caesar(ciphertext: str, method: str = "chi_squared") -> tuple:
+    """
+
+    Ciphertext only attack on Caesar. The ciphertext is counted once, then all 26 shifts are scored with a single gather, so the
+    cost is O(len(ciphertext) + 26 * 26).
+
+    @param: ciphertext - a Caesar ciphertext.
+    @param: method - the scoring method, see score_counts.
+
+    @return: A tuple (ranking, plaintext), where ranking is a list of (shift, score) pairs, best first, and plaintext is the
+             decryption under the best shift.
+
+    """
+
+    _check_method(method)
+    ciphertext = check_attack_ciphertext(ciphertext)
+
+    scores = score_counts(letter_counts(ciphertext)[_SHIFT_INDEX], method)
+    order = rank_scores(scores, method)
+    ranking = [(int(shift), float(scores[shift])) for shift in order]
+
+    return ranking, Caesar(ranking[0][0]).decrypt(ciphertext)
+
+def break_affine(ciphertext: str, method: str = "chi_squared") -> tuple:
+    """
+
+    Ciphertext only attack on Affine, scoring all 312 keys at once like break_caesar.
+
+    @param: ciphertext - an Affine ciphertext.
+    @param: method - the scoring method, see score_counts.
+
+    @return: A tuple (ranking, plaintext), where ranking is a list of ((a, b), score) pairs, best first, and plaintext is the
+             decryption under the best key.
+
+    """
+
+    _check_method(method)
+    ciphertext = check_attack_ciphertext(ciphertext)
+
+    scores = score_counts(letter_counts(ciphertext)[AFFINE_INDEX], method)
+    order = rank_scores(scores, method)
+    ranking = [((int(AFFINE_MULTIPLIERS[key // 26]), int(key % 26)), float(scores[key])) for key in order]
+
+    return ranking, Affine(*ranking[0][0]).decrypt(ciphertext)
+
+DEFAULT_MAX_PERIOD = 200
+ENGLISH_COINCIDENCE = 26 * (ENGLISH_FREQUENCIES ** 2).sum() # 26 * IoC of English, about 1.73
+SIGNIFICANCE = 4 # standard errors, there are a few hundred periods to compare
+MIN_COLUMN_LENGTH = 40 # letters per column needed to prefer a multiple of the best period
+PERIOD_SAMPLE = 1 << 16 # key lengths are estimated from (at most) this many letters, the key itself is recovered from all of them
+
+def _period_sample(ciphertext: str, max_period: int) -> tuple:
+
+    if not isinstance(max_period, int) or max_period < 1:
+        raise InputError("max_period must be a positive integer.")
+
+    values = letter_values(check_attack_ciphertext(ciphertext)[:PERIOD_SAMPLE]).astype(np.int64)
+    return values, min(max_period, max(len(values) // 2, 1)) # every column needs at least two letters
+
+def _coincidences(values: np.ndarray, max_period: int) -> tuple:
+
+    positions = np.arange(len(values))
+    profile = np.zeros(max_period + 1)
+    pairs = np.zeros(max_period + 1)
+
+    for period in range(1, max_period + 1):
+        counts = np.bincount((positions % period) * 26 + values, minlength=period * 26)
+        lengths = np.bincount(positions % period, minlength=period)
+        pairs[period] = (lengths * (lengths - 1)).sum()
+        profile[period] = 26 * (counts * (counts - 1)).sum() / pairs[period] if pairs[period] else 0
+
+    return profile, pairs
+
+def _repeat_distances(values: np.ndarray) -> np.ndarray:
+
+    if len(values) < 3:
+        return np.zeros(0, dtype=np.int64)
+
+    trigrams = values[:-2] * 676 + values[1:-1] * 26 + values[2:]
+    order = np.argsort(trigrams, kind='stable') # positions of equal trigrams end up next to each other, in increasing order
+    repeated = trigrams[order[1:]] == trigrams[order[:-1]]
+    return (order[1:] - order[:-1])[repeated]
+
+def _kasiski(distances: np.ndarray, max_period: int) -> np.ndarray:
+
+    profile = np.zeros(max_period + 1)
+    if len(distances):
+        periods = np.arange(1, max_period + 1)
+        profile[1:] = (distances[None, :] % periods[:, None] == 0).mean(axis=1) * periods
+    return profile
+
+def coincidence_profile(ciphertext: str, max_period: int = DEFAULT_MAX_PERIOD) -> np.ndarray:
+    """
+
+    Index of coincidence of the ciphertext split into p columns, for every candidate key length p. Each period takes one bincount
+    over (column, letter) pairs.
+
+    @param: ciphertext - a string of the upper case letters A-Z.
+    @param: max_period - the longest key length to consider.
+
+    @return: An array where entry p is the normalized index of coincidence (26 * IoC) for key length p, about 1.0 for random
+             text and 1.73 for English. Entry 0 is unused.
+
+    """
+
+    return _coincidences(*_period_sample(ciphertext, max_period))[0]
+
+def kasiski_profile(ciphertext: str, max_period: int = DEFAULT_MAX_PERIOD) -> np.ndarray:
+    """
+
+    Kasiski examination: finds the distances between consecutive repeats of every trigram (by sorting the trigram codes), then
+    counts how many of them every candidate key length divides.
+
+    @param: ciphertext - a string of the upper case letters A-Z.
+    @param: max_period - the longest key length to consider.
+
+    @return: An array where entry p is the share of repeat distances divisible by p, times p, so about 1.0 if the repeats are
+             chance. Entry 0 is unused.
+
+    """
+
+    values, max_period = _period_sample(ciphertext, max_period)
+    return _kasiski(_repeat_distances(values), max_period)
+
+def estimate_key_length(ciphertext: str, max_period: int = DEFAULT_MAX_PERIOD) -> int:
+    """
+
+    Estimates the length of a Vigenere key, combining coincidence_profile and kasiski_profile. Both profiles are turned into
+    z-scores (their excess over chance divided by its standard error), which mostly breaks the tie between the key length and its
+    multiples: a multiple scores the same excess, but from fewer letter pairs per column and fewer divisible distances. Periods
+    whose columns are not close to English are then ruled out, see below.
+
+    @param: ciphertext - a Vigenere ciphertext.
+    @param: max_period - the longest key length to consider.
+
+    @return: The estimated key length.
+
+    """
+
+    values, max_period = _period_sample(ciphertext, max_period)
+    periods = np.arange(1, max_period + 1)
+
+    # For random text, 26 * IoC has a standard error of about sqrt(50 / pairs), and the Kasiski ratio one of sqrt((p - 1) / distances)
+    profile, pairs = _coincidences(values, max_period)
+    fitness = (profile[1:] - 1) * np.sqrt(pairs[1:] / 50)
+
+    distances = _repeat_distances(values)
+    if len(distances):
+        fitness[1:] += (_kasiski(distances, max_period)[2:] - 1) * np.sqrt(len(distances) / (periods[1:] - 1))
+
+    # Only periods whose columns read like English, i.e. have an IoC within SIGNIFICANCE standard errors of English, are candidates.
+    # The variance is that of the IoC estimate of English columns of len(values) / p letters, averaged over p columns. A key with
+    # repeated letters makes some shorter periods score well above chance, but not this close to English.
+    squares, cubes = (ENGLISH_FREQUENCIES ** 2).sum(), (ENGLISH_FREQUENCIES ** 3).sum()
+    lengths = len(values) / periods
+    variance = (4 * (cubes - squares ** 2) / lengths + 2 * squares * (1 - squares) / lengths ** 2) / periods
+    english = profile[1:] >= ENGLISH_COINCIDENCE - SIGNIFICANCE * 26 * np.sqrt(variance)
+    if english.any(): # otherwise (a very short text, or not English) every period stays a candidate
+        fitness[~english] = -np.inf
+    best = int(np.argmax(fitness)) + 1
+
+    # The z-scores favour short periods, so move on to a multiple whose columns are significantly closer to English. The columns of
+    # a multiple split those of the period, so the variance of the difference is the difference of the variances. Columns that are
+    # too short have a skewed IoC, and are not trusted for this.
+    for period in range(2 * best, min(max_period, len(values) // MIN_COLUMN_LENGTH) + 1):
+        error = SIGNIFICANCE * 26 * np.sqrt(max(variance[period - 1] - variance[best - 1], 0))
+        if period % best == 0 and profile[period] - profile[best] > error:
+            best = period
+
+    return best
+
+def recover_vigenere_key(ciphertext: str, length: int, method: str = "chi_squared") -> str:
+    """
+
+    Recovers a Vigenere key of known length. One bincount gives the letter counts of every column, then all 26 shifts of all
+    columns are scored at once, like break_caesar.
+
+    @param: ciphertext - a Vigenere ciphertext.
+    @param: length - the key length, see estimate_key_length.
+    @param: method - the scoring method, see score_counts.
+
+    @return: The key, usable as Vigenere(key).
+
+    """
+
+    _check_method(method)
+    if not isinstance(length, int) or length < 1:
+        raise InputError("The key length must be a positive integer.")
+
+    values = letter_values(check_attack_ciphertext(ciphertext)).astype(np.int64)
+    counts = np.bincount((np.arange(len(values)) % length) * 26 + values, minlength=length * 26).reshape(length, 26)
+
+    scores = score_counts(counts[:, _SHIFT_INDEX], method) # (column, shift)
+    shifts = np.argmin(scores, axis=1) if method == "chi_squared" else np.argmax(scores, axis=1)
+    return ''.join(chr(65 + shift) for shift in shifts)
+
+def break_vigenere(ciphertext: str, max_period: int = DEFAULT_MAX_PERIOD, method: str = "chi_squared") -> tuple:
+    """
+
+    Ciphertext only attack on Vigenere, see estimate_key_length and recover_vigenere_key.
+
+    @param: ciphertext - a Vigenere ciphertext.
+    @param: max_period - the longest key length to consider.
+    @param: method - the scoring method, see score_counts.
+
+    @return: A tuple (key, plaintext).
+
+    """
+
+    key = recover_vigenere_key(ciphertext, estimate_key_length(ciphertext, max_period), method)
+    return key, Vigenere(key).decrypt(ciphertext)
+
+def hill_known_plaintext(plaintext: str, ciphertext: str, dim: int) -> list:
+    """
+
+    Known plaintext attack on Hill. Every aligned block gives dim linear equations in the key, the system is solved exactly mod 2
+    and mod 13 (which may use different blocks) and the two solutions are combined with the Chinese Remainder Theorem.
+
+    @param: plaintext - the known plaintext, it is encoded with standard_encode.
+    @param: ciphertext - the ciphertext it encrypts to, from the beginning. Trailing letters that do not fill a block are ignored.
+    @param: dim - the dimension of the key.
+
+    @return: The key, usable as Hill(key).
+
+    """
+
+    if not isinstance(plaintext, str):
+        raise InputError("Plaintext must be a string. Proper Usage: hill_known_plaintext(string plaintext, string ciphertext, int dim)")
+
+    if not isinstance(dim, int) or dim < 1:
+        raise InputError("The key dimension must be a positive integer.")
+
+    plaintext = standard_encode(plaintext)
+    if not plaintext.isascii():
+        raise InputError("Plaintext must only contain letters from the English alphabet.")
+
+    ciphertext = check_attack_ciphertext(ciphertext)
+    length = min(len(plaintext), len(ciphertext)) // dim * dim
+
+    # Every block is a row, so ciphertext = plaintext @ key.T
+    plain_blocks = letter_values(plaintext[:length]).astype(np.int64).reshape(-1, dim)
+    cipher_blocks = letter_values(ciphertext[:length]).astype(np.int64).reshape(-1, dim)
+
+    transposed_2 = solve_mod_prime(plain_blocks, cipher_blocks, 2)
+    transposed_13 = solve_mod_prime(plain_blocks, cipher_blocks, 13)
+    if transposed_2 is None or transposed_13 is None:
+        raise InputError("The plaintext blocks do not determine the key, more (or more varied) known plaintext is needed.")
+
+    key = ((13 * transposed_2 + 14 * transposed_13) % 26).T
+    if inverse_mod_26(key) is None or not np.array_equal((plain_blocks @ key.T) % 26, cipher_blocks):
+        raise InputError("The plaintext and ciphertext are not consistent with any Hill key of dimension " + str(dim) + ".")
+
+    return key.tolist()
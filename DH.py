@@ -4,25 +4,17 @@ import Primes
 
 
 class DH():
-    def __init__(self, g: int, p: int):
+    def __init__(self, g: int, p: int, q: int = None):
         """
         Initializes a Diffie Helman character, either Alice or Bob
 
         @param: public - a list for the public parameters, which will be [g, p], where g is the generator, and p is the prime
+        @param: q - the prime order of g when g generates a subgroup, as from DH.generate_group, None when g is a primitive root of p
 
         @return: none
         """
 
-        
-        
-        if not isinstance(g, int) or not isinstance(p, int):
-            raise InputError("public needs to be a list of two numbers, [g, p], such that generator g that is a primitive root of p")
-        
-        if not Primes.is_primitive_root(g, p):
-            raise InputError("g is not a primitive root of p")
-        
-        self._public_param = (g, p)
-        self.__private_param = secrets.randbelow(p - 1)
+        self.change_public_param(g, p, q)
 
 
 
@@ -37,30 +29,34 @@ class DH():
         @return: none
         """
 
-        self.__private_param = secrets.randbelow(self._public_param[1] - 1)
+        self.__private_param = secrets.randbelow(self._order)
     
 
 
 
-    def change_public_param(self, g: int, p: int) -> None:
+    def change_public_param(self, g: int, p: int, q: int = None) -> None:
         """
         Changes the public parameters g and p to the new specified parameters in public, [g, p]
 
-        @param: none
+        @param: q - the prime order of g, see __init__
 
         @return: none
         """
 
         
         
-        if not isinstance(g, int) or not isinstance(p, int):
+        if not isinstance(g, int) or not isinstance(p, int) or (q is not None and not isinstance(q, int)):
             raise InputError("public needs to be a list of two numbers, [g, p], such that generator g that is a primitive root of p")
         
-        if not Primes.is_primitive_root(g, p):
+        if q is None and not Primes.is_primitive_root(g, p):
             raise InputError("g is not a primitive root of p")
+
+        if q is not None and not Primes.is_generator(g, p, q):
+            raise InputError("g does not generate the subgroup of order q")
         
 
         self._public_param = (g, p)
+        self._order = p - 1 if q is None else q # the private parameter is an exponent mod the order of g
         self.change_private_param()
 
 
@@ -80,17 +76,39 @@ class DH():
 
 
     @staticmethod
-    def generate_key(bits: int) -> list:
+    def generate_key(bits: int, workers: int = None, timeout: float = None) -> list:
         """
-        Generates a prime p of bit length bits, and finds the smallest possible generator g. Time intensive method, don't rely on this. 
+        Generates a safe prime p = 2q + 1 of bit length bits, and finds the smallest possible generator g. p - 1 = 2q is known, so
+        each generator check is two exponentiations. Safe primes are rare, see Primes.generate_group for the time this takes.
 
         @param: bits - the length in bits of the prime p
+        @param: workers - the number of worker processes, None to use every core
+        @param: timeout - the seconds to search for, None for no limit
 
         @return: list[int], [g, p]
         """
-        prime = Primes.generate_prime(bits)
-        g = Primes.find_primitive_root(prime)
+        prime, q, _ = Primes.generate_group(bits, workers=workers, timeout=timeout)
+        g = Primes.find_primitive_root(prime, [2, q])
         return (g, prime)
+
+
+
+
+    @staticmethod
+    def generate_group(bits: int, q_bits: int = 256, workers: int = None, timeout: float = None) -> tuple:
+        """
+        Generates a Schnorr group, a prime p = kq + 1 of bit length bits and a generator g of its subgroup of prime order q. Much faster
+        to generate than generate_key, and exchanges only need exponents below q. Use as DH(*DH.generate_group(2048)).
+
+        @param: bits - the length in bits of the prime p
+        @param: q_bits - the length in bits of q, None for a safe prime p = 2q + 1
+        @param: workers - the number of worker processes, None to use every core
+        @param: timeout - the seconds to search for, None for no limit
+
+        @return: tuple[int], (g, p, q)
+        """
+        p, q, g = Primes.generate_group(bits, q_bits, workers=workers, timeout=timeout)
+        return (g, p, q)
     
 
 
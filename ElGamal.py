@@ -5,25 +5,29 @@ import Encode
 import base64
 
 class ElGamal_Key():
-    def __init__(self, p: int, g: int):
+    def __init__(self, p: int, g: int, q: int = None):
         """
         Initializes an ElGamal object based on generator g of prime p, creating a random public and private key
 
         @param: g - the generator component of the public key
         @param: p - the prime number componenent of the public key
+        @param: q - the prime order of g when g generates a subgroup, as from generate_group_seed, None when g is a primitive root of p
 
         @return: none
         """
 
       
-        if not isinstance(g, int) or not isinstance(p, int):
+        if not isinstance(g, int) or not isinstance(p, int) or (q is not None and not isinstance(q, int)):
             raise InputError("g and p need to be integers. Usage: obj = ElGamal_Key(int p, int g)")
         
-        if not Primes.is_primitive_root(g, p):
+        if q is None and not Primes.is_primitive_root(g, p):
             raise InputError("g is not a primitive root of p. Usage: obj = ElGamal_Key(int p, int g)")
+
+        if q is not None and not Primes.is_generator(g, p, q):
+            raise InputError("g does not generate the subgroup of order q. Usage: obj = ElGamal_Key(int p, int g, int q)")
         
 
-        self.__private_key = secrets.randbelow(p)
+        self.__private_key = secrets.randbelow(p if q is None else q)
 
         h = pow(g, self.__private_key, p)
         self._public_key = (p, g, h)
@@ -227,18 +231,37 @@ class ElGamal_Key():
 
         return der_encoded
 
-def generate_key_seed(bits: int) -> tuple:
+def generate_key_seed(bits: int, workers: int = None, timeout: float = None) -> tuple:
     """
-    Generates a prime p of bit length bits, and finds the smallest possible generator g. Time intensive method, don't rely on this. 
+    Generates a safe prime p = 2q + 1 of bit length bits, and finds the smallest possible generator g. p - 1 = 2q is known, so each
+    generator check is two exponentiations. Safe primes are rare, see Primes.generate_group for the time this takes.
 
     @param: bits - the length in bits of the prime p
+    @param: workers - the number of worker processes, None to use every core
+    @param: timeout - the seconds to search for, None for no limit
 
     @return: tuple[int], (p, g)
     """
 
-    prime = Primes.generate_prime(bits)
-    g = Primes.find_primitive_root(prime)
+    prime, q, _ = Primes.generate_group(bits, workers=workers, timeout=timeout)
+    g = Primes.find_primitive_root(prime, [2, q])
     return prime, g
+
+def generate_group_seed(bits: int, q_bits: int = 256, workers: int = None, timeout: float = None) -> tuple:
+    """
+    Generates a Schnorr group, a prime p = kq + 1 of bit length bits and a generator g of its subgroup of prime order q. Much faster
+    to generate than generate_key_seed. Use as ElGamal_Key(*generate_group_seed(2048)).
+
+    @param: bits - the length in bits of the prime p
+    @param: q_bits - the length in bits of q, None for a safe prime p = 2q + 1
+    @param: workers - the number of worker processes, None to use every core
+    @param: timeout - the seconds to search for, None for no limit
+
+    @return: tuple[int], (p, g, q)
+    """
+
+    p, q, g = Primes.generate_group(bits, q_bits, workers=workers, timeout=timeout)
+    return p, g, q
     
 def encrypt(plaintext: str, key: ElGamal_Key) -> int:
 
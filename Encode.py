@@ -1,5 +1,27 @@
 from Errors import InputError
 import secrets
+import string
+import numpy as np
+
+# Normalization tables for standard_encode: ASCII text is upper cased and stripped with bytes.translate in a single C level pass
+_ASCII_UPPER_TABLE = bytes.maketrans(string.ascii_lowercase.encode('ascii'), string.ascii_uppercase.encode('ascii'))
+_ASCII_NON_ALPHA = bytes(code for code in range(128) if not chr(code).isalpha())
+_ASCII_UPPERCASE = string.ascii_uppercase.encode('ascii')
+
+class _UnicodeTable(dict):
+    """
+    str.translate table for non-ASCII text, filled in lazily: every code point is looked up once, then served from the cache.
+    Letters map to their upper case form, everything else maps to None, which deletes it.
+    """
+    def __missing__(self, code):
+        char = chr(code)
+        self[code] = char.upper() if char.isalpha() else None
+        return self[code]
+
+_UNICODE_TABLE = _UnicodeTable()
+
+# Types accepted by the byte (Z_256) mode of the classical ciphers
+BINARY_TYPES = (bytes, bytearray, memoryview)
 
 def standard_encode(plaintext: str, padBound = 0) ->  str: 
     """
@@ -14,12 +36,119 @@ def standard_encode(plaintext: str, padBound = 0) ->  str:
     """
 
 
-    plaintext = ''.join(char.upper() for char in plaintext if char.isalpha())
+    if plaintext.isascii():
+        plaintext = plaintext.encode('ascii').translate(_ASCII_UPPER_TABLE, _ASCII_NON_ALPHA).decode('ascii')
+    else:
+        plaintext = plaintext.translate(_UNICODE_TABLE)
+
     if not padBound or len(plaintext) % padBound == 0:
         return plaintext
     else: 
         return plaintext + 'Z' * (padBound - (len(plaintext) % padBound))
 
+def is_encoded(text: str) -> bool:
+    """
+
+    Checks whether every character of the text is an upper case letter, i.e. whether it is a valid ciphertext for the classical ciphers.
+
+    @param: text - the text to be checked.
+
+    @return: True if the text only contains upper case letters (or is empty), False otherwise.
+
+    """
+
+    if text.isascii():
+        return not text.encode('ascii').translate(None, _ASCII_UPPERCASE) # deleting A-Z leaves nothing behind
+    return all(map(str.isupper, text))
+
+def check_ciphertext(ciphertext: str) -> str:
+    """
+
+    Validates a ciphertext of the classical ciphers, the shared check of their decrypt methods.
+
+    @param: ciphertext - the ciphertext to be checked.
+
+    @return: The ciphertext, if it is a string of upper case letters, otherwise an InputError is raised.
+
+    """
+
+    if not isinstance(ciphertext, str):
+        raise InputError("Ciphertext must be a string. Proper Usage: obj.decrypt(string ciphertext)")
+
+    if not is_encoded(ciphertext):
+        raise InputError("Ciphertext must strictly contain upper case letters. Proper Usage: obj.decrypt(string ciphertext)")
+
+    return ciphertext
+
+def text_to_array(text: str) -> np.ndarray:
+    """
+
+    Views an encoded string as an array of character codes, for the ciphers that do their arithmetic with numpy.
+
+    @param: text - the string to be viewed, usually the output of standard_encode.
+
+    @return: A uint8 array of the ASCII codes if the text is pure ASCII, otherwise a uint32 array of the code points.
+
+    """
+
+    if text.isascii():
+        return np.frombuffer(text.encode('ascii'), dtype=np.uint8)
+    return np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+
+def letter_values(text: str) -> np.ndarray:
+    """
+
+    Converts an encoded string to the alphabet index of every letter (A = 0, ..., Z = 25), e.g. to use a key as byte mode shifts.
+
+    @param: text - an encoded string, see standard_encode.
+
+    @return: A uint8 array of the letter values, taken mod 26 for letters outside of A-Z.
+
+    """
+
+    return ((text_to_array(text).astype(np.int64) - 65) % 26).astype(np.uint8) # 65 is ASCII of A
+
+def array_to_text(codes: np.ndarray) -> str:
+    """
+
+    Inverse of text_to_array. Arrays of any other integer type are taken to hold the ASCII codes of upper case letters.
+
+    @param: codes - an array of character codes.
+
+    @return: The string represented by the array.
+
+    """
+
+    if codes.dtype == np.uint32:
+        return codes.tobytes().decode('utf-32-le')
+    return codes.astype(np.uint8, copy=False).tobytes().decode('ascii')
+
+def bytes_to_array(data) -> np.ndarray:
+    """
+
+    Views a bytes-like object as a uint8 array, without copying it.
+
+    @param: data - a bytes, bytearray or (contiguous) memoryview object.
+
+    @return: A read only uint8 array over the bytes of @param data.
+
+    """
+
+    return np.frombuffer(memoryview(data).cast('B'), dtype=np.uint8)
+
+def inverse_byte_table(table: bytes) -> bytes:
+    """
+
+    Inverts a bytes.translate table that is a permutation of the 256 byte values.
+
+    @param: table - the table to be inverted.
+
+    @return: The table that undoes @param table.
+
+    """
+
+    return bytes.maketrans(table, bytes(range(256)))
+
 def pkcs1_v15_pad(plaintext: str, key_size: int) -> bytes:
     """
 
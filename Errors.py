@@ -6,4 +6,12 @@ class InputError(Exception):
         self.message = message
         super().__init__(self.message)
 
-    
\ No newline at end of file
+    
+class SearchError(RuntimeError):
+    """
+    Raised when a search runs out of tries or time, stats holds what the search did
+    """
+    def __init__(self, message, stats = None):
+        self.message = message
+        self.stats = stats
+        super().__init__(self.message)
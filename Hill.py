@@ -1,12 +1,143 @@
 import string
-from Encode import standard_encode
+from Encode import standard_encode, text_to_array, array_to_text, is_encoded, bytes_to_array, BINARY_TYPES
 from Errors import InputError
+from Shard import Shardable
 import secrets
-import math
 import numpy as np
-import math
+from Stream import CipherStream
 
-class Hill:
+def _inverse_mod_prime(matrix: np.ndarray, p: int):
+    """
+
+    Inverts a square matrix over the integers mod p using Gauss-Jordan elimination, with exact integer arithmetic.
+
+    @param: matrix - a square integer matrix.
+    @param: p - a prime modulus.
+
+    @return: The inverse of @param matrix mod p as an integer array, or None if the matrix is singular mod p.
+
+    """
+
+    dim = matrix.shape[0]
+    augmented = np.concatenate((matrix % p, np.eye(dim, dtype=np.int64)), axis=1).astype(np.int64)
+
+    for col in range(dim):
+        pivots = np.flatnonzero(augmented[col:, col])
+        if len(pivots) == 0:
+            return None
+
+        pivot = col + pivots[0]
+        if pivot != col:
+            augmented[[col, pivot]] = augmented[[pivot, col]]
+
+        augmented[col] = augmented[col] * pow(int(augmented[col, col]), -1, p) % p
+
+        # Clear the column from every other row at once
+        factors = augmented[:, col].copy()
+        factors[col] = 0
+        augmented = (augmented - np.outer(factors, augmented[col])) % p
+
+    return augmented[:, dim:]
+
+def solve_mod_prime(a: np.ndarray, b: np.ndarray, p: int):
+    """
+
+    Solves the linear system a @ x = b over the integers mod p using Gauss-Jordan elimination, for a tall matrix a with full column
+    rank. Rows that are dependent on earlier ones are skipped, so any number of equations can be given.
+
+    @param: a - an (n, dim) integer matrix, with n >= dim.
+    @param: b - an (n, m) integer matrix.
+    @param: p - a prime modulus.
+
+    @return: The (dim, m) solution mod p as an integer array, or None if the columns of @param a are dependent mod p. The
+             solution is not checked against the skipped rows.
+
+    """
+
+    dim = a.shape[1]
+    augmented = np.concatenate((a % p, b % p), axis=1).astype(np.int64)
+
+    for col in range(dim):
+        pivots = np.flatnonzero(augmented[col:, col])
+        if len(pivots) == 0:
+            return None
+
+        pivot = col + pivots[0]
+        if pivot != col:
+            augmented[[col, pivot]] = augmented[[pivot, col]]
+
+        augmented[col] = augmented[col] * pow(int(augmented[col, col]), -1, p) % p
+
+        factors = augmented[:, col].copy()
+        factors[col] = 0
+        augmented = (augmented - np.outer(factors, augmented[col])) % p
+
+    return augmented[:dim, dim:]
+
+def inverse_mod_26(matrix: np.ndarray):
+    """
+
+    Inverts a square matrix mod 26 exactly, by inverting it mod 2 and mod 13 and combining the two with the Chinese Remainder Theorem.
+
+    @param: matrix - a square integer matrix.
+
+    @return: The inverse of @param matrix mod 26 as an integer array, or None if the matrix is not invertible mod 26.
+
+    """
+
+    inverse_2 = _inverse_mod_prime(matrix, 2)
+    inverse_13 = _inverse_mod_prime(matrix, 13)
+    if inverse_2 is None or inverse_13 is None:
+        return None
+
+    return (13 * inverse_2 + 14 * inverse_13) % 26 # 13 = 1 mod 2, 0 mod 13 and 14 = 0 mod 2, 1 mod 13
+
+def _inverse_mod_256(matrix: np.ndarray):
+    """
+
+    Inverts a square matrix mod 256 exactly, by inverting it mod 2 and lifting the inverse with Newton's iteration
+    X = X(2I - AX), which doubles the number of correct bits every step (mod 4, 16, 256).
+
+    @param: matrix - a square integer matrix.
+
+    @return: The inverse of @param matrix mod 256 as an integer array, or None if the matrix is not invertible mod 256 (i.e mod 2).
+
+    """
+
+    inverse = _inverse_mod_prime(matrix, 2)
+    if inverse is None:
+        return None
+
+    matrix = matrix % 256
+    identity = np.eye(matrix.shape[0], dtype=np.int64)
+    for _ in range(3):
+        inverse = (inverse @ ((2 * identity - matrix @ inverse) % 256)) % 256
+
+    return inverse
+
+def _random_invertible_mod_prime(dim: int, p: int) -> np.ndarray:
+    """
+
+    Builds a random matrix that is invertible mod p as the product P * L * U of a random permutation matrix, a random unit lower
+    triangular matrix and a random upper triangular matrix with a nonzero diagonal, so no candidate ever has to be rejected.
+
+    @param: dim - the dimension of the matrix.
+    @param: p - a prime modulus.
+
+    @return: An integer array of shape (dim, dim), with entries in [0, p), that is invertible mod p.
+
+    """
+
+    lower = np.array([[secrets.randbelow(p) if j < i else int(i == j) for j in range(dim)] for i in range(dim)], dtype=np.int64)
+    upper = np.array([[secrets.randbelow(p) if j > i else 0 for j in range(dim)] for i in range(dim)], dtype=np.int64)
+    upper[np.diag_indices(dim)] = [secrets.randbelow(p - 1) + 1 for _ in range(dim)]
+
+    order = list(range(dim))
+    secrets.SystemRandom().shuffle(order)
+
+    return ((lower @ upper) % p)[order]
+
+class Hill(Shardable):
     def __init__(self, key: list):
         if not isinstance(key, list):
             raise InputError("Matrix needs to be a square matrix. Usage: Hill(list[list] key)")
@@ -14,86 +145,173 @@ class Hill:
         self.__encryption_key = np.array(key)
         shape = self.__encryption_key.shape
         self.shape = len(key) # for later
+        self.__encryption_key = self.__encryption_key % 26
 
         if len(shape) != 2 or shape[0] != shape[1]:
             raise InputError("Matrix needs to be a square matrix. Usage: Hill(list[list] key)")
         
         
-        det = int(round(np.linalg.det(self.__encryption_key)))
-        if math.gcd(26, det % 26) != 1:
+        self.__decryption_key = inverse_mod_26(self.__encryption_key)
+        if self.__decryption_key is None:
             raise InputError("Invalid matrix, not invertible. det(key) must be invertible mod 26, i.e gcd(26, det(key)) = 1, in order to be a valid key.")
-        
-        e = pow(det % 26, -1, 26)
-        self.__decryption_key = e * np.round(np.linalg.inv(self.__encryption_key) * det).astype(int)  % 26
+
+        # Byte mode works mod 256, the key is invertible mod 2 so it is invertible mod 256 as well
+        self.__byte_encryption_key = (np.array(key) % 256).astype(np.int64)
+        self.__byte_decryption_key = _inverse_mod_256(self.__byte_encryption_key)
 
         alphabet = string.ascii_uppercase
         self.letter_to_num = {char: i for i, char in enumerate(alphabet)}
         self.num_to_letter = {i: char for i, char in enumerate(alphabet)}
 
     def changeKey(self, newKey: list) -> None:
-        self.__encryption_key = np.array(newKey)
-        shape = self.__encryption_key.shape
-
-
+        encryption_key = np.array(newKey)
+        shape = encryption_key.shape
 
         if len(shape) != 2 or shape[0] != shape[1]:
             raise InputError("Matrix needs to be a square matrix. Usage: Hill(list[list] key)")
         
-        
-        det = int(round(np.linalg.det(self.__encryption_key)))
-
-        if math.gcd(26, det % 26) != 1:
+        encryption_key = encryption_key % 26
+        decryption_key = inverse_mod_26(encryption_key)
+        if decryption_key is None:
             raise InputError("Invalid matrix, not invertible. det(key) must be invertible mod 26, i.e gcd(26, det(key)) = 1, in order to be a valid key.")
         
-        e = pow(det % 26, -1, 26)
-        self.__decryption_key = e * np.round(np.linalg.inv(self.__encryption_key) * det).astype(int)  % 26
+        self.__encryption_key = encryption_key
+        self.__decryption_key = decryption_key
+        self.__byte_encryption_key = (np.array(newKey) % 256).astype(np.int64)
+        self.__byte_decryption_key = _inverse_mod_256(self.__byte_encryption_key)
+        self.shape = len(newKey)
 
     def encrypt(self, plaintext: str) -> str:
+        if isinstance(plaintext, BINARY_TYPES):
+            if self.shape > 255:
+                raise InputError("Byte mode pads every byte with the pad length, so the key dimension must be at most 255.")
+
+            pad = self.shape - len(plaintext) % self.shape # always at least one byte, so the padding can be removed unambiguously
+            plaintext = np.concatenate((bytes_to_array(plaintext), np.full(pad, pad, dtype=np.uint8)))
+            return self.__multiply_bytes(plaintext, self.__byte_encryption_key)
+
         if not isinstance(plaintext, str):
             raise InputError("Plaintext must be a string. Proper Usage: obj.encrypt(string plaintext)")
         
-        plaintext = standard_encode(plaintext, padBound=self.shape)
-        ciphertext = []
+        plaintext = self.__encode_plaintext(plaintext)
+        if len(plaintext) % self.shape != 0:
+            plaintext += 'Z' * (self.shape - len(plaintext) % self.shape)
 
-        for i in range(0, len(plaintext), self.shape):
-            word_vec = np.array([self.letter_to_num[plaintext[n]] for n in range(i, i + self.shape)])
-            result_vec = np.dot(self.__encryption_key, word_vec) % 26
-            fin_vec = [self.num_to_letter[i] for i in result_vec]
-
-            for char in fin_vec:
-                ciphertext.append(char)
-
-        return ''.join(ciphertext)
+        return self.__multiply(text_to_array(plaintext), self.__encryption_key)
             
     def decrypt(self, ciphertext: str) -> str:
+        if isinstance(ciphertext, BINARY_TYPES):
+            ciphertext = bytes_to_array(ciphertext)
+            if len(ciphertext) == 0 or len(ciphertext) % self.shape != 0:
+                raise InputError("Ciphertext must be split evenly by the key dimension (length multiple of key dimension). Proper Usage: obj.decrypt(bytes ciphertext)")
+
+            plaintext = self.__multiply_bytes(ciphertext, self.__byte_decryption_key)
+            pad = plaintext[-1]
+            if not 1 <= pad <= self.shape or plaintext[-pad:] != bytes([pad]) * pad:
+                raise InputError("Invalid padding, the ciphertext was not produced by this key.")
+            return plaintext[:-pad]
+
         if not isinstance(ciphertext, str):
             raise InputError("Ciphertext must be a string. Proper Usage: obj.decrypt(string ciphertext)")
         
         if (len(ciphertext) % self.shape != 0):
             raise InputError("Ciphertext must be a string that can be split evenly by the key dimension (length multiple of key dimension). Proper Usage: obj.decrypt(string ciphertext)")
 
-        plaintext = standard_encode(ciphertext, padBound=self.shape)
-        plaintext = []
+        return self.__multiply(text_to_array(self.__check_ciphertext(ciphertext)), self.__decryption_key)
 
-        for i in range(0, len(ciphertext), self.shape):
-            word_vec = np.array([self.letter_to_num[ciphertext[n]] for n in range(i, i + self.shape)])
-            result_vec = np.dot(self.__decryption_key, word_vec) % 26
-            fin_vec = [self.num_to_letter[i] for i in result_vec]
+    def encryptor(self) -> CipherStream:
+        """
+        Creates an incremental encryption stream, see Stream.CipherStream. A partial block is kept until the next chunk
+        completes it, and is padded with Z on finalize().
+        """
 
-            for char in fin_vec:
-                plaintext.append(char)
+        def process(text: str, offset: int, final: bool) -> tuple:
+            if final and len(text) % self.shape != 0:
+                text += 'Z' * (self.shape - len(text) % self.shape)
+            cut = len(text) - len(text) % self.shape
+            return self.__multiply(text_to_array(text[:cut]), self.__encryption_key), text[cut:]
 
-        return ''.join(plaintext)
-            
-    @staticmethod
-    def generate_key(dim: int) -> int:
-        while True:
-            potential_key = np.array([[secrets.randbelow(26) for j in range(dim)] for i in range(dim)])
-            det = int(round(np.linalg.det(potential_key))) % 26
-            if math.gcd(det, 26) == 1:
-                return potential_key.tolist()
-            
+        return CipherStream(self.__encode_plaintext, process)
+
+    def decryptor(self) -> CipherStream:
+        """
+        Creates an incremental decryption stream, see Stream.CipherStream. A partial block is kept until the next chunk
+        completes it, and finalize() rejects a ciphertext that ends with one.
+        """
+
+        def process(text: str, offset: int, final: bool) -> tuple:
+            if final and len(text) % self.shape != 0:
+                raise InputError("Ciphertext must be a string that can be split evenly by the key dimension (length multiple of key dimension). Proper Usage: obj.decrypt(string ciphertext)")
+            cut = len(text) - len(text) % self.shape
+            return self.__multiply(text_to_array(text[:cut]), self.__decryption_key), text[cut:]
+
+        return CipherStream(self.__check_ciphertext, process)
 
+    def __encode_plaintext(self, plaintext: str) -> str:
 
+        plaintext = standard_encode(plaintext)
+        if not plaintext.isascii():
+            raise InputError("Plaintext must only contain letters from the English alphabet. Proper Usage: obj.encrypt(string plaintext)")
 
+        return plaintext
 
+    def __check_ciphertext(self, ciphertext: str) -> str:
+
+        if not ciphertext.isascii() or not is_encoded(ciphertext):
+            raise InputError("Ciphertext must strictly contain upper case letters. Proper Usage: obj.decrypt(string ciphertext)")
+
+        return ciphertext
+
+    def __multiply(self, codes: np.ndarray, key: np.ndarray) -> str:
+        """
+
+        Applies the key matrix to every block of the message at once. Each row of the (N, dim) message matrix is a block,
+        so multiplying by the transpose of the key applies the key to every block in one matrix product.
+
+        @param: codes - the ASCII codes of the message, with a length that is a multiple of the key dimension.
+        @param: key - the key matrix to apply, reduced mod 26.
+
+        @return: The transformed message as a string.
+
+        """
+
+        blocks = (codes.astype(np.int64) - 65).reshape(-1, self.shape) # 65 is ASCII of A
+        return array_to_text((blocks @ key.T) % 26 + 65)
+
+    def __multiply_bytes(self, data: np.ndarray, key: np.ndarray) -> bytes:
+        """
+
+        Byte mode version of __multiply, working on the raw byte values mod 256.
+
+        @param: data - the bytes of the message as a uint8 array, with a length that is a multiple of the key dimension.
+        @param: key - the key matrix to apply, reduced mod 256.
+
+        @return: The transformed message as bytes.
+
+        """
+
+        blocks = data.astype(np.int64).reshape(-1, self.shape)
+        return ((blocks @ key.T) % 256).astype(np.uint8).tobytes()
+
+    # Parallel hooks, see Shard.Shardable
+    def _period(self) -> int:
+        return self.shape
+
+    def _prepare(self, text: str, encrypt: bool) -> str:
+        return self.__encode_plaintext(text) if encrypt else self.__check_ciphertext(text)
+
+    def _pad(self, length: int, encrypt: bool) -> str:
+        if encrypt:
+            return 'Z' * (-length % self.shape)
+        if length % self.shape != 0:
+            raise InputError("Ciphertext must be a string that can be split evenly by the key dimension (length multiple of key dimension). Proper Usage: obj.decrypt(string ciphertext)")
+        return ''
+
+    def _transform(self, text: str, offset: int, encrypt: bool) -> str:
+        return self.__multiply(text_to_array(text), self.__encryption_key if encrypt else self.__decryption_key)
+
+    @staticmethod
+    def generate_key(dim: int) -> list:
+        key_2 = _random_invertible_mod_prime(dim, 2)
+        key_13 = _random_invertible_mod_prime(dim, 13)
+        return ((13 * key_2 + 14 * key_13) % 26).tolist() # Invertible mod 2 and mod 13, so invertible mod 26
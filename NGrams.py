@@ -0,0 +1,315 @@
+from Encode import standard_encode, letter_values
+from Errors import InputError
+import numpy as np
+import struct
+import os
+
+MAX_N = 4
+FLOOR = 0.01 # n-grams that never occur in the corpus are counted as this many occurrences
+
+# File layout: a 64 byte header (magic, version, MAX_N, corpus length), then the little endian float32 log10 probability tables
+# of the monograms, bigrams, trigrams and quadgrams, 26^n entries each. Every table starts at a multiple of 4 bytes, so it can
+# be mapped directly.
+_MAGIC = b'NGRM'
+_VERSION = 1
+_HEADER = struct.Struct('<4sIIQ')
+_HEADER_SIZE = 64
+
+def ngram_codes(values: np.ndarray, n: int) -> np.ndarray:
+    """
+
+    Computes the table index of every n-gram of a text, 26^(n-1) * first letter + ... + last letter.
+
+    @param: values - the alphabet indices of the letters of the text (A = 0).
+    @param: n - the n-gram length.
+
+    @return: An int64 array of the len(values) - n + 1 indices (none if the text is shorter than n).
+
+    """
+
+    values = values.astype(np.int64)
+    length = len(values) - n + 1
+    if length <= 0:
+        return np.zeros(0, dtype=np.int64)
+
+    codes = values[:length].copy()
+    for i in range(1, n):
+        codes = codes * 26 + values[i:i + length]
+    return codes
+
+def text_values(text: str) -> np.ndarray:
+    """
+
+    Encodes any text with standard_encode and converts it to alphabet indices, dropping letters outside of A-Z.
+
+    @param: text - the text.
+
+    @return: A uint8 array of the alphabet indices of its letters.
+
+    """
+
+    if not isinstance(text, str):
+        raise InputError("Text must be a string.")
+
+    return letter_values(standard_encode(text).encode('ascii', 'ignore').decode('ascii'))
+
+def log_probabilities(counts: np.ndarray) -> np.ndarray:
+    """
+
+    Converts n-gram counts to base 10 log probabilities.
+
+    @param: counts - the counts of every n-gram.
+
+    @return: A float32 array of the same shape, n-grams that never occur get the log of FLOOR occurrences.
+
+    """
+
+    total = max(int(counts.sum()), 1)
+    return np.log10(np.maximum(counts, FLOOR) / total).astype(np.float32)
+
+def write_store(filename: str, counts: list, letters: int) -> None:
+    """
+
+    Writes an n-gram store file. The file is written next to its destination first and moved into place, so a store that is
+    open elsewhere is never seen half written.
+
+    @param: filename - the store file.
+    @param: counts - the counts of the monograms, bigrams, trigrams and quadgrams, flat arrays of 26^n entries each.
+    @param: letters - the number of letters the counts were taken from.
+
+    @return: none
+
+    """
+
+    if len(counts) != MAX_N or any(np.shape(counts[n]) != (26 ** (n + 1),) for n in range(MAX_N)):
+        raise InputError("A store needs the counts of every n-gram length from 1 to " + str(MAX_N) + ".")
+
+    temporary = filename + ".tmp"
+    with open(temporary, 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, MAX_N, letters).ljust(_HEADER_SIZE, b'\0'))
+        for table in counts:
+            f.write(log_probabilities(np.asarray(table)).astype('<f4').tobytes())
+    os.replace(temporary, filename)
+
+def build(corpus: str, filename: str) -> None:
+    """
+
+    Counts the monograms through quadgrams of a corpus and writes them as an n-gram store, see NGramStore. Corpora that do not fit
+    in memory are counted chunk by chunk with an NGramCounter instead.
+
+    @param: corpus - any text, it is encoded with standard_encode first.
+    @param: filename - the store file.
+
+    @return: none
+
+    """
+
+    counter = NGramCounter()
+    counter.update(corpus)
+    counter.save(filename)
+
+class NGramCounter:
+    """
+    Streaming monogram through quadgram counts, for corpora that are too large to hold in memory. Chunks are encoded with
+    standard_encode as they arrive and the last MAX_N - 1 letters are carried over, so feeding a text in any number of chunks
+    gives exactly the counts of the whole text. Memory use is fixed by the count arrays, whatever the size of the corpus.
+
+    Counters of separate parts of a corpus (other files, or other processes) merge by addition, counter + other or
+    counter.merge(other), as if the texts were separate documents: no n-gram spans the two.
+    """
+
+    def __init__(self):
+        """
+        Creates an empty counter.
+
+        @param: none
+
+        @return: none
+        """
+
+        # Only the quadgrams are counted per chunk. Every shorter n-gram is the start of a quadgram, except those among the last
+        # MAX_N - 1 letters of a text, which are counted from the tail when needed, or into __ends once a merge closes the text.
+        self.letters = 0
+        self.__quadgrams = np.zeros(26 ** MAX_N, dtype=np.int64)
+        self.__ends = [np.zeros(26 ** n, dtype=np.int64) for n in range(1, MAX_N)]
+        self.__tail = np.zeros(0, dtype=np.uint8)
+
+    def update(self, chunk: str) -> None:
+        """
+        Counts the next chunk of the corpus.
+
+        @param: chunk - the next part of the corpus, as a string.
+
+        @return: none
+        """
+
+        if not isinstance(chunk, str):
+            raise InputError("Chunk must be a string. Proper Usage: counter.update(string chunk)")
+
+        values = np.concatenate((self.__tail, text_values(chunk)))
+        self.__quadgrams += np.bincount(ngram_codes(values, MAX_N), minlength=26 ** MAX_N)
+        self.letters += len(values) - len(self.__tail)
+        self.__tail = values[-(MAX_N - 1):].copy()
+
+    def update_file(self, filename: str, chunk_size: int = 1 << 22, encoding: str = 'utf-8') -> None:
+        """
+        Counts a text file, chunk_size characters at a time.
+
+        @param: filename - the file.
+        @param: chunk_size - the number of characters read per chunk.
+        @param: encoding - the encoding of the file, undecodable bytes are skipped.
+
+        @return: none
+        """
+
+        if not isinstance(chunk_size, int) or chunk_size < 1:
+            raise InputError("chunk_size must be a positive integer.")
+
+        with open(filename, 'r', encoding=encoding, errors='ignore') as f:
+            while chunk := f.read(chunk_size):
+                self.update(chunk)
+
+    def counts(self, n: int) -> np.ndarray:
+        """
+        Gets the counts of the n-grams of one length.
+
+        @param: n - the n-gram length, 1 to 4.
+
+        @return: An int64 array of 26^n counts, see ngram_codes for the indexing.
+        """
+
+        if not isinstance(n, int) or not 1 <= n <= MAX_N:
+            raise InputError("n must be an integer between 1 and " + str(MAX_N) + ".")
+
+        if n == MAX_N:
+            return self.__quadgrams.copy()
+        return self.__quadgrams.reshape(26 ** n, -1).sum(axis=1) + self.__ends[n - 1] + self.__tail_counts(n)
+
+    def __tail_counts(self, n: int) -> np.ndarray:
+        return np.bincount(ngram_codes(self.__tail, n), minlength=26 ** n)
+
+    def merge(self, other: 'NGramCounter') -> 'NGramCounter':
+        """
+        Adds the counts of another counter to this one. Later chunks continue from the end of the other counter's text.
+
+        @param: other - an NGramCounter.
+
+        @return: this counter.
+        """
+
+        if not isinstance(other, NGramCounter):
+            raise InputError("Only another NGramCounter can be merged. Proper Usage: counter.merge(NGramCounter other)")
+
+        self.__quadgrams += other.__quadgrams
+        for n in range(1, MAX_N):
+            self.__ends[n - 1] += other.__ends[n - 1]
+            if other.letters: # this counter's text ends here
+                self.__ends[n - 1] += self.__tail_counts(n)
+        self.letters += other.letters
+        if other.letters:
+            self.__tail = other.__tail.copy()
+        return self
+
+    def __add__(self, other: 'NGramCounter') -> 'NGramCounter':
+        if not isinstance(other, NGramCounter):
+            return NotImplemented
+        return NGramCounter().merge(self).merge(other)
+
+    def save(self, filename: str) -> None:
+        """
+        Writes the counts as an n-gram store, see NGramStore.
+
+        @param: filename - the store file.
+
+        @return: none
+        """
+
+        if self.letters < MAX_N:
+            raise InputError("The corpus must contain at least " + str(MAX_N) + " letters.")
+
+        write_store(filename, [self.counts(n) for n in range(1, MAX_N + 1)], self.letters)
+
+class NGramStore:
+    """
+    Read only n-gram log probability tables, memory mapped from a file written by build(). Opening a store only reads its
+    header, the tables are paged in by the OS as they are used, and every process that opens the same file shares those pages.
+    """
+
+    def __init__(self, filename: str):
+        """
+        Opens a store.
+
+        @param: filename - a file written by build() or NGramCounter.save().
+
+        @return: none
+        """
+
+        if not isinstance(filename, str):
+            raise InputError("The filename must be a string. Proper Usage: NGramStore(string filename)")
+
+        with open(filename, 'rb') as f:
+            header = f.read(_HEADER_SIZE)
+
+        if len(header) < _HEADER_SIZE:
+            raise InputError(filename + " is not an n-gram store.")
+        magic, version, max_n, letters = _HEADER.unpack_from(header)
+        if magic != _MAGIC or version != _VERSION or max_n != MAX_N:
+            raise InputError(filename + " is not an n-gram store, or was written by an incompatible version.")
+
+        self.filename = filename
+        self.letters = letters
+        self.__tables = []
+        offset = _HEADER_SIZE
+        for n in range(1, MAX_N + 1):
+            self.__tables.append(np.memmap(filename, dtype='<f4', mode='r', offset=offset, shape=(26 ** n,)))
+            offset += 4 * 26 ** n
+
+    def table(self, n: int) -> np.ndarray:
+        """
+        Gets a log probability table.
+
+        @param: n - the n-gram length, 1 to 4.
+
+        @return: A read only float32 array of 26^n base 10 log probabilities, see ngram_codes for the indexing. The quadgram table
+                 can be passed straight to the Solvers.
+        """
+
+        if not isinstance(n, int) or not 1 <= n <= MAX_N:
+            raise InputError("n must be an integer between 1 and " + str(MAX_N) + ".")
+
+        return self.__tables[n - 1]
+
+    def score(self, text: str, n: int = MAX_N) -> float:
+        """
+        Scores a text by the total log probability of its n-grams.
+
+        @param: text - any text, it is encoded with standard_encode first.
+        @param: n - the n-gram length, 1 to 4.
+
+        @return: The sum of the log probabilities (0 if the text is shorter than n).
+        """
+
+        return float(self.table(n)[ngram_codes(text_values(text), n)].sum())
+
+    def score_many(self, texts: list, n: int = MAX_N) -> np.ndarray:
+        """
+        Scores many texts with a single lookup, for comparing candidate decryptions. The texts are joined and scored together,
+        the n-grams that would span two texts are left out. Every score is the one score gives the text on its own; to compare
+        texts of different lengths, divide by their numbers of n-grams.
+
+        @param: texts - a list of texts, they are encoded with standard_encode first.
+        @param: n - the n-gram length, 1 to 4.
+
+        @return: A float64 array of the total log probability of the n-grams of every text (0 for texts shorter than n).
+        """
+
+        table = self.table(n)
+        if not len(texts):
+            return np.zeros(0)
+
+        values = [text_values(text) for text in texts]
+        owner = np.repeat(np.arange(len(values)), [len(value) for value in values]) # the text every letter belongs to
+        codes = ngram_codes(np.concatenate(values), n)
+        inside = owner[:len(codes)] == owner[n - 1:] # n-grams that start and end in the same text
+
+        return np.bincount(owner[:len(codes)][inside], weights=table[codes[inside]], minlength=len(values))
@@ -1,12 +1,57 @@
 import string
-from Encode import standard_encode
+from Encode import standard_encode, check_ciphertext, is_encoded, bytes_to_array, text_to_array, array_to_text, BINARY_TYPES
 from Errors import InputError
-import secrets
+from Shard import Shardable
+import numpy as np
+import os
+import mmap
+from Stream import CipherStream
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+    import msvcrt
 
-class OTP:
+def _random_letters(length: int) -> np.ndarray:
+    """
+
+    Draws uniformly random upper case letters from os.urandom in bulk. Bytes of 234 and above are rejected, so that
+    every letter is equally likely (234 = 9 * 26).
+
+    @param: length - the number of letters to draw.
+
+    @return: A uint8 array of the ASCII codes of @param length random letters.
+
+    """
+
+    letters = np.empty(length, dtype=np.uint8)
+    filled = 0
+    while filled < length:
+        needed = length - filled
+        draw = np.frombuffer(os.urandom(needed + needed // 8 + 64), dtype=np.uint8) # ~9% of the bytes are rejected
+        draw = draw[draw < 234][:needed]
+        letters[filled:filled + len(draw)] = draw % 26 + 65 # 65 is ASCII of A
+        filled += len(draw)
+
+    return letters
+
+class OTP(Shardable):
     def __init__(self, key: str):
         
-        self.key_error = "The Key must be an alphabetic string.\n It is suggested to use the generate_key method to create a randomized key for One-Time Pad, which can be called using OTP.generate_key(int keyLength).\n Proper Usage: OTP(string key)"
+        self.key_error = "The Key must be an alphabetic string, or bytes for byte mode.\n It is suggested to use the generate_key method to create a randomized key for One-Time Pad, which can be called using OTP.generate_key(int keyLength).\n Proper Usage: OTP(string key)"
+        self.__set_key(key)
+
+
+    def changeKey(self, newKey: str) -> None:
+
+        self.__set_key(newKey)
+
+    def __set_key(self, key) -> None:
+
+        if isinstance(key, BINARY_TYPES): # byte mode, the key bytes are the pad, uniform over 0 - 255 from generate_key(length, True)
+            self.__key, self.__shifts = None, None
+            self.__byte_shifts = bytes_to_array(key).copy()
+            return
 
         if not isinstance(key, str):
             raise InputError(self.key_error)
@@ -16,63 +61,297 @@ class OTP:
                 raise InputError(self.key_error)
 
         self.__key = standard_encode(key)
-
-
-    def changeKey(self, newKey: str) -> None:
-
-        if not isinstance(newKey, str):
-            raise InputError(self.key_error)
-
-        for char in newKey:
-            if not char.isalpha():
-                raise InputError(self.key_error)
-            
-        self.__key = standard_encode(newKey)
+        self.__shifts = (text_to_array(self.__key) % 26).astype(np.uint8) # ord(char) % 26, since 65 + 65 = 130 is a multiple of 26
+        self.__byte_shifts = None
 
     def encrypt(self, plaintext: str) -> str:
 
+        if isinstance(plaintext, BINARY_TYPES):
+            plaintext = bytes_to_array(plaintext)
+            return (plaintext + self.__byte_key(len(plaintext))).tobytes() # uint8 arithmetic wraps mod 256
+
         if not isinstance(plaintext, str):
             raise InputError("Plaintext must be a string. Proper Usage: obj.encrypt(string plaintext)")
         
-        if len(plaintext) > len(self.__key):
-            print(plaintext)
-            print(self.__key)
+        if len(plaintext) > len(self.__text_key()):
             raise InputError("Plaintext must be shorter than the key. Proper Usage: obj.encrypt(string plaintext)")
         
-        plaintext = standard_encode(plaintext)
-
-        ciphertext = []
-
-        for x in range(len(plaintext)):
-            toAdd = ((ord(plaintext[x]) + ord(self.__key[x])) % 26) + 65 # 65 is ASCII of A
-            ciphertext.append(chr(toAdd))
-
-        return ''.join(ciphertext)
+        return self.__encrypt_text(standard_encode(plaintext))
 
     def decrypt(self, ciphertext: str) -> str:
 
+        if isinstance(ciphertext, BINARY_TYPES):
+            ciphertext = bytes_to_array(ciphertext)
+            return (ciphertext - self.__byte_key(len(ciphertext))).tobytes()
+
         if not isinstance(ciphertext, str):
             raise InputError("Ciphertext must be a string. Proper Usage: obj.decrypt(string ciphertext)")
         
-        if len(ciphertext) > len(self.__key):
+        if len(ciphertext) > len(self.__text_key()):
             raise InputError("Ciphertext must be shorter than the key. Proper Usage: obj.decrypt(string ciphertext)")
         
-        for char in ciphertext:
-            if not char.isupper():
-                raise InputError("Ciphertext must strictly contain upper case letters. Proper Usage: obj.decrypt(string ciphertext)")
+        return self.__decrypt_text(check_ciphertext(ciphertext))
+
+    def __byte_key(self, length: int) -> np.ndarray:
+
+        # A letter key only shifts each byte by 0 - 25, which leaves every plaintext byte one of 26 values: not a one time pad
+        if self.__byte_shifts is None:
+            raise InputError("Byte mode needs a byte key, uniform over 0 - 255. Proper Usage: OTP(OTP.generate_key(int keyLength, True))")
+        if length > len(self.__byte_shifts):
+            raise InputError("The message must be shorter than the key. Proper Usage: obj.encrypt(bytes plaintext)")
+        return self.__byte_shifts[:length]
+
+    def __text_key(self) -> str:
+
+        if self.__key is None:
+            raise InputError("A byte key only encrypts bytes-like messages. Proper Usage: OTP(OTP.generate_key(int keyLength))")
+        return self.__key
+
+    def encryptor(self) -> CipherStream:
+        """
+        Creates an incremental encryption stream, see Stream.CipherStream. Each chunk uses the key from where the last one stopped.
+        """
+        return CipherStream(standard_encode, lambda text, offset, final: (self.__encrypt_text(text, offset), ''))
+
+    def decryptor(self) -> CipherStream:
+        """
+        Creates an incremental decryption stream, see Stream.CipherStream. Each chunk uses the key from where the last one stopped.
+        """
+        return CipherStream(check_ciphertext, lambda text, offset, final: (self.__decrypt_text(text, offset), ''))
+
+    def __key_slice(self, offset: int, length: int) -> np.ndarray:
+
+        self.__text_key()
+        if offset + length > len(self.__shifts):
+            raise InputError("The message is longer than the key. A One-Time Pad key must be at least as long as the message.")
+
+        return self.__shifts[offset:offset + length]
+
+    def __encrypt_text(self, plaintext: str, offset: int = 0) -> str:
 
-        plaintext = []
+        plaintext = text_to_array(plaintext)
+        return array_to_text((plaintext + self.__key_slice(offset, len(plaintext))) % 26 + 65) # 65 is ASCII of A
 
-        for x in range(len(ciphertext)):
-            toAdd = ((ord(ciphertext[x]) - ord(self.__key[x]) + 26) % 26) + 65 # 65 is ASCII of A
-            plaintext.append(chr(toAdd))
+    def __decrypt_text(self, ciphertext: str, offset: int = 0) -> str:
 
-        return ''.join(plaintext)
+        ciphertext = text_to_array(ciphertext)
+        return array_to_text((ciphertext + 26 - self.__key_slice(offset, len(ciphertext))) % 26 + 65) # + 26 keeps the unsigned arithmetic from wrapping
     
+    # Parallel hooks, see Shard.Shardable
+    def _pad(self, length: int, encrypt: bool) -> str:
+        self.__key_slice(0, length) # fail before any work is sent out if the key is too short
+        return ''
+
+    def _split_key(self, length: int) -> tuple:
+        return self.__key_slice(0, length), OTP('') # an empty key, the workers attach the shifts from shared memory
+
+    def _attach_key(self, key) -> None:
+        self.__shifts = key
+
+    def _transform(self, text: str, offset: int, encrypt: bool) -> str:
+        return self.__encrypt_text(text, offset) if encrypt else self.__decrypt_text(text, offset)
+
     @staticmethod
-    def generate_key(length : int) -> string:
-       characters = string.ascii_uppercase
-       return ''.join(secrets.choice(characters) for _ in range(length))
+    def generate_key(length : int, binary: bool = False) -> string:
+       """
+       Generates a random key of @param length letters, or, if @param binary, of @param length bytes from os.urandom for byte mode
+       """
+       return os.urandom(length) if binary else array_to_text(_random_letters(length))
+
+
+
+def _lock(f) -> None:
+
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    else:
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1) # retries for 10 seconds, then raises
+
+class OTPPad:
+    """
+    A One-Time Pad backed by a pad file of upper case letters, which can be far larger than memory. The file is memory mapped
+    and consumed from an offset that is persisted next to it, so no part of the pad is ever used twice. Both sides of the
+    conversation hold a copy of the pad file and consume it in the same order.
+
+    Every reservation of pad reads the persisted offset and writes the new one under an exclusive lock on a lock file next to
+    it, so any number of OTPPad objects and processes can share one pad file without ever being handed the same letters.
+    """
+
+    CHUNK_SIZE = 1 << 20 # letters encrypted per step, and read per step by the file methods
+
+    def __init__(self, filename: str, offset_filename: str = None):
+        """
+        Opens a pad file.
+
+        @param: filename - the pad file, see OTPPad.generate
+        @param: offset_filename - the file the offset is persisted in, defaults to filename + ".offset"
+
+        @return: none
+        """
+
+        self.__offset_filename = offset_filename if offset_filename is not None else filename + ".offset"
+        self.__lock_filename = self.__offset_filename + ".lock"
+
+        with open(filename, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                raise InputError("The pad file is empty. Create one with OTPPad.generate(string filename, int length)")
+            self.__map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @staticmethod
+    def generate(filename: str, length: int) -> None:
+        """
+        Writes a new pad file of random upper case letters, chunk by chunk.
+
+        @param: filename - the file to be written to
+        @param: length - the number of letters in the pad
+
+        @return: none
+        """
+
+        with open(filename, 'wb') as f:
+            for start in range(0, length, OTPPad.CHUNK_SIZE):
+                f.write(_random_letters(min(OTPPad.CHUNK_SIZE, length - start)).tobytes())
+
+    def offset(self) -> int:
+        """
+        Returns the position of the first unused letter of the pad, as persisted, so reservations by other objects count
+        """
+        return self.__read_offset()
+
+    def remaining(self) -> int:
+        """
+        Returns the number of unused letters left in the pad
+        """
+        return len(self.__map) - self.__read_offset()
+
+    def encrypt(self, plaintext: str) -> str:
+        """
+        Encrypts the plaintext with the next unused part of the pad, and marks that part as used.
+
+        @param: plaintext - a string. A pad of letters cannot encrypt bytes, use OTP with a byte key for those
+
+        @return: the ciphertext
+        """
+
+        if isinstance(plaintext, BINARY_TYPES):
+            raise InputError("A pad of letters cannot encrypt bytes. Proper Usage: OTP(OTP.generate_key(int keyLength, True)).encrypt(bytes plaintext)")
+
+        if not isinstance(plaintext, str):
+            raise InputError("Plaintext must be a string. Proper Usage: obj.encrypt(string plaintext)")
+
+        plaintext = standard_encode(plaintext)
+        start = self.__reserve_offset(len(plaintext))
+        return ''.join(self.__encrypt_chunk(plaintext[x:x + self.CHUNK_SIZE], start + x) for x in range(0, len(plaintext), self.CHUNK_SIZE))
+
+    def decrypt(self, ciphertext: str, offset: int = None) -> str:
+        """
+        Decrypts the ciphertext with the next unused part of the pad and marks that part as used, or, if an offset is given,
+        with the part of the pad starting at that offset (without changing the persisted offset).
+
+        @param: ciphertext - a string
+        @param: offset - optional, the position in the pad that the ciphertext was encrypted at
+
+        @return: the plaintext
+        """
+
+        ciphertext = check_ciphertext(ciphertext)
+        start = self.__reserve_offset(len(ciphertext)) if offset is None else offset
+        return ''.join(self.__decrypt_chunk(ciphertext[x:x + self.CHUNK_SIZE], start + x) for x in range(0, len(ciphertext), self.CHUNK_SIZE))
+
+    def encrypt_file(self, source: str, destination: str) -> None:
+        """
+        Encrypts a text file chunk by chunk, so neither the file nor the pad has to fit in memory.
+
+        @param: source - the plaintext file
+        @param: destination - the file the ciphertext is written to
+
+        @return: none
+        """
+
+        with open(source, 'r') as src, open(destination, 'w') as dst:
+            for chunk in iter(lambda: src.read(self.CHUNK_SIZE), ''):
+                chunk = standard_encode(chunk)
+                dst.write(self.__encrypt_chunk(chunk, self.__reserve_offset(len(chunk))))
+
+    def decrypt_file(self, source: str, destination: str) -> None:
+        """
+        Decrypts a ciphertext file chunk by chunk, consuming the pad like decrypt().
+
+        @param: source - the ciphertext file
+        @param: destination - the file the plaintext is written to
+
+        @return: none
+        """
+
+        # Whitespace around the ciphertext is dropped, as by Parallel.decrypt_file, inner whitespace is still rejected
+        started, pending = False, ''
+        with open(source, 'r') as src, open(destination, 'w') as dst:
+            for chunk in iter(lambda: src.read(self.CHUNK_SIZE), ''):
+                text = pending + chunk
+                text = text if started else text.lstrip()
+                pending = text[len(text.rstrip()):] # held back until more letters follow, so the end of the file drops it
+                text = text[:len(text) - len(pending)]
+                if not text:
+                    continue
+                started = True
+                if not is_encoded(text):
+                    raise InputError("Ciphertext must strictly contain upper case letters. Proper Usage: obj.decrypt_file(string source, string destination)")
+                dst.write(self.__decrypt_chunk(text, self.__reserve_offset(len(text))))
+
+    def close(self) -> None:
+        """
+        Releases the memory map of the pad file
+        """
+        self.__map.close()
+
+    def __pad(self, offset: int, length: int) -> np.ndarray:
+
+        if offset < 0 or offset + length > len(self.__map):
+            raise InputError("Not enough pad left: " + str(length) + " letters requested at offset " + str(offset) + ", the pad has " + str(len(self.__map)) + ".")
+
+        pad = np.frombuffer(self.__map, dtype=np.uint8, count=length, offset=offset) # a view of the mapping, nothing is copied
+        if ((pad < 65) | (pad > 90)).any():
+            raise InputError("The pad file must only contain upper case letters.")
+
+        return pad
+
+    def __read_offset(self) -> int:
+
+        if not os.path.exists(self.__offset_filename):
+            return 0
+        with open(self.__offset_filename, 'r') as f:
+            return int(f.read().strip() or 0)
+
+    def __reserve_offset(self, length: int) -> int:
+        """
+        Marks the next @param length letters of the pad as used, persisting the new offset before any of them are used. The
+        offset is read and written under the lock, never cached, as other objects may have reserved pad since.
+        """
+
+        with open(self.__lock_filename, 'a') as lock: # the lock is released when the file is closed
+            _lock(lock)
+            start = self.__read_offset()
+            if start + length > len(self.__map):
+                raise InputError("Not enough pad left: " + str(length) + " letters requested, " + str(len(self.__map) - start) + " remaining.")
+
+            temporary = self.__offset_filename + ".tmp"
+            with open(temporary, 'w') as f:
+                f.write(str(start + length))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporary, self.__offset_filename)
+
+        return start
+
+    def __encrypt_chunk(self, plaintext: str, offset: int) -> str:
+
+        plaintext = text_to_array(plaintext)
+        return array_to_text((plaintext + self.__pad(offset, len(plaintext))) % 26 + 65) # pad and text are both ASCII, 65 + 65 = 130 is a multiple of 26
+
+    def __decrypt_chunk(self, ciphertext: str, offset: int) -> str:
+
+        ciphertext = text_to_array(ciphertext)
+        return array_to_text((ciphertext + 26 - self.__pad(offset, len(ciphertext))) % 26 + 65) # ciphertext + 26 is always above the pad letter
 
 
 
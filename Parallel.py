@@ -0,0 +1,215 @@
+from Errors import InputError
+from Shard import Shardable
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import os
+
+DEFAULT_THRESHOLD = 1 << 20 # messages shorter than this (in letters) are not worth starting processes for
+SHARDS_PER_WORKER = 4 # a few shards per worker, so one slow worker does not hold up the rest
+FILE_CHUNK = 1 << 24 # characters read at a time by encrypt_file and decrypt_file
+
+_worker_cipher = None # the cipher of the pool's worker processes, sent once per worker by _init_worker
+_worker_key_block = None
+
+def _init_worker(cipher, key_name: str, key_length: int) -> None:
+    global _worker_cipher, _worker_key_block
+    _worker_cipher = cipher
+    if key_name is not None: # the key split off by Shardable._split_key, see _map
+        _worker_key_block = shared_memory.SharedMemory(name=key_name)
+        key = np.ndarray((key_length,), dtype=np.uint8, buffer=_worker_key_block.buf)
+        key.setflags(write=False)
+        _worker_cipher._attach_key(key)
+
+def _run_shard(source_name: str, destination_name: str, start: int, end: int, encrypt: bool) -> None:
+    """
+
+    Worker side: transforms the letters [start, end) of the shared source buffer into the shared destination buffer.
+
+    """
+
+    # Workers share the parent's resource tracker, so attaching here does not hand ownership of the blocks to the worker
+    source = shared_memory.SharedMemory(name=source_name)
+    destination = shared_memory.SharedMemory(name=destination_name)
+    try:
+        text = bytes(source.buf[start:end]).decode('ascii')
+        destination.buf[start:end] = _worker_cipher._transform(text, start, encrypt).encode('ascii')
+    finally:
+        source.close()
+        destination.close()
+
+def _check(cipher, workers: int) -> int:
+
+    if not isinstance(cipher, Shardable):
+        raise InputError(type(cipher).__name__ + " cannot be split into independent shards. Supported: Caesar, Affine, SimpleSubstitution, Vigenere, OTP, Hill, RectangularTransposition")
+
+    if workers is not None and (not isinstance(workers, int) or workers < 1):
+        raise InputError("workers must be a positive integer, or None to use every core.")
+
+    return workers or os.cpu_count() or 1
+
+def _map(cipher, source, destination, length: int, encrypt: bool, workers: int) -> None:
+
+    # Shards start at multiples of the key period / block size, so every shard sees the key exactly as a serial pass would
+    period = cipher._period()
+    shard = max(-(-length // (workers * SHARDS_PER_WORKER)), 1)
+    shard = -(-shard // period) * period
+
+    # A key as long as the message (OTP) goes to the workers through shared memory like the message, instead of being pickled
+    # with the cipher for every worker
+    key, cipher = cipher._split_key(length)
+    block = None if key is None else shared_memory.SharedMemory(create=True, size=max(len(key), 1))
+    try:
+        initargs = (cipher, None, 0)
+        if block is not None:
+            np.ndarray((len(key),), dtype=np.uint8, buffer=block.buf)[...] = key
+            initargs = (cipher, block.name, len(key))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as pool:
+            futures = [pool.submit(_run_shard, source.name, destination.name, start, min(start + shard, length), encrypt)
+                       for start in range(0, length, shard)]
+            for future in futures:
+                future.result()
+    finally:
+        if block is not None:
+            block.close()
+            block.unlink()
+
+def _run(cipher, text: str, encrypt: bool, workers: int, threshold: int) -> str:
+
+    workers = _check(cipher, workers)
+    if not isinstance(text, str):
+        raise InputError("The message must be a string. Proper Usage: Parallel.encrypt(cipher, string plaintext)")
+
+    text = cipher._prepare(text, encrypt)
+    text += cipher._pad(len(text), encrypt)
+    length = len(text)
+
+    if cipher._period() is None or workers == 1 or length < max(threshold, 1) or not text.isascii():
+        return cipher._transform(text, 0, encrypt)
+
+    source = shared_memory.SharedMemory(create=True, size=length)
+    destination = shared_memory.SharedMemory(create=True, size=length)
+    try:
+        source.buf[:length] = text.encode('ascii')
+        del text
+        _map(cipher, source, destination, length, encrypt, workers)
+        return bytes(destination.buf[:length]).decode('ascii')
+    finally:
+        for block in (source, destination):
+            block.close()
+            block.unlink()
+
+def _load(cipher, source_file: str, block, size: int, encrypt: bool) -> int:
+    """
+
+    Prepares a file a chunk at a time straight into a shared block, then pads it.
+
+    @return: the length of the prepared text, or None if it does not fit in the first size bytes of the block as ASCII.
+
+    """
+
+    length, pending = 0, ''
+    with open(source_file, 'r') as f:
+        for chunk in iter(lambda: f.read(FILE_CHUNK), ''):
+            text = pending + chunk
+            if not encrypt: # whitespace around the ciphertext is dropped, inner whitespace is still rejected
+                text = text if length else text.lstrip()
+                pending = text[len(text.rstrip()):]
+                text = text[:len(text) - len(pending)]
+            text = cipher._prepare(text, encrypt)
+            if not text.isascii() or length + len(text) > size:
+                return None
+            block.buf[length:length + len(text)] = text.encode('ascii')
+            length += len(text)
+
+    padding = cipher._pad(length, encrypt)
+    block.buf[length:length + len(padding)] = padding.encode('ascii')
+    return length + len(padding)
+
+def _run_file(cipher, source_file: str, destination_file: str, encrypt: bool, workers: int, threshold: int) -> None:
+
+    workers = _check(cipher, workers)
+    period = cipher._period()
+    size = os.path.getsize(source_file)
+
+    if period is not None and workers > 1 and size >= max(threshold, 1):
+        # Encoding never makes ASCII text longer, so the file size plus one period of padding bounds the prepared text
+        source = shared_memory.SharedMemory(create=True, size=size + period)
+        destination = shared_memory.SharedMemory(create=True, size=size + period)
+        try:
+            length = _load(cipher, source_file, source, size, encrypt)
+            if length is not None:
+                _map(cipher, source, destination, length, encrypt, workers)
+                with open(destination_file, 'wb') as f:
+                    f.write(destination.buf[:length])
+                return
+        finally:
+            for block in (source, destination):
+                block.close()
+                block.unlink()
+
+    # Small files, ciphers without a period and text that is not ASCII once prepared are done in memory
+    with open(source_file, 'r') as f:
+        text = f.read() if encrypt else f.read().strip()
+    with open(destination_file, 'w') as f:
+        f.write(_run(cipher, text, encrypt, workers, threshold))
+
+def encrypt(cipher, plaintext: str, workers: int = None, threshold: int = DEFAULT_THRESHOLD) -> str:
+    """
+
+    Encrypts a large plaintext across a pool of processes. The output is identical to cipher.encrypt(plaintext).
+
+    @param: cipher - a Caesar, Affine, SimpleSubstitution, Vigenere, OTP, Hill or RectangularTransposition object
+    @param: plaintext - the plaintext, as a string
+    @param: workers - the number of worker processes, defaults to the number of cores
+    @param: threshold - encoded plaintexts shorter than this many letters are encrypted in this process
+
+    @return: the ciphertext, as a string
+
+    """
+
+    return _run(cipher, plaintext, True, workers, threshold)
+
+def decrypt(cipher, ciphertext: str, workers: int = None, threshold: int = DEFAULT_THRESHOLD) -> str:
+    """
+
+    Decrypts a large ciphertext across a pool of processes. The output is identical to cipher.decrypt(ciphertext).
+
+    @param: cipher - a Caesar, Affine, SimpleSubstitution, Vigenere, OTP, Hill or RectangularTransposition object
+    @param: ciphertext - the ciphertext, as a string
+    @param: workers - the number of worker processes, defaults to the number of cores
+    @param: threshold - ciphertexts shorter than this many letters are decrypted in this process
+
+    @return: the plaintext, as a string
+
+    """
+
+    return _run(cipher, ciphertext, False, workers, threshold)
+
+def encrypt_file(cipher, source: str, destination: str, workers: int = None, threshold: int = DEFAULT_THRESHOLD) -> None:
+    """
+
+    Encrypts a text file across a pool of processes, see encrypt.
+
+    @param: source - the plaintext file
+    @param: destination - the file the ciphertext is written to
+
+    @return: none
+
+    """
+
+    _run_file(cipher, source, destination, True, workers, threshold)
+
+def decrypt_file(cipher, source: str, destination: str, workers: int = None, threshold: int = DEFAULT_THRESHOLD) -> None:
+    """
+
+    Decrypts a ciphertext file across a pool of processes, see decrypt.
+
+    @param: source - the ciphertext file
+    @param: destination - the file the plaintext is written to
+
+    @return: none
+
+    """
+
+    _run_file(cipher, source, destination, False, workers, threshold)
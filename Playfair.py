@@ -1,8 +1,65 @@
 import string
-from Encode import standard_encode
+from Encode import standard_encode, text_to_array, array_to_text, is_encoded
 from Errors import InputError
 import secrets
 from collections import OrderedDict
+import numpy as np
+from Stream import CipherStream
+
+def digraph_table(square, encrypt = True) -> np.ndarray:
+    """
+
+    Computes the result of the Playfair rules for every possible pair of letters of a key square at once.
+
+    @param: square - the 25 letters of the key square, row by row.
+    @param: encrypt - True for the encryption table, False for the decryption table.
+
+    @return: A (26, 26, 2) uint8 array, where entry [a, b] holds the ASCII codes of the pair that the letters with alphabet
+             indices a and b (A = 0) transform into. J is treated as I.
+
+    """
+
+    offset = 1 if encrypt else -1
+
+    square_codes = np.frombuffer(''.join(square).encode('ascii'), dtype=np.uint8)
+    position = np.zeros(26, dtype=np.int64)
+    position[square_codes - 65] = np.arange(25)
+    position[9] = position[8] # J -> I
+
+    first, second = np.meshgrid(position, position, indexing='ij')
+    first_row, first_col, second_row, second_col = first // 5, first % 5, second // 5, second % 5
+    same_row = first_row == second_row
+    same_col = ~same_row & (first_col == second_col)
+
+    new_first = np.where(same_row, first_row * 5 + (first_col + offset) % 5,
+                np.where(same_col, ((first_row + offset) % 5) * 5 + first_col, first_row * 5 + second_col))
+    new_second = np.where(same_row, second_row * 5 + (second_col + offset) % 5,
+                 np.where(same_col, ((second_row + offset) % 5) * 5 + second_col, second_row * 5 + first_col))
+
+    return np.stack((square_codes[new_first], square_codes[new_second]), axis=-1)
+
+def _pair_up(plaintext: np.ndarray) -> np.ndarray:
+    """
+
+    Splits an encoded plaintext into Playfair pairs, inserting an X after the first letter of any pair that would be a doubled
+    letter. Only the positions of doubled letters are visited, the rest is handled by numpy.
+
+    @param: plaintext - the ASCII codes of the encoded plaintext, with J already replaced by I.
+
+    @return: The ASCII codes of the paired plaintext. If its length is odd, the last letter is still waiting for its partner.
+
+    """
+
+    doubles = np.flatnonzero(plaintext[:-1] == plaintext[1:])
+    inserts = []
+    start = 0 # position where the current run of pairs started
+
+    for position in doubles.tolist():
+        if position >= start and (position - start) % 2 == 0: # the doubled letters would land in the same pair
+            inserts.append(position + 1)
+            start = position + 1
+
+    return np.insert(plaintext, inserts, ord('X'))
 
 class Playfair:
 
@@ -16,12 +73,14 @@ class Playfair:
             if not char.isalpha():
                 raise InputError("Key must be an alphabetic string. Proper Usage: Playfair(string key)")
         
+        if not key.isascii():
+            raise InputError("Key must only contain letters from the English alphabet. Proper Usage: Playfair(string key)")
+
         alphabet_minus_J = "ABCDEFGHIKLMNOPQRSTUVWXYZ"
         self.__cord_to_letter = list(OrderedDict.fromkeys(standard_encode(key).replace('J', 'I') + alphabet_minus_J))
 
-        self.__letter_to_cord = {x: (i // 5, i % 5) for i, x in enumerate(self.__cord_to_letter)}
-        
-        
+        self.__encryption_table = digraph_table(self.__cord_to_letter)
+        self.__decryption_table = digraph_table(self.__cord_to_letter, encrypt=False)
         
        
     def changeKey(self, newKey: str) -> None:
@@ -34,10 +93,14 @@ class Playfair:
             if not char.isalpha():
                 raise InputError("Key must be an alphabetic string. Proper Usage: RectangularTransposition(string key)")
 
+        if not newKey.isascii():
+            raise InputError("Key must only contain letters from the English alphabet. Proper Usage: obj.changeKey(string key)")
+
         alphabet_minus_J = "ABCDEFGHIKLMNOPQRSTUVWXYZ"
         self.__cord_to_letter = list(OrderedDict.fromkeys(standard_encode(newKey).replace('J', 'I') + alphabet_minus_J))
 
-        self.__letter_to_cord = {x: (i // 5, i % 5) for i, x in enumerate(self.__cord_to_letter)}
+        self.__encryption_table = digraph_table(self.__cord_to_letter)
+        self.__decryption_table = digraph_table(self.__cord_to_letter, encrypt=False)
         
     # Plaintext must be a string
     def encrypt(self, plaintext: str) -> str:
@@ -45,30 +108,11 @@ class Playfair:
         if not isinstance(plaintext, str):
             raise InputError("Plaintext must be a string. Proper Usage: obj.encrypt(string plaintext)")
 
-        # encode text for encryption
-        plaintext = standard_encode(plaintext).replace("J", "I")
-        plaintext_pairs = []
-        i = 0
-        while i < len(plaintext):
-            if i == len(plaintext) - 1:
-                plaintext_pairs.append((plaintext[i], "X"))
-                i += 1
-            elif plaintext[i] == plaintext[i + 1]:
-                plaintext_pairs.append((plaintext[i], "X"))
-                i += 1
-            else:
-                plaintext_pairs.append((plaintext[i], plaintext[i + 1]))
-                i += 2
-        
-        ciphertext = []
-
-        for pair in plaintext_pairs:
-            new_pair = self.__transform(pair)
-            ciphertext.append(new_pair[0])
-            ciphertext.append(new_pair[1])
-
+        paired = _pair_up(text_to_array(self.__encode_plaintext(plaintext)))
+        if len(paired) % 2 == 1:
+            paired = np.append(paired, np.uint8(ord('X')))
 
-        return ''.join(ciphertext)
+        return self.__substitute(paired, self.__encryption_table)
 
     # Ciphertext must be a string with all upper case alphabetic characters with no spaces
     def decrypt(self, ciphertext: str) -> str:
@@ -79,54 +123,80 @@ class Playfair:
         if (len(ciphertext) % 2 == 1):
             raise InputError("Ciphertext must be a string that can be split pairwise (length multiple of 2). Proper Usage: obj.decrypt(string ciphertext)")
 
-        for char in ciphertext:
-            if not char.isupper() or char == "J":
-                raise InputError("Ciphertext must strictly contain upper case letters, excluding J. Proper Usage: obj.decrypt(string ciphertext)")
-            
-        
-
         # We expect that the string can already be split pairwise at this point
-        
-        plaintext = []
-        i = 0
+        return self.__substitute(self.__check_pairs(text_to_array(self.__check_ciphertext(ciphertext))), self.__decryption_table)
+
+    def encryptor(self) -> CipherStream:
+        """
+        Creates an incremental encryption stream, see Stream.CipherStream. A letter that is still waiting for its partner is
+        kept until the next chunk, so X is inserted exactly where encrypt() would insert it.
+        """
+
+        def process(text: str, offset: int, final: bool) -> tuple:
+            paired = _pair_up(text_to_array(text))
+            leftover = ''
+            if len(paired) % 2 == 1:
+                if final:
+                    paired = np.append(paired, np.uint8(ord('X')))
+                else:
+                    paired, leftover = paired[:-1], text[-1]
+            return self.__substitute(paired, self.__encryption_table), leftover
+
+        return CipherStream(self.__encode_plaintext, process)
+
+    def decryptor(self) -> CipherStream:
+        """
+        Creates an incremental decryption stream, see Stream.CipherStream. A letter that is still waiting for its partner is
+        kept until the next chunk, and finalize() rejects a ciphertext of odd length.
+        """
+
+        def process(text: str, offset: int, final: bool) -> tuple:
+            if final and len(text) % 2 == 1:
+                raise InputError("Ciphertext must be a string that can be split pairwise (length multiple of 2). Proper Usage: obj.decrypt(string ciphertext)")
+            cut = len(text) - len(text) % 2
+            return self.__substitute(self.__check_pairs(text_to_array(text[:cut])), self.__decryption_table), text[cut:]
+
+        return CipherStream(self.__check_ciphertext, process)
+
+    def __encode_plaintext(self, plaintext: str) -> str:
 
-        while i < len(ciphertext):
+        # encode text for encryption
+        plaintext = standard_encode(plaintext).replace("J", "I")
+        if not plaintext.isascii():
+            raise InputError("Plaintext must only contain letters from the English alphabet. Proper Usage: obj.encrypt(string plaintext)")
 
-            if ciphertext[i] == ciphertext[i + 1]:
-                raise InputError("Pairs must be two different letters. Encountered pair: " + (ciphertext[i], ciphertext[i + 1]))
-            
-            pair = (ciphertext[i], ciphertext[i + 1])
-            new_pair = self.__transform(pair, encrypt=False)
+        return plaintext
 
-            plaintext.append(new_pair[0])
-            plaintext.append(new_pair[1])
+    def __check_ciphertext(self, ciphertext: str) -> str:
 
-            i += 2
+        if not ciphertext.isascii() or not is_encoded(ciphertext) or "J" in ciphertext:
+            raise InputError("Ciphertext must strictly contain upper case letters, excluding J. Proper Usage: obj.decrypt(string ciphertext)")
 
-       
-        return ''.join(plaintext)
-    
+        return ciphertext
 
-    def __transform(self, letters :tuple, encrypt = True):
+    def __check_pairs(self, ciphertext: np.ndarray) -> np.ndarray:
 
-        offset = 1 if encrypt else -1
+        pairs = ciphertext.reshape(-1, 2)
+        doubled = np.flatnonzero(pairs[:, 0] == pairs[:, 1])
+        if len(doubled):
+            raise InputError("Pairs must be two different letters. Encountered pair: " + array_to_text(pairs[doubled[0]]))
 
-        first_letter_coord, second_letter_coord = self.__letter_to_cord[letters[0]], self.__letter_to_cord[letters[1]]
+        return pairs
 
-        if (first_letter_coord[0] == second_letter_coord[0]):
-            new_first = (first_letter_coord[0], (first_letter_coord[1] + offset) % 5)
-            new_second = (second_letter_coord[0], (second_letter_coord[1] + offset) % 5)
-        elif (first_letter_coord[1] == second_letter_coord[1]):
-            new_first = ((first_letter_coord[0] + offset) % 5, first_letter_coord[1])
-            new_second = ((second_letter_coord[0] + offset) % 5, second_letter_coord[1])
-        else:
-            new_first = (first_letter_coord[0], second_letter_coord[1])
-            new_second = (second_letter_coord[0], first_letter_coord[1])
+    def __substitute(self, pairs: np.ndarray, table: np.ndarray) -> str:
+        """
 
+        Looks every pair of the message up in a digraph table at once.
 
-        return (self.__cord_to_letter[new_first[0] * 5 + new_first[1]], self.__cord_to_letter[new_second[0] * 5 + new_second[1]])
+        @param: pairs - the ASCII codes of the message, with an even length.
+        @param: table - the encryption or decryption table of the key square, see digraph_table.
 
-        
+        @return: The transformed message as a string.
+
+        """
+
+        pairs = pairs.reshape(-1, 2) - 65
+        return array_to_text(table[pairs[:, 0], pairs[:, 1]])
 
     @staticmethod
     def generate_key(length : int) -> string:
@@ -1,7 +1,43 @@
 import math
 import secrets 
-from sympy import primefactors
-from Errors import InputError
+import time
+import os
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+from Errors import InputError, SearchError
+
+SIEVE_LIMIT = 1 << 16 # candidates are sieved by the odd primes below this, the first 6541 primes
+SIEVE_WINDOW = 1 << 12 # odd candidates sieved at once
+PARALLEL_THRESHOLD = 512 # primes shorter than this (in bits) are found before a pool of processes would start
+
+_worker_stop = None # set by the parent of the pool's worker processes once it has every prime it needs, see _init_worker
+_worker_examined = None # the candidates examined by every worker together, counted against the shared tries budget
+
+def _small_primes(limit: int) -> np.ndarray:
+
+    sieve = np.ones(limit, dtype=bool)
+    sieve[:2] = False
+    for p in range(2, math.isqrt(limit - 1) + 1):
+        if sieve[p]:
+            sieve[p * p::p] = False
+    return np.flatnonzero(sieve)
+
+SMALL_PRIMES = _small_primes(SIEVE_LIMIT)
+_SIEVE_PRIMES = SMALL_PRIMES[1:] # odd primes, the candidates are odd
+_HALVES = (_SIEVE_PRIMES + 1) // 2 # the inverse of 2 mod each odd prime
+_TRIAL_PRODUCT = math.prod(SMALL_PRIMES[SMALL_PRIMES < 1000].tolist()) # isPrime rules out every small factor with one gcd
+
+PRIMALITY_METHODS = ('bpsw', 'miller_rabin')
+GROUP_TRIES = 10 ** 7 # candidates, a 2048 bit safe prime takes about 400000 on average
+DETERMINISTIC_WITNESSES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41) # no composite below DETERMINISTIC_LIMIT passes them all
+DETERMINISTIC_LIMIT = 3317044064679887385961981
+
+P_MINUS_1_BOUND = 10000 # Pollard's p - 1 method finds the factors p of which p - 1 has no prime power above this
+RHO_ITERATIONS = 1 << 20 # the steps Pollard Brent rho takes before factor gives up, enough for factors of about 40 bits
+FACTOR_CACHE_SIZE = 64 # the moduli whose factorization of p - 1 is remembered, see remember_factors
+_FACTOR_CACHE = OrderedDict() # p -> the distinct prime factors of p - 1, least recently used first
 
 def bin_exp_mod(a: int, m: int, n: int) -> int:
     """
@@ -51,7 +87,8 @@ def miller_rabin_Test(n: int, witness: int, d: int, s: int) -> bool:
 
     """
 
-    An implementation of the miller rabin test with a singular witness
+    An implementation of the miller rabin test with a singular witness. witness^d is the only full exponentiation, every later
+    power witness^(2^r * d) is the square of the one before it.
     
     @param: n - the number for which is being checked for it's primality
     @param: witness - a potential witness for the primality of n
@@ -62,39 +99,116 @@ def miller_rabin_Test(n: int, witness: int, d: int, s: int) -> bool:
 
     """
 
-    if pow(witness, d, n) == 1: # First condition witness^d congruent to 1 mod n
+    x = pow(witness, d, n)
+    if x == 1 or x == n - 1: # First condition witness^d congruent to +-1 mod n
         return True
-    power_of_2 = 1
-    for _ in range(s): # Check if witness^[(each power of two less than 2^s-1) * d] is congruent to -1 mod n
-        if pow(witness, power_of_2 * d, n) == n-1:
+    for _ in range(s - 1): # Check if witness^[(each power of two less than 2^s) * d] is congruent to -1 mod n
+        x = x * x % n
+        if x == n - 1:
             return True
-        power_of_2 *= 2
+        if x == 1: # 1 can only square to 1 from here on
+            return False
 
     return False # If no statement is true, witness is a witness to the compositeness of n
 
-def isPrime(n: int, num_witnesses = 12) -> bool: 
+def jacobi(a: int, n: int) -> int:
+    """
+
+    Calculates the Jacobi symbol (a/n) by quadratic reciprocity.
+
+    @param: a - any integer
+    @param: n - a positive odd integer
+
+    @return: 1, -1 or 0 (when a and n share a factor)
 
     """
 
-    A probablistic test to determine whether a number is prime, with a false positive rate of 4^(-num_witnesses)
+    a %= n
+    result = 1
+    while a:
+        while a % 2 == 0:
+            a //= 2
+            if n % 8 in (3, 5):
+                result = -result
+        a, n = n, a
+        if a % 4 == 3 and n % 4 == 3:
+            result = -result
+        a %= n
+    return result if n == 1 else 0
+
+def strong_lucas_Test(n: int) -> bool:
+    """
+
+    The strong Lucas probable prime test, with the parameters of Selfridge's method A: D is the first of 5, -7, 9, -11, ... with
+    (D/n) = -1, P = 1 and Q = (1 - D) / 4. Together with a base 2 Miller Rabin Test this is the Baillie PSW test.
+
+    @param: n - an odd number larger than the D tried, ie with no small factors
+
+    @return: True if n is a strong Lucas probable prime, False if it is composite
+
+    """
+
+    if math.isqrt(n) ** 2 == n: # no D would have (D/n) = -1
+        return False
+
+    D = 5
+    while (symbol := jacobi(D, n)) != -1:
+        if symbol == 0:
+            return False
+        D = -D - 2 if D > 0 else -D + 2
+    Q = (1 - D) // 4
+
+    d, s = decompose(n + 2) # n + 1 = (2^s) * d
+    U, V, Q_k = 0, 2, 1 # U_k, V_k and Q^k mod n, from k = 0 up to k = d by its bits
+    for bit in bin(d)[2:]:
+        U, V, Q_k = U * V % n, (V * V - 2 * Q_k) % n, Q_k * Q_k % n # k -> 2k
+        if bit == '1': # 2k -> 2k + 1, halving mod n
+            U, V = U + V, D * U + V
+            U, V = (U + n if U % 2 else U) // 2 % n, (V + n if V % 2 else V) // 2 % n
+            Q_k = Q_k * Q % n
+
+    if U == 0 or V == 0:
+        return True
+    for _ in range(s - 1): # V_(2^r * d) for r < s
+        V, Q_k = (V * V - 2 * Q_k) % n, Q_k * Q_k % n
+        if V == 0:
+            return True
+    return False
+
+def isPrime(n: int, num_witnesses = 12, method = 'bpsw') -> bool: 
+
+    """
+
+    Determines whether a number is prime. Numbers below 2^16 are looked up and numbers with a factor below 1000 are rejected
+    with a single gcd. Below DETERMINISTIC_LIMIT the Miller Rabin Test with the witnesses DETERMINISTIC_WITNESSES is exact.
+    Above it, 'bpsw' runs the Baillie PSW test, a base 2 Miller Rabin Test and a strong Lucas Test, which has no known
+    counterexample, and 'miller_rabin' runs the Miller Rabin Test with num_witnesses random witnesses, with a false positive
+    rate of 4^(-num_witnesses).
     
     @param: n - the number for which is being checked for it's primality
-    @param: num_witnesses - the number of witnesses to be chosen to check for the primality of n
+    @param: num_witnesses - the number of random witnesses for the 'miller_rabin' method
+    @param: method - 'bpsw' or 'miller_rabin', the test for numbers of DETERMINISTIC_LIMIT and above
 
     @return: True if n is prime, False if not. Has a very high chance of being correct.
 
     """
 
+    if method not in PRIMALITY_METHODS:
+        raise InputError("method must be one of " + ", ".join(PRIMALITY_METHODS) + ".")
+
     # Base Cases
-    if n <= 1:
-        return False
-    if n <= 3:
-        return True
-    if n % 2 == 0:
+    if n < SIEVE_LIMIT:
+        return n >= 2 and bool(SMALL_PRIMES[min(np.searchsorted(SMALL_PRIMES, n), len(SMALL_PRIMES) - 1)] == n)
+    if math.gcd(n, _TRIAL_PRODUCT) != 1:
         return False
     
     d, s = decompose(n)
 
+    if n < DETERMINISTIC_LIMIT:
+        return all(miller_rabin_Test(n, witness, d, s) for witness in DETERMINISTIC_WITNESSES)
+    if method == 'bpsw':
+        return miller_rabin_Test(n, 2, d, s) and strong_lucas_Test(n)
+
     for _ in range(num_witnesses): # runs the miller rabin test num_witness amount of times
         curr_witness = secrets.randbelow(n - 4) + 2
         if not miller_rabin_Test(n, curr_witness, d, s):
@@ -103,49 +217,501 @@ def isPrime(n: int, num_witnesses = 12) -> bool:
     return True
 
     
-def generate_prime(bits: int, num_witnesses = 12, tries = 10000) -> int:
+def _sieve_window(residues: np.ndarray, primes: np.ndarray, inverses: np.ndarray, targets: list, size: int) -> np.ndarray:
+    """
+
+    Sieves the window of candidates start, start + step, ..., start + (size - 1) * step by the small primes.
+
+    @param: residues - start mod each prime.
+    @param: primes - the odd primes to sieve by, all smaller than start and coprime to step.
+    @param: inverses - the inverse of step mod each prime.
+    @param: targets - a list of arrays of residues mod each prime, a candidate congruent to any of them is struck out. [0] for
+                      the candidates divisible by a small prime.
+    @param: size - the number of candidates.
+
+    @return: The steps k (candidate start + k * step) that survive.
+
     """
 
-    Generates a prime number that is @param bits long, ie between 2^(bits - 1) and 2^(bits) - 1
+    # the first step whose candidate hits each target, then every p-th step after it
+    first = np.concatenate([(target - residues) * inverses % primes for target in targets])
+    moduli = np.tile(primes, len(targets))
+    hits = np.maximum((size - 1 - first) // moduli + 1, 0)
+    starts = np.cumsum(hits) - hits
+    steps = np.repeat(first, hits) + (np.arange(hits.sum()) - np.repeat(starts, hits)) * np.repeat(moduli, hits)
+
+    composite = np.zeros(size, dtype=bool)
+    composite[steps] = True
+    return np.flatnonzero(~composite)
+
+def _candidates(bits: int, form) -> tuple:
+    """
+
+    Describes the candidates of a search for a prime of @param bits bits of the given form: they are start + k * step in [low, high),
+    with start = 1 mod step, sieved against the residues in targets.
+
+    @return: (low, high, step, primes, inverses, targets), see _sieve_window
+
+    """
+
+    if form is None: # odd numbers
+        low, high, step = 2 ** (bits - 1), 2 ** bits, 2
+    elif form == 'safe': # the odd q of p = 2q + 1
+        low, high, step = 2 ** (bits - 2), 2 ** (bits - 1), 2
+    else: # p = 1 + 2kq
+        low, high, step = 2 ** (bits - 1), 2 ** bits, 2 * form
+
+    used = _SIEVE_PRIMES < low # a small prime can only rule out candidates larger than itself
+    if step != 2: # and only those of a step it does not divide
+        used &= np.array([step % int(p) != 0 for p in _SIEVE_PRIMES])
+    primes = _SIEVE_PRIMES[used]
+    inverses = _HALVES[used] if step == 2 else np.array([pow(step, -1, int(p)) for p in primes], dtype=np.int64)
+    targets = [np.zeros(len(primes), dtype=np.int64)]
+    if form == 'safe': # 2q + 1 = 0 when q = (p - 1) / 2, as 2q + 1 needs no small factor either
+        targets.append((primes - 1) // 2)
+    return low, high, step, primes, inverses, targets
+
+def _test(candidate: int, form, num_witnesses: int, method: str) -> int:
+
+    if form != 'safe':
+        return candidate if isPrime(candidate, num_witnesses, method) else None
+    # Pocklington: once q is prime, q > sqrt(p) makes p = 2q + 1 prime if 2^(p - 1) = 1 mod p and 3 = 2^2 - 1 is coprime to p
+    p = 2 * candidate + 1
+    return p if isPrime(candidate, num_witnesses, method) and p % 3 != 0 and pow(2, p - 1, p) == 1 else None
+
+def _init_worker(stop, examined) -> None:
+    global _worker_stop, _worker_examined
+    _worker_stop, _worker_examined = stop, examined
+
+def _claim(examined, size: int, tries: int, used: int) -> int:
+
+    if examined is None: # a search on its own, only its own candidates count
+        return min(size, tries - used)
+    with examined.get_lock():
+        size = min(size, tries - examined.value)
+        examined.value += max(size, 0)
+    return size
+
+def _stopped(stop, deadline: float) -> bool:
+    return (stop is not None and stop.is_set()) or (deadline is not None and time.monotonic() > deadline)
+
+def _search(bits: int, num_witnesses: int, tries: int, method: str, deadline: float, form = None, stop = None, examined = None) -> tuple:
+    """
+
+    Searches for one prime of @param bits bits. The search starts at a random candidate and walks up, keeping the residues of the
+    candidate modulo the small primes, so whole windows of candidates are sieved with numpy and only the survivors get a primality
+    test. The residues are advanced, never recomputed. If the walk reaches 2^bits it starts again somewhere else.
+
+    @param: bits, num_witnesses, method, form - see generate_prime
+    @param: tries - the budget of candidates, of this search alone, or of every search sharing @param examined
+    @param: deadline - the time.monotonic() time to give up at, None for no limit
+    @param: stop - a multiprocessing Event, the search gives up once it is set
+    @param: examined - a shared multiprocessing Value counting the candidates of every search, None to count alone
+
+    @return: (prime, stats), prime is None if the search gave up. stats is a dict of the process id, the candidates examined,
+             the primality tests run, the primes found and the seconds taken.
+
+    """
+
+    started = time.perf_counter()
+    stats = {'pid': os.getpid(), 'candidates': 0, 'tests': 0, 'primes': 0, 'seconds': 0.0}
+    low, high, step, primes, inverses, targets = _candidates(bits, form)
+    shift = np.array([step * SIEVE_WINDOW % int(p) for p in primes], dtype=np.int64) # a window moves each residue by this much
+
+    prime, spent = None, False
+    while prime is None and not spent and not _stopped(stop, deadline):
+        start = low + secrets.randbelow(high - low)
+        start -= (start - 1) % step # the candidates are 1 mod step
+        if start < low:
+            start += step
+        residues = np.array([start % int(p) for p in primes], dtype=np.int64)
+
+        while prime is None and not spent and start < high:
+            size = min(SIEVE_WINDOW, (high - 1 - start) // step + 1) # stays below high
+            claimed = 0
+            # candidates are claimed from the tries up to each survivor as it is reached, so the budget counts exactly the
+            # candidates examined, and giving up is checked per test, within one test of being cancelled
+            for k in _sieve_window(residues, primes, inverses, targets, size).tolist() + [None]: # None claims the rest of the window
+                end = size if k is None else k + 1
+                if _stopped(stop, deadline):
+                    break
+                granted = _claim(examined, end - claimed, tries, stats['candidates'])
+                stats['candidates'] += granted
+                claimed += granted
+                if claimed < end:
+                    spent = True
+                    break
+                if k is not None:
+                    stats['tests'] += 1
+                    prime = _test(start + k * step, form, num_witnesses, method)
+                    if prime is not None:
+                        break
+
+            if _stopped(stop, deadline):
+                break
+            start += step * SIEVE_WINDOW
+            residues = (residues + shift) % primes
+
+    stats['primes'] = int(prime is not None)
+    stats['seconds'] = time.perf_counter() - started
+    return prime, stats
+
+def _run_search(bits: int, num_witnesses: int, tries: int, method: str, deadline: float, form) -> tuple:
+    return _search(bits, num_witnesses, tries, method, deadline, form, _worker_stop, _worker_examined)
+
+def _check_search(bits: int, method: str, tries: int, timeout: float, form) -> None:
+
+    if not isinstance(bits, int) or bits < 2:
+        raise InputError("bits must be an integer of at least 2.")
+    if form == 'safe' and bits < 3:
+        raise InputError("A safe prime has at least 3 bits.")
+    if form is not None and form != 'safe':
+        if not isinstance(form, int) or form < 2 or not isPrime(form):
+            raise InputError("form must be None, 'safe', or a prime q for a prime p = kq + 1.")
+        if form.bit_length() > bits - 2:
+            raise InputError("A prime p = kq + 1 needs at least 2 more bits than q.")
+    if method not in PRIMALITY_METHODS:
+        raise InputError("method must be one of " + ", ".join(PRIMALITY_METHODS) + ".")
+    if not isinstance(tries, int) or tries < 1:
+        raise InputError("tries must be a positive integer.")
+    if timeout is not None and (not isinstance(timeout, (int, float)) or timeout <= 0):
+        raise InputError("timeout must be a positive number of seconds, or None for no limit.")
+
+def _worker_stats(runs: list) -> list:
+
+    workers = {}
+    for run in runs:
+        total = workers.setdefault(run['pid'], {'pid': run['pid'], 'searches': 0, 'candidates': 0, 'tests': 0, 'primes': 0, 'seconds': 0.0})
+        total['searches'] += 1
+        for key in ('candidates', 'tests', 'primes', 'seconds'):
+            total[key] += run[key]
+    return sorted(workers.values(), key=lambda total: total['pid'])
+
+def _search_error(found: list, count: int, tries: int, stats: list) -> SearchError:
+
+    reason = "Tries exhausted" if sum(worker['candidates'] for worker in stats) >= tries else "Timed out"
+    return SearchError(reason + " after finding " + str(len(found)) + " of " + str(count) + " primes, increase the tries or timeout parameters, or modify the other inputs", stats)
+
+def generate_prime(bits: int, num_witnesses = 12, tries = 10000, method = 'bpsw', timeout = None, form = None) -> int:
+    """
+
+    Generates a prime number that is @param bits long, ie between 2^(bits - 1) and 2^(bits) - 1. The search starts at a random odd
+    number and walks up by 2, keeping the residues of the candidate modulo the small primes, so whole windows of candidates are
+    sieved with numpy and only the survivors get the Miller Rabin Test. The residues are advanced, never recomputed. See
+    generate_primes to search on every core.
+
+    A safe prime p = 2q + 1 is found by walking over q instead: a q survives the sieve only if neither q nor 2q + 1 has a small
+    factor, and p is proven prime from q with one exponentiation. A prime p = kq + 1 for a given prime q walks over p in steps of 2q.
 
     @param: bits - the desired bit length of the prime
     @param: num_witnesses - the number of desired witnesses to validate the primality of a candidate prime using the Miller Rabin Test
-    @param: tries - the number of potential candidates generated
+    @param: tries - the number of potential candidates examined
+    @param: method - the primality test of the survivors, see isPrime
+    @param: timeout - the seconds to search for, None for no limit
+    @param: form - None for any prime, 'safe' for a safe prime p = 2q + 1 with q prime, or a prime q for a prime p = kq + 1
 
-    @return: a number that is prime that has a bit length of @param bits
+    @return: a number that is prime that has a bit length of @param bits, raises SearchError once the tries or time run out
 
     """
-    low_bound = 2 ** (bits - 1)
-    for _ in range(tries):
-        num = secrets.randbits(bits)
-        if num < low_bound:
-            num += low_bound
-        if num % 2 == 0:
-            num += 1
-        if isPrime(num, num_witnesses):
-            return num
-    
-    raise RuntimeError("Tries exhausted, increase the tries parameter, or modify the other inputs")
 
+    _check_search(bits, method, tries, timeout, form)
+    deadline = None if timeout is None else time.monotonic() + timeout
 
-def is_primitive_root(g: int, p: int) -> bool:
+    prime, stats = _search(bits, num_witnesses, tries, method, deadline, form)
+    if prime is None:
+        raise _search_error([], 1, tries, _worker_stats([stats]))
+    return prime
+
+def generate_primes(bits: int, count = 1, workers = None, num_witnesses = 12, tries = 10000, method = 'bpsw', timeout = None, form = None) -> tuple:
     """
-    Determines whether g is a primitive root of p
 
-    @param: g - the candidate primitive root
+    Generates distinct primes of @param bits bits with independent searches across a pool of processes, see generate_prime. The
+    time to find a prime varies a lot from one random start to the next, so every worker searches from its own start, the first
+    @param count primes found win, and the rest of the searches are cancelled. Every search shares the one tries budget.
+
+    @param: bits - the desired bit length of the primes
+    @param: count - the number of primes
+    @param: workers - the number of worker processes, None to use every core. Primes shorter than PARALLEL_THRESHOLD bits are
+                      searched for in this process.
+    @param: num_witnesses, method, form - see generate_prime
+    @param: tries - the number of potential candidates examined, by every worker together
+    @param: timeout - the seconds to search for, None for no limit
+
+    @return: (primes, stats), the list of primes in the order they were found, and a list of dicts of every worker: its process
+             id, the searches it ran, the candidates it examined, the primality tests it ran, the primes it found and the seconds
+             it searched for. Raises SearchError, with the stats, once the tries or time run out.
+
+    """
+
+    _check_search(bits, method, tries, timeout, form)
+    if not isinstance(count, int) or count < 1:
+        raise InputError("count must be a positive integer.")
+    if workers is not None and (not isinstance(workers, int) or workers < 1):
+        raise InputError("workers must be a positive integer, or None to use every core.")
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    workers = workers or os.cpu_count() or 1
+    found, runs = [], []
+
+    if workers == 1 or bits < PARALLEL_THRESHOLD:
+        while len(found) < count:
+            prime, stats = _search(bits, num_witnesses, tries - sum(run['candidates'] for run in runs), method, deadline, form)
+            runs.append(stats)
+            if prime is None:
+                raise _search_error(found, count, tries, _worker_stats(runs))
+            if prime not in found:
+                found.append(prime)
+        return found, _worker_stats(runs)
+
+    stop, examined = multiprocessing.Event(), multiprocessing.Value('q', 0)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(stop, examined)) as pool:
+        pending = {pool.submit(_run_search, bits, num_witnesses, tries, method, deadline, form) for _ in range(workers)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                prime, stats = future.result()
+                runs.append(stats)
+                if prime is None or len(found) == count: # out of tries or time, or cancelled
+                    continue
+                if prime not in found:
+                    found.append(prime)
+                if len(found) == count:
+                    stop.set()
+                else: # this worker is free, start it on another search
+                    pending.add(pool.submit(_run_search, bits, num_witnesses, tries, method, deadline, form))
+
+    if len(found) < count:
+        raise _search_error(found, count, tries, _worker_stats(runs))
+    return found, _worker_stats(runs)
+
+
+def generate_group(bits: int, q_bits = None, workers = None, tries = GROUP_TRIES, timeout = None) -> tuple:
+    """
+
+    Generates the parameters of a prime order subgroup for DH and ElGamal: a prime p of @param bits bits, a prime q that divides
+    p - 1, and a generator g of the subgroup of order q. Without @param q_bits, p is a safe prime 2q + 1, otherwise p = kq + 1 is
+    the modulus of a Schnorr group with a q of @param q_bits bits, which is much faster to find and to exponentiate in.
+
+    @param: bits - the bit length of p
+    @param: q_bits - None for a safe prime, or the bit length of q
+    @param: workers - the number of worker processes, None to use every core, see generate_primes
+    @param: tries - the number of potential candidates examined
+    @param: timeout - the seconds to search for, None for no limit
+
+    @return: (p, q, g), raises SearchError once the tries or time run out
+
+    """
+
+    if q_bits is None:
+        p = generate_primes(bits, 1, workers, tries=tries, timeout=timeout, form='safe')[0][0]
+        q = (p - 1) // 2
+    else:
+        if not isinstance(q_bits, int) or not 2 <= q_bits <= bits - 2:
+            raise InputError("q_bits must be an integer between 2 and bits - 2.")
+        q = generate_prime(q_bits, timeout=timeout)
+        p = generate_primes(bits, 1, workers, tries=tries, timeout=timeout, form=q)[0][0]
+
+    h = 2
+    while (g := pow(h, (p - 1) // q, p)) == 1: # h^((p - 1) / q) has order q unless it is 1
+        h += 1
+    return p, q, g
+
+def is_generator(g: int, p: int, q: int) -> bool:
+    """
+    Determines whether g generates the subgroup of prime order q of the integers mod p, with a single exponentiation
+
+    @param: g - the candidate generator
     @param: p - the prime number
+    @param: q - a prime that divides p - 1
 
-    @return: bool, true if g is a primitive root, false if not
+    @return: bool, true if g has order q, false if not
 
     """
     if not isPrime(p):
         raise InputError(str(p)+ " is not a prime number.")
+    if not isPrime(q) or (p - 1) % q != 0:
+        raise InputError(str(q)+ " is not a prime factor of p - 1.")
+
+    return 1 < g < p and pow(g, q, p) == 1 # q is prime, so any g other than 1 with g^q = 1 has order q
+
+def pollard_p_minus_1(n: int, bound = P_MINUS_1_BOUND) -> int:
+    """
+
+    Pollard's p - 1 method: 2^E - 1, where E is the product of every prime power up to @param bound, is divisible by every prime
+    factor p of n for which p - 1 divides E.
+
+    @param: n - an odd composite number
+    @param: bound - the largest prime power of p - 1
+
+    @return: a nontrivial factor of n, or None if there is none to find this way
+
+    """
+
+    a = 2
+    for prime in SMALL_PRIMES[SMALL_PRIMES <= bound].tolist():
+        a = pow(a, prime ** int(math.log(bound, prime)), n)
+    divisor = math.gcd(a - 1, n)
+    return divisor if 1 < divisor < n else None
+
+def pollard_brent(n: int, iterations = RHO_ITERATIONS) -> int:
+    """
+
+    Brent's variant of Pollard's rho method: walks y -> y^2 + c mod n, which cycles mod a factor p of n after about sqrt(p) steps,
+    and finds p as the gcd of n and the product of a batch of differences, one gcd per batch.
+
+    @param: n - an odd composite number
+    @param: iterations - the steps to take, over every choice of c, before giving up
+
+    @return: a nontrivial factor of n, or None if none was found in time
+
+    """
+
+    batch = 128
+    while iterations > 0:
+        y, c = secrets.randbelow(n - 1) + 1, secrets.randbelow(n - 1) + 1
+        divisor, r, product = 1, 1, 1
+        while divisor == 1 and iterations > 0:
+            x = y
+            for _ in range(r):
+                y = (y * y + c) % n
+            k = 0
+            while k < r and divisor == 1:
+                saved = y
+                for _ in range(min(batch, r - k)):
+                    y = (y * y + c) % n
+                    product = product * (x - y) % n
+                divisor = math.gcd(product, n)
+                k += batch
+            iterations -= 2 * r
+            r *= 2
+
+        if divisor == n: # the batch overshot, step through it again one gcd at a time
+            divisor = 1
+            while divisor == 1:
+                saved = (saved * saved + c) % n
+                divisor = math.gcd(abs(x - saved), n)
+        if 1 < divisor < n:
+            return divisor
+    return None
+
+def factor(n: int, iterations = RHO_ITERATIONS) -> dict:
+    """
+
+    Factors n: trial division by SMALL_PRIMES, then Pollard's p - 1 method and Pollard Brent rho on what is left, splitting until
+    every factor passes isPrime. This finds any factorization where all but the largest factor are small, as for most p - 1.
+
+    @param: n - a positive integer
+    @param: iterations - the steps of Pollard Brent rho per split, see pollard_brent
+
+    @return: a dict of every prime factor and its exponent, smallest first, raises SearchError if a composite factor cannot be split
+
+    """
+
+    if not isinstance(n, int) or n < 1:
+        raise InputError("n must be a positive integer.")
+
+    factors = {}
+    for prime in SMALL_PRIMES.tolist():
+        if prime * prime > n:
+            break
+        while n % prime == 0:
+            n //= prime
+            factors[prime] = factors.get(prime, 0) + 1
+
+    remaining = [n] if n > 1 else []
+    while remaining:
+        m = remaining.pop()
+        if isPrime(m):
+            factors[m] = factors.get(m, 0) + 1
+            continue
+        root = math.isqrt(m) # rho is slow on squares of large primes
+        divisor = root if root * root == m else pollard_p_minus_1(m) or pollard_brent(m, iterations)
+        if divisor is None:
+            raise SearchError("Could not split " + str(m) + ", pass its factorization as a hint instead, see remember_factors")
+        remaining += [divisor, m // divisor]
+
+    return dict(sorted(factors.items()))
+
+def prime_factors(n: int) -> list:
+    """
+
+    @param: n - a positive integer
+
+    @return: the distinct prime factors of n, smallest first, see factor
+
+    """
+
+    return list(factor(n))
+
+def _order_factors(p: int, factors: list) -> list:
+    """
+
+    The distinct prime factors of p - 1, checking that p is prime, through a cache of the last FACTOR_CACHE_SIZE moduli: a group
+    used for many keys is checked and factored once.
+
+    """
+
+    if factors is None and p in _FACTOR_CACHE:
+        _FACTOR_CACHE.move_to_end(p)
+        return _FACTOR_CACHE[p]
+
+    if not isinstance(p, int) or not isPrime(p):
+        raise InputError(str(p)+ " is not a prime number.")
+
+    if factors is not None: # a hint, checked by dividing p - 1 by every factor until nothing is left
+        remaining = p - 1
+        for prime in set(factors):
+            if not isinstance(prime, int) or prime < 2 or remaining % prime != 0 or not isPrime(prime):
+                raise InputError("factors must be the distinct prime factors of p - 1.")
+            while remaining % prime == 0:
+                remaining //= prime
+        if remaining != 1:
+            raise InputError("factors must include every prime factor of p - 1.")
+        factors = sorted(set(factors))
+    elif p > 5 and isPrime((p - 1) // 2): # a safe prime, p - 1 = 2q
+        factors = [2, (p - 1) // 2]
+    else:
+        factors = prime_factors(p - 1)
+
+    _FACTOR_CACHE[p] = factors
+    _FACTOR_CACHE.move_to_end(p)
+    if len(_FACTOR_CACHE) > FACTOR_CACHE_SIZE:
+        _FACTOR_CACHE.popitem(last=False)
+    return factors
+
+def remember_factors(p: int, factors: list) -> None:
+    """
+    Gives the distinct prime factors of p - 1, for a prime p whose p - 1 is too hard to factor, or to skip factoring it. They are
+    checked and remembered, so DH, ElGamal_Key, is_primitive_root and find_primitive_root can use p without factoring p - 1.
+
+    @param: p - the prime number
+    @param: factors - every distinct prime factor of p - 1
+
+    @return: none
+
+    """
+
+    if factors is None:
+        raise InputError("factors must be the distinct prime factors of p - 1.")
+    _order_factors(p, factors)
+
+def is_primitive_root(g: int, p: int, factors = None) -> bool:
+    """
+    Determines whether g is a primitive root of p, with one exponentiation per prime factor of p - 1
+
+    @param: g - the candidate primitive root
+    @param: p - the prime number
+    @param: factors - the distinct prime factors of p - 1 if they are known, otherwise p - 1 is factored, or taken from the factors
+                      remembered for p, see remember_factors. A safe prime is recognised without factoring.
+
+    @return: bool, true if g is a primitive root, false if not
+
+    """
+    factors_of_p_minus_1 = _order_factors(p, factors)
     
     if math.gcd(g, p) != 1:
         return False
     
-    factors_of_p_minus_1 = primefactors(p - 1)
-    
     for q in factors_of_p_minus_1:
         if pow(g, (p - 1) // q, p) == 1:
             return False
@@ -153,20 +719,18 @@ def is_primitive_root(g: int, p: int) -> bool:
     return True
 
 
-def find_primitive_root(p):
+def find_primitive_root(p, factors = None):
     """
     Finds the smallest primitive root of prime number p
 
     @param: p - the prime number
+    @param: factors - the distinct prime factors of p - 1, see is_primitive_root
 
     @return: int, the smallest primitive root of prime number p
 
     """
-    if not isPrime(p):
-        raise InputError(str(p)+ " is not a prime number.")
-    
+    pf = _order_factors(p, factors)
     phi_p = p - 1 
-    pf = primefactors(phi_p)
     
     for g in range(2, p):
         is_primitive_root = True
@@ -238,20 +238,22 @@ class RSA_key():
 
 
 
-def generate_primes(size: int) -> list:
+def generate_primes(size: int, workers = None, timeout = None) -> list:
     """
 
-    Generate two primes that have a product of @param size or size - 1 bits
+    Generate two distinct primes that have a product of @param size or size - 1 bits. p and q are searched for at the same time,
+    across a pool of processes, see Primes.generate_primes
 
     @param: size - the size of the product of the two primes (which will become the modulus n)
+    @param: workers - the number of worker processes, None to use every core
+    @param: timeout - the seconds to search for, None for no limit, raises Errors.SearchError once it runs out
 
     @return: the two primes as a list, [p, q]
 
     """
     prime_size = size // 2
-    p = Primes.generate_prime(prime_size)
-    q = Primes.generate_prime(prime_size)
-    return [p, q]
+    primes, _ = Primes.generate_primes(prime_size, 2, workers=workers, timeout=timeout)
+    return primes
 
 
 
@@ -0,0 +1,40 @@
+from Encode import standard_encode, check_ciphertext
+from abc import ABC, abstractmethod
+
+class Shardable(ABC):
+    """
+    The hooks a cipher implements to be run by Parallel. The message is prepared (encoded or validated) and padded in the
+    calling process, cut into shards that start at multiples of the period, and every shard is transformed in a worker
+    process. The defaults suit the ciphers that substitute every letter on its own; a cipher only has to provide _transform.
+
+    _period() - the key period or block size, shards start at its multiples. None if the cipher moves letters across the
+                whole message, which is then transformed in the calling process.
+    _prepare(text, encrypt) - encodes a plaintext (see Encode.standard_encode) or checks a ciphertext. Files are prepared a
+                              chunk at a time, so preparing the parts of a text and joining them must give the prepared text.
+    _pad(length, encrypt) - the padding that follows a prepared text of length letters, or an InputError if no text of that
+                            length can be transformed (a ciphertext that is not a whole number of blocks, a key too short).
+    _split_key(length) - (key, cipher): a uint8 array of the key the first length letters use, which reaches the workers
+                         through shared memory, and a copy of the cipher without it, which is pickled for them. (None, self)
+                         for the ciphers whose key is small enough to pickle.
+    _attach_key(key) - gives the copy from _split_key its key back in the worker, as a view of the shared memory.
+    _transform(text, offset, encrypt) - encrypts or decrypts a shard that starts at letter offset of the prepared text.
+    """
+
+    def _period(self) -> int:
+        return 1
+
+    def _prepare(self, text: str, encrypt: bool) -> str:
+        return standard_encode(text) if encrypt else check_ciphertext(text)
+
+    def _pad(self, length: int, encrypt: bool) -> str:
+        return ''
+
+    def _split_key(self, length: int) -> tuple:
+        return None, self
+
+    def _attach_key(self, key) -> None:
+        pass
+
+    @abstractmethod
+    def _transform(self, text: str, offset: int, encrypt: bool) -> str:
+        pass
@@ -0,0 +1,502 @@
+from Encode import standard_encode, letter_values
+from Errors import InputError
+from NGrams import ngram_codes, log_probabilities
+from Cryptanalysis import check_attack_ciphertext, rank_scores, score_counts
+from Sub import SimpleSubstitution
+from Playfair import Playfair, digraph_table
+from Hill import Hill, inverse_mod_26
+from Transposition import RectangularTransposition
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import mmap
+import os
+
+DEFAULT_RESTARTS = 8
+KICKS = 10 # perturbations of the best key per restart, before giving up on it
+KICK_SWAPS = 3
+QUADGRAM_WEIGHTS = np.array([26 ** 3, 26 ** 2, 26, 1]) # quadgram abcd is entry 26^3 * a + 26^2 * b + 26 * c + d of a table
+
+_worker_table = None # the score table of the pool's worker processes, attached once per worker by _init_worker
+_worker_block = None
+
+def _init_worker(name: str, shape: tuple, dtype: str, offset: int) -> None:
+    global _worker_table, _worker_block
+    if offset is not None: # the table is a mapped file, see NGrams.NGramStore, so every worker maps the same pages
+        _worker_table = np.memmap(name, dtype=dtype, mode='r', offset=offset, shape=shape)
+        return
+    _worker_block = shared_memory.SharedMemory(name=name)
+    _worker_table = np.ndarray(shape, dtype=dtype, buffer=_worker_block.buf)
+    _worker_table.setflags(write=False)
+
+def _run_task(function, task: tuple):
+    return function(_worker_table, *task)
+
+def _map_tasks(function, table: np.ndarray, tasks: list, workers: int) -> list:
+    """
+
+    Runs function(table, *task) for every task, across a pool of processes. The table is copied into shared memory once and
+    every worker maps it read only, so it is never pickled. A table that is already mapped from a file, like the tables of an
+    NGrams.NGramStore, is not copied at all, the workers map the file themselves.
+
+    @param: function - a module level function, so it can be sent to the workers.
+    @param: table - the score table shared by every task.
+    @param: tasks - a list of argument tuples.
+    @param: workers - the number of worker processes, None to use every core.
+
+    @return: The list of results, in the order of the tasks.
+
+    """
+
+    if workers is not None and (not isinstance(workers, int) or workers < 1):
+        raise InputError("workers must be a positive integer, or None to use every core.")
+
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers <= 1:
+        return [function(table, *task) for task in tasks]
+
+    if isinstance(table, np.memmap) and isinstance(table.base, mmap.mmap) and table.filename is not None:
+        initargs = (table.filename, table.shape, table.dtype.str, table.offset)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as pool:
+            return list(pool.map(_run_task, [function] * len(tasks), tasks))
+
+    block = shared_memory.SharedMemory(create=True, size=table.nbytes)
+    try:
+        np.ndarray(table.shape, dtype=table.dtype, buffer=block.buf)[...] = table
+        initargs = (block.name, table.shape, table.dtype.str, None)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as pool:
+            return list(pool.map(_run_task, [function] * len(tasks), tasks))
+    finally:
+        block.close()
+        block.unlink()
+
+def check_table(table: np.ndarray, size: int) -> np.ndarray:
+    """
+
+    Validates a table of n-gram log probabilities, the shared check of the attacks that score with one.
+
+    @param: table - the table to be checked, see quadgram_table.
+    @param: size - the number of entries it must have, 26 ** 4 for quadgrams.
+
+    @return: The table, if it is a flat numpy array of @param size entries, otherwise an InputError is raised.
+
+    """
+
+    if not isinstance(table, np.ndarray) or table.shape != (size,):
+        raise InputError("The score table must be a flat numpy array of " + str(size) + " log probabilities, see quadgram_table.")
+
+    return table
+
+def quadgram_codes(values: np.ndarray) -> np.ndarray:
+    """
+
+    Computes the table index of every quadgram of a text.
+
+    @param: values - the alphabet indices of the letters of the text (A = 0).
+
+    @return: An int64 array of len(values) - 3 indices, see QUADGRAM_WEIGHTS.
+
+    """
+
+    return ngram_codes(values, 4)
+
+def quadgram_table(corpus: str) -> np.ndarray:
+    """
+
+    Builds a quadgram log probability table from a sample of English text.
+
+    @param: corpus - any text, it is encoded with standard_encode first.
+
+    @return: A float32 array of the 26^4 base 10 log probabilities, quadgrams that never occur get the log of 0.01 occurrences.
+
+    """
+
+    if not isinstance(corpus, str):
+        raise InputError("The corpus must be a string. Proper Usage: quadgram_table(string corpus)")
+
+    corpus = standard_encode(corpus).encode('ascii', 'ignore').decode('ascii')
+    if len(corpus) < 4:
+        raise InputError("The corpus must contain at least 4 letters.")
+
+    return log_probabilities(np.bincount(quadgram_codes(letter_values(corpus)), minlength=26 ** 4))
+
+def _climb_substitution(table: np.ndarray, grams: np.ndarray, counts: np.ndarray, rows: list, seed) -> tuple:
+    """
+
+    One hill climbing run for break_substitution, from a random key. Swapping the plaintext letters of two ciphertext letters only
+    changes the quadgrams that contain one of them, so only those rows are rescored. Once no swap helps, the best key is kicked
+    with a few random swaps and climbed again, KICKS times.
+
+    @param: grams - the distinct quadgrams of the ciphertext, as a (M, 4) array of alphabet indices.
+    @param: counts - how often every distinct quadgram occurs.
+    @param: rows - rows[26 * x + y] holds the indices of the quadgrams that contain the ciphertext letter x or y, for x < y.
+    @param: seed - the seed of this run.
+
+    @return: A tuple (score, mapping), where mapping[c] is the plaintext letter of the ciphertext letter c.
+
+    """
+
+    rng = np.random.default_rng(seed)
+    pairs = [(x, y) for x in range(26) for y in range(x + 1, 26) if len(rows[26 * x + y])]
+    # Swapping the plaintext letters a and b of x and y adds (b - a) * (weight of x's positions - weight of y's positions) to a code
+    moves = []
+    for x, y in pairs:
+        affected = rows[26 * x + y]
+        weights = ((grams[affected] == x) @ QUADGRAM_WEIGHTS) - ((grams[affected] == y) @ QUADGRAM_WEIGHTS)
+        moves.append((x, y, affected, weights, counts[affected].astype(table.dtype)))
+    best_score, best_mapping = -np.inf, rng.permutation(26)
+
+    for kick in range(KICKS + 1):
+        mapping = best_mapping.copy()
+        if kick:
+            for pair in rng.choice(len(pairs), KICK_SWAPS):
+                x, y = pairs[pair]
+                mapping[x], mapping[y] = mapping[y], mapping[x]
+
+        codes = mapping[grams] @ QUADGRAM_WEIGHTS
+        score = float(counts @ table[codes])
+        letters = mapping.tolist() # plain ints are cheaper to read and swap in the loop
+
+        improved = True
+        while improved:
+            improved = False
+            for move in rng.permutation(len(moves)).tolist():
+                x, y, affected, weights, affected_counts = moves[move]
+
+                old_codes = codes[affected]
+                new_codes = old_codes + (letters[y] - letters[x]) * weights
+                delta = float(affected_counts @ (table[new_codes] - table[old_codes]))
+
+                if delta > 0:
+                    letters[x], letters[y] = letters[y], letters[x]
+                    codes[affected] = new_codes
+                    score += delta
+                    improved = True
+
+        if score > best_score:
+            best_score, best_mapping = score, np.array(letters)
+
+    return best_score, best_mapping
+
+def break_substitution(ciphertext: str, table: np.ndarray, restarts: int = DEFAULT_RESTARTS, workers: int = None) -> tuple:
+    """
+
+    Ciphertext only attack on SimpleSubstitution: hill climbing over key swaps, scored with quadgram statistics. The ciphertext is
+    reduced to its distinct quadgrams once, and independent random restarts run across a pool of processes.
+
+    @param: ciphertext - a SimpleSubstitution ciphertext, a few hundred letters are usually enough.
+    @param: table - the quadgram log probabilities, see quadgram_table.
+    @param: restarts - the number of independent hill climbing runs, the best one wins.
+    @param: workers - the number of worker processes, defaults to the number of cores.
+
+    @return: A tuple (key, plaintext), the key is usable as SimpleSubstitution(key).
+
+    """
+
+    ciphertext = check_attack_ciphertext(ciphertext)
+    table = check_table(table, 26 ** 4)
+
+    if len(ciphertext) < 4:
+        raise InputError("The ciphertext must contain at least 4 letters.")
+
+    if not isinstance(restarts, int) or restarts < 1:
+        raise InputError("restarts must be a positive integer.")
+
+    codes, counts = np.unique(quadgram_codes(letter_values(ciphertext)), return_counts=True)
+    grams = (codes[:, None] // QUADGRAM_WEIGHTS) % 26
+    contains = np.zeros((len(codes), 26), dtype=bool)
+    contains[np.arange(len(codes))[:, None], grams] = True
+    rows = [np.flatnonzero(contains[:, x] | contains[:, y]) if x < y else None for x in range(26) for y in range(26)]
+
+    seeds = np.random.SeedSequence().spawn(restarts)
+    results = _map_tasks(_climb_substitution, table, [(grams, counts, rows, seed) for seed in seeds], workers)
+    mapping = max(results, key=lambda result: result[0])[1]
+
+    key = ''.join(chr(65 + letter) for letter in np.argsort(mapping)) # key[p] is the ciphertext letter of the plaintext letter p
+    return key, SimpleSubstitution(key).decrypt(ciphertext)
+
+PLAYFAIR_ALPHABET = np.array([letter for letter in range(26) if letter != 9]) # the 25 letters of a Playfair square, J is merged into I
+DEFAULT_CHAINS = 4
+DEFAULT_ITERATIONS = 100000
+PLAYFAIR_TEMPERATURE = 0.01 # starting temperature per ciphertext letter, the score differences of a move grow with the text
+PLAYFAIR_REHEAT = 0.1 # chains that continue from an earlier best square start this much cooler, so they do not lose it
+
+# Playfair acts on the positions of the letters in the square the same way whatever the key, so the decryption rules are computed
+# once for the positions 0-24: _PLAYFAIR_POSITIONS[i, j] holds the positions that a pair at positions i and j decrypts to. A
+# candidate square then only needs its 25 entry inverse rebuilt, never a table of its own.
+def _playfair_positions() -> np.ndarray:
+    identity = digraph_table([chr(65 + letter) for letter in PLAYFAIR_ALPHABET], encrypt=False).astype(np.int64) - 65
+    positions = np.searchsorted(PLAYFAIR_ALPHABET, identity) # in the alphabetical square, position i holds PLAYFAIR_ALPHABET[i]
+    return positions[PLAYFAIR_ALPHABET][:, PLAYFAIR_ALPHABET]
+
+_PLAYFAIR_POSITIONS = _playfair_positions()
+
+def _playfair_score(table: np.ndarray, square: np.ndarray, first: np.ndarray, second: np.ndarray) -> float:
+
+    position = np.empty(26, dtype=np.int64)
+    position[square] = np.arange(25)
+    plaintext = square[_PLAYFAIR_POSITIONS[position[first], position[second]]].ravel()
+    return float(table[quadgram_codes(plaintext)].sum())
+
+def _playfair_move(square: np.ndarray, rng) -> np.ndarray:
+
+    square = square.copy()
+    move = rng.random()
+    if move < 0.9: # most moves swap two letters
+        i, j = rng.choice(25, 2, replace=False)
+        square[i], square[j] = square[j], square[i]
+        return square
+
+    grid = square.reshape(5, 5)
+    i, j = rng.choice(5, 2, replace=False)
+    if move < 0.94:
+        grid[[i, j]] = grid[[j, i]]
+    elif move < 0.98:
+        grid[:, [i, j]] = grid[:, [j, i]]
+    elif move < 0.99:
+        grid = grid[::-1]
+    elif move < 0.995:
+        grid = grid[:, ::-1]
+    else:
+        grid = grid.T
+    return grid.ravel().copy()
+
+def _anneal_playfair(table: np.ndarray, first: np.ndarray, second: np.ndarray, start: np.ndarray, iterations: int, seed) -> tuple:
+    """
+
+    One simulated annealing chain for break_playfair, cooling linearly from a temperature suited to the ciphertext length.
+    Chains that continue from an earlier square start cooler, see PLAYFAIR_REHEAT.
+
+    @param: first, second - the alphabet indices of the first and second letters of every ciphertext pair.
+    @param: start - the square to start from, or None for a random one.
+    @param: iterations - the number of candidate squares to try.
+    @param: seed - the seed of this chain.
+
+    @return: A tuple (score, square) of the best square seen.
+
+    """
+
+    rng = np.random.default_rng(seed)
+    square = rng.permutation(PLAYFAIR_ALPHABET) if start is None else start
+    score = _playfair_score(table, square, first, second)
+    best_score, best_square = score, square
+    temperature = PLAYFAIR_TEMPERATURE * 2 * len(first) * (1 if start is None else PLAYFAIR_REHEAT)
+    thresholds = rng.random(iterations)
+
+    for iteration in range(iterations):
+        candidate = _playfair_move(square, rng)
+        candidate_score = _playfair_score(table, candidate, first, second)
+
+        current = temperature * (1 - iteration / iterations)
+        if candidate_score >= score or (current > 0 and thresholds[iteration] < np.exp((candidate_score - score) / current)):
+            square, score = candidate, candidate_score
+            if score > best_score:
+                best_score, best_square = score, square
+
+    return best_score, best_square
+
+def break_playfair(ciphertext: str, table: np.ndarray, chains: int = DEFAULT_CHAINS, iterations: int = DEFAULT_ITERATIONS,
+                   rounds: int = 1, workers: int = None, checkpoint: str = None) -> tuple:
+    """
+
+    Ciphertext only attack on Playfair: simulated annealing over key squares, scored with quadgram statistics. Independent chains
+    run across a pool of processes. After every round, the best square so far is saved to the checkpoint file, and the next round
+    (or a later call with the same checkpoint) restarts every chain from it.
+
+    @param: ciphertext - a Playfair ciphertext, a few hundred letters are usually needed.
+    @param: table - the quadgram log probabilities, see quadgram_table.
+    @param: chains - the number of annealing chains per round.
+    @param: iterations - the number of candidate squares every chain tries.
+    @param: rounds - the number of rounds.
+    @param: workers - the number of worker processes, defaults to the number of cores.
+    @param: checkpoint - a file to keep the best square so far in, None to not keep one.
+
+    @return: A tuple (key, plaintext), the key is the 25 letter square, usable as Playfair(key).
+
+    """
+
+    ciphertext = check_attack_ciphertext(ciphertext)
+    table = check_table(table, 26 ** 4)
+
+    if len(ciphertext) % 2 == 1 or 'J' in ciphertext or len(ciphertext) < 4:
+        raise InputError("A Playfair ciphertext has an even length of at least 4, and contains no J.")
+
+    for name, value in (("chains", chains), ("iterations", iterations), ("rounds", rounds)):
+        if not isinstance(value, int) or value < 1:
+            raise InputError(name + " must be a positive integer.")
+
+    values = letter_values(ciphertext).astype(np.int64)
+    first, second = values[0::2], values[1::2]
+
+    start = None
+    if checkpoint is not None and os.path.exists(checkpoint):
+        with open(checkpoint, 'r') as f:
+            start = letter_values(standard_encode(f.readline())).astype(np.int64)
+        if sorted(start.tolist()) != PLAYFAIR_ALPHABET.tolist():
+            raise InputError("The checkpoint file does not hold a Playfair square.")
+
+    best_score, best_square = -np.inf, start
+    for _ in range(rounds):
+        seeds = np.random.SeedSequence().spawn(chains)
+        results = _map_tasks(_anneal_playfair, table, [(first, second, best_square, iterations, seed) for seed in seeds], workers)
+        score, square = max(results, key=lambda result: result[0])
+
+        if score > best_score:
+            best_score, best_square = score, square
+        if checkpoint is not None: # written to a temporary file first, so a crash never leaves half a square behind
+            with open(checkpoint + '.tmp', 'w') as f:
+                f.write(''.join(chr(65 + letter) for letter in best_square) + '\n' + str(best_score) + '\n')
+            os.replace(checkpoint + '.tmp', checkpoint)
+
+    key = ''.join(chr(65 + letter) for letter in best_square)
+    return key, Playfair(key).decrypt(ciphertext)
+
+HILL_CANDIDATE_ROWS = 10
+
+# The rows (a, b) that can be part of an invertible 2x2 matrix mod 26: not both even, and not both multiples of 13
+_HILL_ROWS = np.array([(a, b) for a in range(26) for b in range(26) if (a % 2 or b % 2) and (a % 13 or b % 13)])
+
+def break_hill(ciphertext: str, table: np.ndarray, method: str = "chi_squared") -> tuple:
+    """
+
+    Ciphertext only attack on 2x2 Hill. Row i of the decryption matrix alone decides letter i of every plaintext block, so instead
+    of trying all 26^4 matrices, every valid row is scored on its own by the letter frequencies it produces (all rows in one
+    batched product), and only the best HILL_CANDIDATE_ROWS rows are paired up and scored with quadgrams.
+
+    @param: ciphertext - a 2x2 Hill ciphertext, a few hundred letters are usually enough.
+    @param: table - the quadgram log probabilities, see quadgram_table.
+    @param: method - the scoring method for the rows, see Cryptanalysis.score_counts.
+
+    @return: A tuple (key, plaintext), the key is usable as Hill(key).
+
+    """
+
+    ciphertext = check_attack_ciphertext(ciphertext)
+    table = check_table(table, 26 ** 4)
+
+    if len(ciphertext) % 2 == 1 or len(ciphertext) < 4:
+        raise InputError("A 2x2 Hill ciphertext has an even length of at least 4.")
+
+    blocks = letter_values(ciphertext).astype(np.int64).reshape(-1, 2)
+
+    letters = (_HILL_ROWS @ blocks.T) % 26 # (rows, blocks), the letters every candidate row decrypts to
+    counts = np.bincount((np.arange(len(_HILL_ROWS))[:, None] * 26 + letters).ravel(), minlength=len(_HILL_ROWS) * 26)
+    scores = score_counts(counts.reshape(-1, 26), method)
+    best_rows = _HILL_ROWS[rank_scores(scores, method)[:HILL_CANDIDATE_ROWS]]
+
+    best_score, best_key = -np.inf, None
+    for first in best_rows:
+        for second in best_rows:
+            decryption_key = np.array([first, second])
+            key = inverse_mod_26(decryption_key)
+            if key is None:
+                continue
+
+            score = float(table[quadgram_codes(((blocks @ decryption_key.T) % 26).ravel())].sum())
+            if score > best_score:
+                best_score, best_key = score, key.tolist()
+
+    if best_key is None:
+        raise InputError("No invertible key found among the best rows, the ciphertext is too short.")
+
+    return best_key, Hill(best_key).decrypt(ciphertext)
+
+BEAM_WIDTH = 1000
+MAX_COLUMNS = 26 # a key has at most 26 distinct letters
+
+def bigram_table(table: np.ndarray) -> np.ndarray:
+    """
+
+    Derives bigram log probabilities from a quadgram table, by summing the probabilities of every quadgram that starts with the
+    bigram.
+
+    @param: table - the quadgram log probabilities, see quadgram_table.
+
+    @return: A (26, 26) float64 array of base 10 log probabilities, indexed [first letter, second letter].
+
+    """
+
+    table = check_table(table, 26 ** 4)
+    return np.log10((10.0 ** table.astype(np.float64)).reshape(676, 676).sum(axis=1)).reshape(26, 26)
+
+def _order_columns(adjacency: np.ndarray) -> tuple:
+    """
+
+    Beam search for the column order with the highest total adjacency score, i.e. the best path through every column. All partial
+    orders of the beam are extended by every unused column at once, and the best BEAM_WIDTH are kept.
+
+    @param: adjacency - a (k, k) array, entry [i, j] scores column j directly following column i.
+
+    @return: A tuple (score, order) of the best order found.
+
+    """
+
+    columns = len(adjacency)
+    paths = np.arange(columns)[:, None]
+    scores = np.zeros(columns)
+    used = np.eye(columns, dtype=bool)
+
+    for _ in range(columns - 1):
+        candidates = np.where(used, -np.inf, scores[:, None] + adjacency[paths[:, -1]]) # (beam, next column)
+        keep = np.argsort(candidates, axis=None)[::-1][:BEAM_WIDTH]
+        keep = keep[np.isfinite(candidates.ravel()[keep])]
+        beam, column = keep // columns, keep % columns
+
+        paths = np.concatenate((paths[beam], column[:, None]), axis=1)
+        scores = candidates[beam, column]
+        used = used[beam]
+        used[np.arange(len(beam)), column] = True
+
+    return float(scores[0]), paths[0]
+
+def break_transposition(ciphertext: str, table: np.ndarray, mode: str = "rows", max_columns: int = MAX_COLUMNS) -> tuple:
+    """
+
+    Ciphertext only attack on RectangularTransposition in "rows" or "columnar" mode. For every column count that divides the
+    ciphertext length, the ciphertext is cut into its columns and a (k, k) matrix scores every ordered pair of columns by the
+    bigrams they form when placed side by side. The best column order is then a path problem on that matrix alone (see
+    _order_columns), no candidate is ever decrypted. The column counts are compared by the quadgram score of their best order.
+
+    @param: ciphertext - a RectangularTransposition ciphertext.
+    @param: table - the quadgram log probabilities, see quadgram_table.
+    @param: mode - the mode the ciphertext was produced with, "rows" or "columnar".
+    @param: max_columns - the largest column count (key length) to try, at most 26.
+
+    @return: A tuple (key, plaintext), the key is usable as RectangularTransposition(key, mode).
+
+    """
+
+    ciphertext = check_attack_ciphertext(ciphertext)
+    table = check_table(table, 26 ** 4)
+
+    if mode not in ("rows", "columnar"):
+        raise InputError("Only the \"rows\" and \"columnar\" modes can be attacked.")
+
+    if not isinstance(max_columns, int) or not 1 <= max_columns <= MAX_COLUMNS:
+        raise InputError("max_columns must be an integer between 1 and " + str(MAX_COLUMNS) + ".")
+
+    values = letter_values(ciphertext).astype(np.int64)
+    bigrams = bigram_table(table)
+    best_score, best_permutation = -np.inf, np.arange(1)
+
+    for columns in range(1, min(max_columns, len(values)) + 1):
+        if len(values) % columns:
+            continue
+
+        # grid[r, i] is the letter of ciphertext column i in row r of the rectangle
+        grid = values.reshape(-1, columns) if mode == "rows" else values.reshape(columns, -1).T
+        adjacency = bigrams[grid[:, :, None], grid[:, None, :]].sum(axis=0)
+        _, order = _order_columns(adjacency)
+
+        plaintext = grid[:, order].ravel()
+        score = float(table[quadgram_codes(plaintext)].mean()) if len(plaintext) >= 4 else -np.inf
+        if score > best_score:
+            best_score, best_permutation = score, np.argsort(order) # ciphertext column i holds plaintext column permutation[i]
+
+    # _derive_permutation sorts the key letters, so the letter at key position permutation[i] must be the i-th smallest
+    key = [''] * len(best_permutation)
+    for rank, position in enumerate(best_permutation):
+        key[position] = chr(65 + rank)
+    key = ''.join(key)
+
+    return key, RectangularTransposition(key, mode).decrypt(ciphertext)
@@ -0,0 +1,64 @@
+from Errors import InputError
+
+class CipherStream:
+    """
+    Incremental (hashlib style) encryption or decryption, for messages that are too large to hold in memory as one string.
+    Streams are created by the encryptor() and decryptor() methods of the ciphers, and joining the outputs of every
+    update(chunk) call and of finalize() gives exactly the result of a single encrypt()/decrypt() call on the whole message.
+    """
+
+    def __init__(self, prepare, process):
+        """
+        Initializes the stream. Only ciphers are expected to call this.
+
+        @param: prepare - callable(chunk) -> str, encodes (encryption) or validates (decryption) each chunk.
+        @param: process - callable(text, offset, final) -> (output, leftover). text is the leftover of the previous call
+                          followed by the prepared chunk, and offset is the number of letters consumed before text. Letters
+                          that cannot be processed yet (a partial block, pair or row) are returned as leftover. On the final
+                          call, process applies the padding and must consume everything.
+
+        @return: none
+        """
+
+        self.__prepare = prepare
+        self.__process = process
+        self.__pending = ''
+        self.__offset = 0
+        self.__finalized = False
+
+    def update(self, chunk: str) -> str:
+        """
+        Feeds the next chunk of the message to the stream.
+
+        @param: chunk - the next part of the message, as a string.
+
+        @return: the output for every letter that can be processed so far, the rest is kept until the next call.
+        """
+
+        if self.__finalized:
+            raise InputError("The stream has already been finalized. Create a new one with obj.encryptor() or obj.decryptor()")
+
+        if not isinstance(chunk, str):
+            raise InputError("Chunk must be a string. Proper Usage: stream.update(string chunk)")
+
+        text = self.__pending + self.__prepare(chunk)
+        output, self.__pending = self.__process(text, self.__offset, False)
+        self.__offset += len(text) - len(self.__pending)
+        return output
+
+    def finalize(self) -> str:
+        """
+        Ends the message, applying padding to (or rejecting) any partial block that is left.
+
+        @param: none
+
+        @return: the output for the remaining letters.
+        """
+
+        if self.__finalized:
+            raise InputError("The stream has already been finalized. Create a new one with obj.encryptor() or obj.decryptor()")
+
+        output, _ = self.__process(self.__pending, self.__offset, True)
+        self.__pending = ''
+        self.__finalized = True
+        return output
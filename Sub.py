@@ -1,9 +1,10 @@
 import string
-from Encode import standard_encode
+from Encode import standard_encode, check_ciphertext, BINARY_TYPES
 from Errors import InputError
+from Shard import Shardable
 import secrets
 
-class SimpleSubstitution:
+class SimpleSubstitution(Shardable):
 
     # Key must have only one instance of each of the 26 letters (Uppercase or Lowercase)
     def __init__(self, key: str):
@@ -23,6 +24,10 @@ class SimpleSubstitution:
         self.encryption_table = str.maketrans(alphabet, key)
         self.decryption_table = str.maketrans(key, alphabet)
 
+        # Byte mode substitutes the bytes of the upper case letters and leaves the other 230 byte values in place
+        self.byte_encryption_table = bytes.maketrans(alphabet.encode('ascii'), key.encode('ascii'))
+        self.byte_decryption_table = bytes.maketrans(key.encode('ascii'), alphabet.encode('ascii'))
+
     # Key must have only one instance of each of the 26 letters (Uppercase or Lowercase)
     def changeKey(self, newKey: str) -> None:
 
@@ -39,10 +44,15 @@ class SimpleSubstitution:
         alphabet = string.ascii_uppercase
         self.encryption_table = str.maketrans(alphabet, newKey)
         self.decryption_table = str.maketrans(newKey, alphabet)
+        self.byte_encryption_table = bytes.maketrans(alphabet.encode('ascii'), newKey.encode('ascii'))
+        self.byte_decryption_table = bytes.maketrans(newKey.encode('ascii'), alphabet.encode('ascii'))
 
     # Plaintext must be a string
     def encrypt(self, plaintext: str) -> str:
 
+        if isinstance(plaintext, BINARY_TYPES):
+            return bytes(plaintext).translate(self.byte_encryption_table)
+
         if not isinstance(plaintext, str):
             raise InputError("Plaintext must be a string. Proper Usage: obj.encrypt(string plaintext)")
         
@@ -51,15 +61,15 @@ class SimpleSubstitution:
     # Ciphertext must be a string with all upper case alphabetic characters with no spaces
     def decrypt(self, ciphertext: str) -> str:
 
-        if not isinstance(ciphertext, str):
-            raise InputError("Ciphertext must be a string. Proper Usage: obj.decrypt(string ciphertext)")
-        
-        for char in ciphertext:
-            if not char.isupper():
-                raise InputError("Ciphertext must strictly contain upper case letters. Proper Usage: obj.decrypt(string ciphertext)")
-            
-        return ciphertext.translate(self.decryption_table)
+        if isinstance(ciphertext, BINARY_TYPES):
+            return bytes(ciphertext).translate(self.byte_decryption_table)
+
+        return check_ciphertext(ciphertext).translate(self.decryption_table)
     
+    # Parallel hook, see Shard.Shardable
+    def _transform(self, text: str, offset: int, encrypt: bool) -> str:
+        return text.translate(self.encryption_table if encrypt else self.decryption_table)
+
     @staticmethod
     def generate_key() -> str:
         key = list(string.ascii_uppercase)
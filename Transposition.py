@@ -1,60 +1,108 @@
 import random
 import string
-from Encode import standard_encode
+import math
+from Encode import standard_encode, text_to_array, array_to_text, check_ciphertext
 from Errors import InputError
+from Shard import Shardable
 import secrets
 from collections import OrderedDict
+import numpy as np
+from Stream import CipherStream
 
-class RectangularTransposition:
+MODES = ("rows", "columnar", "double")
 
-    def __init__(self, key: str):
+def _derive_permutation(key: str) -> tuple:
+    """
 
-        if not isinstance(key, str):
-            raise InputError("Key must be a string. Proper Usage: RectangularTransposition(string key)")
-        
+    Derives the column permutation of a key: the key's distinct letters are sorted, and column i of the output is the column
+    of the input under the i-th letter in sorted order.
 
-        for char in key:
-            if not char.isalpha():
-                raise InputError("Key must be an alphabetic string. Proper Usage: RectangularTransposition(string key)")
+    @param: key - the alphabetic key.
 
-        key = list(OrderedDict.fromkeys(standard_encode(key)))
-        sortkey = sorted(key)
-        index_map = {char: i for i, char in enumerate(key)}
+    @return: (encryption permutation, decryption permutation) as integer arrays, the second being the inverse of the first.
 
-        self.__encryption_key = [index_map[char] for char in sortkey]
+    """
 
-        self.__decryption_key = [0] * len(self.__encryption_key)
-        for index, value in enumerate(self.__encryption_key):
-            self.__decryption_key[value] = index
-        
+    key = list(OrderedDict.fromkeys(standard_encode(key)))
+    if not key:
+        raise InputError("Key must be an alphabetic string. Proper Usage: RectangularTransposition(string key)")
 
-        
-       
-    # Key must have only one instance of each of the 26 letters (Uppercase or Lowercase)
-    def changeKey(self, newKey: str) -> None:
+    index_map = {char: i for i, char in enumerate(key)}
+    encryption_key = np.array([index_map[char] for char in sorted(key)], dtype=np.intp)
+    decryption_key = np.argsort(encryption_key)
+    return encryption_key, decryption_key
 
-        if not isinstance(newKey, str):
+def _permute_rows(text: np.ndarray, permutation: np.ndarray) -> np.ndarray:
+    """
+
+    Views the text as a (rows, keyLen) grid and permutes the letters of every row with a single gather.
+
+    """
+
+    return text.reshape(-1, len(permutation))[:, permutation].ravel()
+
+def _read_columns(text: np.ndarray, permutation: np.ndarray) -> np.ndarray:
+    """
+
+    Writes the text row by row into a (rows, keyLen) grid and reads it out column by column, in the order of the permutation.
+
+    """
+
+    return text.reshape(-1, len(permutation))[:, permutation].T.ravel()
+
+def _write_columns(text: np.ndarray, inverse: np.ndarray) -> np.ndarray:
+    """
+
+    Inverse of _read_columns, given the inverse permutation: fills the grid column by column and reads it out row by row.
+
+    """
+
+    return text.reshape(len(inverse), -1).T[:, inverse].ravel()
+
+class RectangularTransposition(Shardable):
+
+    def __init__(self, key: str, mode: str = "rows", secondKey: str = None):
+        """
+
+        Initializes the cipher. The mode is fixed for the life of the object, changeKey only replaces the keys.
+
+        @param: key - an alphabetic key, whose distinct letters give the column order.
+        @param: mode - "rows" permutes the letters within each row of the rectangle (the original behavior), "columnar" reads
+                       the rectangle out column by column and "double" applies columnar transposition with key, then with secondKey.
+        @param: secondKey - the key of the second transposition, only used (and required) in "double" mode.
+
+        """
+
+        if not isinstance(key, str):
             raise InputError("Key must be a string. Proper Usage: RectangularTransposition(string key)")
-        
+
+        if mode not in MODES:
+            raise InputError("Mode must be one of " + ", ".join(MODES) + ". Proper Usage: RectangularTransposition(string key, string mode)")
+
+        self.__mode = mode
+        self.changeKey(key, secondKey)
+
+    def changeKey(self, newKey: str, newSecondKey: str = None) -> None:
+
+        if not isinstance(newKey, str):
+            raise InputError("Key must be a string. Proper Usage: obj.changeKey(string key)")
 
         for char in newKey:
             if not char.isalpha():
-                raise InputError("Key must be an alphabetic string. Proper Usage: RectangularTransposition(string key)")
-
-        newKey = list(OrderedDict.fromkeys(standard_encode(newKey)))
-        newKey = sorted(newKey)
-        index_map = {char: i for i, char in enumerate(newKey)}
+                raise InputError("Key must be an alphabetic string. Proper Usage: obj.changeKey(string key)")
 
-        index_map = {char: i for i, char in enumerate(newKey)}
-        
-        self.__encryption_key = [index_map[char] for char in newKey]
+        encryption_key, decryption_key = _derive_permutation(newKey)
 
-        self.__decryption_key = [0] * len(self.__encryption_key)
-        for index, value in enumerate(self.__encryption_key):
-            self.__decryption_key[value] = index
+        if self.__mode == "double":
+            if not isinstance(newSecondKey, str) or not all(char.isalpha() for char in newSecondKey):
+                raise InputError("Double transposition needs a second alphabetic key. Proper Usage: obj.changeKey(string key, string secondKey)")
+            self.__second_encryption_key, self.__second_decryption_key = _derive_permutation(newSecondKey)
+            self.__block = math.lcm(len(encryption_key), len(self.__second_encryption_key)) # both rectangles are full
+        else:
+            self.__block = len(encryption_key)
 
-        
-       
+        self.__encryption_key = encryption_key
+        self.__decryption_key = decryption_key
 
     # Plaintext must be a string
     def encrypt(self, plaintext: str) -> str:
@@ -62,40 +110,105 @@ class RectangularTransposition:
         if not isinstance(plaintext, str):
             raise InputError("Plaintext must be a string. Proper Usage: obj.encrypt(string plaintext)")
 
-        plaintext = standard_encode(plaintext, padBound = len(self.__encryption_key))
+        return self.__permute(standard_encode(plaintext, padBound = self.__block), encrypt=True)
 
-        keyLen = len(self.__encryption_key)
-        ciphertext = []
-        for x in range(0, len(plaintext), keyLen):
-            ciphertext += [plaintext[x + self.__encryption_key[i]] for i in range(keyLen)]
+    # Ciphertext must be a string with all upper case alphabetic characters with no spaces
+    def decrypt(self, ciphertext: str) -> str:
 
+        if len(check_ciphertext(ciphertext)) % self.__block != 0:
+            raise InputError("Ciphertext must be a string that fills the rectangle (length multiple of " + str(self.__block) + "). Proper Usage: obj.decrypt(string ciphertext)")
 
-        return ''.join(ciphertext)
+        return self.__permute(ciphertext, encrypt=False)
 
-    # Ciphertext must be a string with all upper case alphabetic characters with no spaces
-    def decrypt(self, ciphertext: str) -> str:
+    def __permute(self, text: str, encrypt: bool) -> str:
+
+        text = text_to_array(text)
+
+        if self.__mode == "rows":
+            return array_to_text(_permute_rows(text, self.__encryption_key if encrypt else self.__decryption_key))
+
+        if encrypt:
+            text = _read_columns(text, self.__encryption_key)
+            if self.__mode == "double":
+                text = _read_columns(text, self.__second_encryption_key)
+            return array_to_text(text)
+
+        if self.__mode == "double":
+            text = _write_columns(text, self.__second_decryption_key)
+        return array_to_text(_write_columns(text, self.__decryption_key))
+
+    def encryptor(self) -> CipherStream:
+        """
+        Creates an incremental encryption stream, see Stream.CipherStream. In "rows" mode a partial row is kept until the next
+        chunk completes it, and is padded with Z on finalize(). The columnar modes read the whole rectangle out column by
+        column, so they keep the message and output it all on finalize().
+        """
+
+        if self.__mode != "rows":
+            return CipherStream(standard_encode, self.__whole_message(encrypt=True))
+
+        keyLen = self.__block
 
-        if not isinstance(ciphertext, str):
-            raise InputError("Ciphertext must be a string. Proper Usage: obj.decrypt(string ciphertext)")
-        
-        for char in ciphertext:
-            if not char.isupper():
-                raise InputError("Ciphertext must strictly contain upper case letters. Proper Usage: obj.decrypt(string ciphertext)")
-            
-        plaintext = standard_encode(ciphertext, padBound = len(self.__decryption_key))
+        def process(text: str, offset: int, final: bool) -> tuple:
+            if final and len(text) % keyLen != 0:
+                text += 'Z' * (keyLen - len(text) % keyLen)
+            cut = len(text) - len(text) % keyLen
+            return array_to_text(_permute_rows(text_to_array(text[:cut]), self.__encryption_key)), text[cut:]
 
-        keyLen = len(self.__decryption_key)
-        plaintext = []
-        for x in range(0, len(ciphertext), keyLen):
-            plaintext += [ciphertext[x + self.__decryption_key[i]] for i in range(keyLen)]
+        return CipherStream(standard_encode, process)
 
+    def decryptor(self) -> CipherStream:
+        """
+        Creates an incremental decryption stream, see Stream.CipherStream. In "rows" mode a partial row is kept until the next
+        chunk completes it, and finalize() rejects a ciphertext that ends with one. The columnar modes keep the message and
+        output it all on finalize().
+        """
+
+        if self.__mode != "rows":
+            return CipherStream(check_ciphertext, self.__whole_message(encrypt=False))
+
+        keyLen = self.__block
+
+        def process(text: str, offset: int, final: bool) -> tuple:
+            if final and len(text) % keyLen != 0:
+                raise InputError("Ciphertext must be a string that fills the rectangle (length multiple of " + str(keyLen) + "). Proper Usage: obj.decrypt(string ciphertext)")
+            cut = len(text) - len(text) % keyLen
+            return array_to_text(_permute_rows(text_to_array(text[:cut]), self.__decryption_key)), text[cut:]
+
+        return CipherStream(check_ciphertext, process)
+
+    def __whole_message(self, encrypt: bool):
+
+        parts = [] # the chunks are collected here rather than left over, which would copy the message on every update
+
+        def process(text: str, offset: int, final: bool) -> tuple:
+            parts.append(text)
+            if not final:
+                return '', ''
+            text = ''.join(parts)
+            if encrypt:
+                text += 'Z' * (-len(text) % self.__block) # as standard_encode pads
+            elif len(text) % self.__block != 0:
+                raise InputError("Ciphertext must be a string that fills the rectangle (length multiple of " + str(self.__block) + "). Proper Usage: obj.decrypt(string ciphertext)")
+            return self.__permute(text, encrypt), ''
+
+        return process
+
+    # Parallel hooks, see Shard.Shardable
+    def _period(self):
+        return self.__block if self.__mode == "rows" else None # the columnar modes move letters across the whole message
+
+    def _pad(self, length: int, encrypt: bool) -> str:
+        if encrypt:
+            return 'Z' * (-length % self.__block) # as standard_encode pads
+        if length % self.__block != 0:
+            raise InputError("Ciphertext must be a string that fills the rectangle (length multiple of " + str(self.__block) + "). Proper Usage: obj.decrypt(string ciphertext)")
+        return ''
+
+    def _transform(self, text: str, offset: int, encrypt: bool) -> str:
+        return self.__permute(text, encrypt)
 
-        return ''.join(plaintext)
-    
     @staticmethod
     def generate_key(length : int) -> string:
        characters = string.ascii_uppercase
        return ''.join(random.sample(characters, length))
-        
-
-        
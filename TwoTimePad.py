@@ -0,0 +1,309 @@
+from Encode import standard_encode, letter_values
+from Errors import InputError
+from Cryptanalysis import check_attack_ciphertext
+import numpy as np
+
+DEFAULT_TOP = 100
+CHUNK_LETTERS = 1 << 22 # fragment letters scored per batch, bounds the memory of a drag whatever the crib list
+MIN_WORD_LENGTH = 3
+OFFSET_BATCH = 256 # offsets walked together by CribIndex.matches and CribIndex._drag, bounds the number of live walks
+INDEX_CRIBS = 1000 # crib lists at least this long are dragged through a CribIndex, see drag
+SCORE_TOLERANCE = 1e-4 # slack of the walks cut off by CribIndex._drag, the float32 sums of _slide add up in another order
+
+def difference(ciphertext1: str, ciphertext2: str) -> str:
+    """
+
+    Subtracts two ciphertexts that were encrypted with the same OTP key, letter by letter mod 26. The key cancels out, leaving
+    plaintext1 - plaintext2, so a guess for one plaintext gives the other.
+
+    @param: ciphertext1 - a ciphertext.
+    @param: ciphertext2 - another ciphertext under the same key (offset).
+
+    @return: The difference, as letters (A = 0), as long as the shorter ciphertext.
+
+    """
+
+    ciphertext1, ciphertext2 = check_attack_ciphertext(ciphertext1), check_attack_ciphertext(ciphertext2)
+    length = min(len(ciphertext1), len(ciphertext2))
+    values = (letter_values(ciphertext1[:length]).astype(np.int16) - letter_values(ciphertext2[:length])) % 26
+    return (values + 65).astype(np.uint8).tobytes().decode('ascii')
+
+def _table_order(table: np.ndarray) -> int:
+
+    if isinstance(table, np.ndarray) and table.ndim == 1:
+        for n in range(1, 5):
+            if len(table) == 26 ** n:
+                return n
+    raise InputError("The score table must be a flat numpy array of 26^n log probabilities, see NGrams.NGramStore.table.")
+
+def _encode_cribs(cribs: list) -> list:
+
+    if isinstance(cribs, str) or not all(isinstance(crib, str) for crib in cribs):
+        raise InputError("Cribs must be a list of strings.")
+
+    encoded = (standard_encode(crib).encode('ascii', 'ignore').decode('ascii') for crib in cribs)
+    return list(dict.fromkeys(crib for crib in encoded if crib)) # drops duplicates, keeps the order
+
+def _codes(fragments: np.ndarray, n: int) -> np.ndarray:
+
+    length = fragments.shape[-1]
+    codes = fragments[..., :length - n + 1]
+    for i in range(1, n):
+        codes = codes * 26 + fragments[..., i:length - n + 1 + i]
+    return codes
+
+def _slide(values: np.ndarray, owner: np.ndarray, cribs: list, table: np.ndarray, n: int, top: int) -> list:
+
+    by_length = {}
+    for crib in cribs:
+        if n <= len(crib) <= len(values):
+            by_length.setdefault(len(crib), []).append(crib)
+
+    best = [] # (score, crib, window) of every batch's top results, merged by drag
+    for length, group in by_length.items():
+        windows = np.lib.stride_tricks.sliding_window_view(values, length)
+        # windows that do not span two differences, and where the plaintexts differ: where they are equal, every crib gives
+        # itself back and looks like English
+        inside = np.flatnonzero((owner[:len(windows)] == owner[length - 1:]) & windows.any(axis=1))
+        if not len(inside):
+            continue
+        placed = windows[inside].astype(np.int32)
+        letters = letter_values(''.join(group)).astype(np.int32).reshape(len(group), length) + 26 # keeps the differences positive
+        rows = max(CHUNK_LETTERS // (len(inside) * length), 1)
+        for first in range(0, len(group), rows):
+            fragments = (letters[first:first + rows, None, :] - placed[None, :, :]) % 26 # (cribs, windows, letters), int32 is enough for 26^4
+            scores = table[_codes(fragments, n)].sum(axis=2).ravel() / (length - n + 1)
+            keep = np.argpartition(-scores, min(top, len(scores)) - 1)[:top]
+            best.extend((float(scores[k]), group[first + k // len(inside)], int(inside[k % len(inside)])) for k in keep)
+    return best
+
+def drag(differences: list, cribs, table: np.ndarray, top: int = DEFAULT_TOP) -> list:
+    """
+
+    Crib dragging: places every crib at every offset of plaintext 1 of every difference, and ranks the plaintext 2 fragments
+    that this reveals (crib - difference) by their mean n-gram log probability. All the differences are joined and the cribs of
+    each length are slid over every offset of all of them at once, as one (cribs, offsets, letters) array per batch. That costs
+    every letter of every crib at every offset, so lists of INDEX_CRIBS cribs or more (or a CribIndex) are walked through a trie
+    instead, see CribIndex._drag; both give the same ranking. To place the cribs in plaintext 2 instead, pass
+    difference(ciphertext2, ciphertext1).
+
+    @param: differences - a list of differences, see difference.
+    @param: cribs - a list of words or phrases expected in the plaintexts, they are encoded with standard_encode first, or a
+                    CribIndex of them. Cribs shorter than the n-grams of the table are skipped.
+    @param: table - an n-gram log probability table of 26^n entries, e.g. NGramStore.table(n) or Solvers.quadgram_table.
+    @param: top - the number of results to keep.
+
+    @return: A list of the best (score, index, offset, crib, fragment) tuples, best first: the crib at that offset of plaintext
+             1 of differences[index] gives fragment in plaintext 2.
+
+    """
+
+    if isinstance(differences, str):
+        raise InputError("Differences must be a list of strings. Proper Usage: drag(list differences, list cribs, table)")
+    differences = [check_attack_ciphertext(text) for text in differences]
+    n = _table_order(table)
+    if not isinstance(top, int) or top < 1:
+        raise InputError("top must be a positive integer.")
+
+    lengths = [len(text) for text in differences]
+    values = letter_values(''.join(differences)).astype(np.int64)
+    owner = np.repeat(np.arange(len(differences)), lengths)
+    starts = np.cumsum(lengths) - lengths
+
+    if not isinstance(cribs, CribIndex) and not isinstance(cribs, str) and len(cribs) >= INDEX_CRIBS:
+        cribs = CribIndex(cribs)
+    if isinstance(cribs, CribIndex):
+        best = cribs._drag(values, owner, table, top)
+    else:
+        best = _slide(values, owner, _encode_cribs(cribs), table, n, top)
+
+    best.sort(key=lambda result: (-result[0], result[2], result[1])) # ties by offset then crib, whichever path found them
+    results = []
+    for score, crib, window in best[:top]:
+        index = int(owner[window])
+        fragment = (letter_values(crib).astype(np.int64) - values[window:window + len(crib)]) % 26
+        results.append((score, index, window - int(starts[index]), crib, (fragment + 65).astype(np.uint8).tobytes().decode('ascii')))
+    return results
+
+def drag_pairs(ciphertexts: list, cribs: list, table: np.ndarray, top: int = DEFAULT_TOP) -> list:
+    """
+
+    Crib dragging over every pair of ciphertexts that may share a key: each crib is tried in both plaintexts of every pair, in a
+    single drag.
+
+    @param: ciphertexts - a list of ciphertexts, encrypted with the same OTP key (offset).
+    @param: cribs - a list of words or phrases expected in the plaintexts, or a CribIndex of them, see drag.
+    @param: table - an n-gram log probability table, see drag.
+    @param: top - the number of results to keep.
+
+    @return: A list of the best (score, i, j, offset, crib, fragment) tuples, best first: the crib at that offset of plaintext i
+             gives fragment at the same offset of plaintext j.
+
+    """
+
+    if isinstance(ciphertexts, str) or len(ciphertexts) < 2:
+        raise InputError("At least two ciphertexts are needed. Proper Usage: drag_pairs(list ciphertexts, list cribs, table)")
+
+    pairs = [(i, j) for i in range(len(ciphertexts)) for j in range(len(ciphertexts)) if i != j]
+    differences = [difference(ciphertexts[i], ciphertexts[j]) for i, j in pairs]
+    return [(score, *pairs[index], offset, crib, fragment) for score, index, offset, crib, fragment in drag(differences, cribs, table, top)]
+
+class CribIndex:
+    """
+    A trie of a crib dictionary, for crib dragging with word lists too large to slide every crib over every offset. matches finds
+    every offset where a dictionary word in one plaintext lines up with a dictionary word in the other: rather than trying every
+    pair of words, the tries of both plaintexts are walked together from every offset at once. A letter a of plaintext 1 forces
+    the letter a - difference of plaintext 2, and the walk only goes on while both are prefixes of some word. Most offsets die
+    within a couple of letters, so the cost barely grows with the size of the dictionary. The drag function walks the trie in
+    the same way for large crib lists.
+    """
+
+    def __init__(self, cribs: list):
+        """
+        Builds the index.
+
+        @param: cribs - a list of words, they are encoded with standard_encode first.
+
+        @return: none
+        """
+
+        self.words = _encode_cribs(cribs)
+        goto = [[-1] * 26]
+        ends = [-1]
+        reach = [0]
+        for number, word in enumerate(self.words):
+            state = 0
+            for letter in letter_values(word).tolist():
+                if goto[state][letter] < 0:
+                    goto[state][letter] = len(goto)
+                    goto.append([-1] * 26)
+                    ends.append(-1)
+                    reach.append(0)
+                reach[state] = max(reach[state], len(word))
+                state = goto[state][letter]
+            ends[state] = number
+            reach[state] = max(reach[state], len(word))
+
+        self.__goto = np.array(goto, dtype=np.int32)
+        self.__ends = np.array(ends, dtype=np.int32) # the word that ends at each state, -1 for none
+        self.__reach = np.array(reach, dtype=np.int64) # the longest word through each state
+
+        # The children of every state, as one flat list ordered by parent, so a walk only expands the letters that exist
+        parents, self.__child_letters = np.nonzero(self.__goto >= 0)
+        self.__child_states = self.__goto[parents, self.__child_letters]
+        self.__child_counts = np.bincount(parents, minlength=len(goto))
+        self.__child_starts = np.cumsum(self.__child_counts) - self.__child_counts
+
+    def __expand(self, states: np.ndarray) -> tuple:
+
+        # every child of every state: the walk it extends, its letter and its state
+        counts = self.__child_counts[states]
+        walk = np.repeat(np.arange(len(states)), counts)
+        children = self.__child_starts[states][walk] + np.arange(len(walk)) - np.repeat(np.cumsum(counts) - counts, counts)
+        return walk, self.__child_letters[children], self.__child_states[children]
+
+    def matches(self, difference: str, min_length: int = MIN_WORD_LENGTH) -> list:
+        """
+        Finds every offset where a dictionary word in plaintext 1 gives a dictionary word of the same length in plaintext 2.
+
+        @param: difference - a difference of two ciphertexts, see difference.
+        @param: min_length - the shortest words to report, short words line up by chance.
+
+        @return: A list of (offset, word1, word2) tuples, longest words first.
+        """
+
+        values = letter_values(check_attack_ciphertext(difference)).astype(np.int64)
+        found = []
+        for start in range(0, len(values), OFFSET_BATCH):
+            offsets = np.arange(start, min(start + OFFSET_BATCH, len(values)))
+            first = np.zeros(len(offsets), dtype=np.int64) # the trie states of plaintext 1 and 2, for every live walk
+            second = np.zeros(len(offsets), dtype=np.int64)
+
+            for depth in range(len(values) - start):
+                live = offsets + depth < len(values)
+                offsets, first, second = offsets[live], first[live], second[live]
+                if not len(offsets):
+                    break
+
+                # every child letter of plaintext 1, and the letter of plaintext 2 that it forces
+                walk, letters, children = self.__expand(first)
+                forced = (letters - values[offsets[walk] + depth]) % 26
+                next_second = self.__goto[second[walk], forced]
+                alive = next_second >= 0
+                offsets, first, second = offsets[walk][alive], children[alive], next_second[alive]
+
+                if depth + 1 >= min_length:
+                    complete = np.flatnonzero((self.__ends[first] >= 0) & (self.__ends[second] >= 0))
+                    found.extend((int(offsets[k]), self.words[self.__ends[first[k]]], self.words[self.__ends[second[k]]]) for k in complete)
+
+        found.sort(key=lambda match: (-len(match[1]), match[0]))
+        return found
+
+    def _drag(self, values: np.ndarray, owner: np.ndarray, table: np.ndarray, top: int) -> list:
+        """
+        The trie side of the drag function, which validates the arguments and builds the results. One walk per offset follows
+        the trie, scoring the n-grams of the revealed fragment as it goes, so a prefix shared by many words is scored once per
+        offset. A walk stops once even the best n-gram of the table, for every letter left of its longest word, could not lift
+        it to the best top results so far. Sliding a sample of the words first gives those results from the start.
+
+        @return: A list of (score, crib, window) tuples that holds the best top, scored as the drag function does.
+        """
+
+        n = _table_order(table)
+        best_ngram = float(table.max())
+        # the best n-gram that starts with each k letters, for k < n
+        best_next = [table.reshape(26 ** k, -1).max(axis=1).astype(np.float64) for k in range(n)]
+        limits = np.flatnonzero(np.append(owner[1:] != owner[:-1], True)) + 1 # the end of every difference
+        limits = limits[owner]
+        candidates = [] # (score, word, window), trimmed to the best top now and then
+        sample = _slide(values, owner, self.words[::max(len(self.words) // INDEX_CRIBS, 1)], table, n, top)
+        threshold = sorted(score for score, _, _ in sample)[-top] - SCORE_TOLERANCE if len(sample) >= top else -np.inf
+        start, batch = 0, 8
+        while start < len(values):
+            # the first batches are small, the results they find cut off the walks of the next
+            offsets = np.arange(start, min(start + batch, len(values)))
+            start, batch = start + batch, min(2 * batch, OFFSET_BATCH)
+            states = np.zeros(len(offsets), dtype=np.int64)
+            codes = np.zeros(len(offsets), dtype=np.int64) # the last n letters of the fragment
+            sums = np.zeros(len(offsets)) # the log probabilities of its n-grams so far
+            differ = np.zeros(len(offsets), dtype=bool) # whether the plaintexts differ anywhere in the window
+
+            for depth in range(len(values)):
+                live = offsets + depth < limits[offsets]
+                offsets, states, codes, sums, differ = offsets[live], states[live], codes[live], sums[live], differ[live]
+                if not len(offsets):
+                    break
+
+                walk, letters, states = self.__expand(states)
+                offsets, codes, sums, differ = offsets[walk], codes[walk], sums[walk], differ[walk]
+                difference = values[offsets + depth]
+                codes = (codes * 26 + (letters - difference) % 26) % 26 ** n
+                differ |= difference != 0
+                grams = depth + 2 - n # n-grams of the fragment so far
+                if grams > 0:
+                    sums = sums + table[codes]
+
+                    complete = np.flatnonzero((self.__ends[states] >= 0) & differ & (sums / grams >= threshold))
+                    candidates.extend((float(sums[k]) / grams, self.__ends[states[k]], int(offsets[k])) for k in complete)
+                    if len(candidates) >= 2 * top:
+                        candidates.sort(key=lambda candidate: -candidate[0])
+                        del candidates[top:]
+                        threshold = max(threshold, candidates[-1][0] - SCORE_TOLERANCE)
+
+                # The best mean any word through the state could still reach: its next n-gram starts with the letters placed
+                # so far, and every later one is at most the best of the table
+                grams, known = max(grams, 0), min(depth + 1, n - 1)
+                remaining = self.__reach[states] + 1 - n
+                following = best_next[known][codes % 26 ** known] + (remaining - grams - 1) * best_ngram
+                bound = (sums + np.where(remaining > grams, following, 0)) / np.maximum(remaining, 1)
+                bound[remaining < 1] = -np.inf
+                keep = bound >= threshold
+                offsets, states, codes, sums, differ = offsets[keep], states[keep], codes[keep], sums[keep], differ[keep]
+
+        candidates.sort(key=lambda candidate: -candidate[0])
+        best = []
+        for _, number, window in candidates[:2 * top]: # rescored as _slide does, so both paths rank alike
+            word = self.words[number]
+            fragment = (letter_values(word).astype(np.int32) + 26 - values[window:window + len(word)].astype(np.int32)) % 26
+            best.append((float(table[_codes(fragment, n)].sum() / (len(word) - n + 1)), word, window))
+        return best
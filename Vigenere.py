@@ -1,9 +1,28 @@
 import string
-from Encode import standard_encode
+from Encode import standard_encode, text_to_array, array_to_text, check_ciphertext, letter_values, bytes_to_array, BINARY_TYPES
 from Errors import InputError
+from Shard import Shardable
 import secrets
+import numpy as np
+from Stream import CipherStream
 
-class Vigenere:
+def _repeat_key(shifts: np.ndarray, length: int, offset: int = 0) -> np.ndarray:
+    """
+
+    Repeats the key shifts over a text of the given length, i.e. the shift for position x is shifts[(offset + x) % len(shifts)].
+
+    @param: shifts - the per letter shifts of the key.
+    @param: length - the length of the text the key is applied to.
+    @param: offset - the position of the first letter of the text within the whole message.
+
+    @return: An array of the shifts of size @param length.
+
+    """
+
+    shifts = np.roll(shifts, -(offset % len(shifts)))
+    return np.tile(shifts, -(-length // len(shifts)))[:length]
+
+class Vigenere(Shardable):
     def __init__(self, key: str):
 
         if not isinstance(key, str):
@@ -14,6 +33,11 @@ class Vigenere:
                  raise InputError("The Key must be an alphabetic string. Proper Usage: Vigenere(string key)")
 
         self.__key = standard_encode(key)
+        if not self.__key:
+            raise InputError("The Key must be an alphabetic string. Proper Usage: Vigenere(string key)")
+
+        self.__shifts = (text_to_array(self.__key) % 26).astype(np.uint8) # ord(char) % 26, since 65 + 65 = 130 is a multiple of 26
+        self.__byte_shifts = letter_values(self.__key) # A = 0, ..., Z = 25 for byte mode
 
 
     def changeKey(self, newKey: str) -> None:
@@ -26,42 +50,67 @@ class Vigenere:
                  raise InputError("The Key must be an alphabetic string. Proper Usage: Vigenere(string key)")
 
         self.__key = standard_encode(newKey)
+        if not self.__key:
+            raise InputError("The Key must be an alphabetic string. Proper Usage: Vigenere(string key)")
+
+        self.__shifts = (text_to_array(self.__key) % 26).astype(np.uint8)
+        self.__byte_shifts = letter_values(self.__key)
 
     def encrypt(self, plaintext: str) -> str:
 
+        if isinstance(plaintext, BINARY_TYPES):
+            plaintext = bytes_to_array(plaintext)
+            return (plaintext + _repeat_key(self.__byte_shifts, len(plaintext))).tobytes() # uint8 arithmetic wraps mod 256
+
         if not isinstance(plaintext, str):
             raise InputError("Plaintext must be a string. Proper Usage: obj.encrypt(string plaintext)")
         
-        plaintext = standard_encode(plaintext)
-        keyLength = len(self.__key)
-
-        ciphertext = []
-
-        for x in range(len(plaintext)):
-            toAdd = ((ord(plaintext[x]) + ord(self.__key[x % keyLength])) % 26) + 65 # 65 is ASCII of A
-            ciphertext.append(chr(toAdd))
-
-        return ''.join(ciphertext)
+        return self.__encrypt_text(standard_encode(plaintext))
 
     def decrypt(self, ciphertext: str) -> str:
 
+        if isinstance(ciphertext, BINARY_TYPES):
+            ciphertext = bytes_to_array(ciphertext)
+            return (ciphertext - _repeat_key(self.__byte_shifts, len(ciphertext))).tobytes()
+
         if not isinstance(ciphertext, str):
             raise InputError("Ciphertext must be a string. Proper Usage: obj.decrypt(string ciphertext)")
-        
-        for char in ciphertext:
-            if not char.isupper():
-                raise InputError("Ciphertext must strictly contain upper case letters. Proper Usage: obj.decrypt(string ciphertext)")
 
-        keyLength = len(self.__key)
+        return self.__decrypt_text(check_ciphertext(ciphertext))
+
+    def encryptor(self) -> CipherStream:
+        """
+        Creates an incremental encryption stream, see Stream.CipherStream. The key position carries over between chunks.
+        """
+        return CipherStream(standard_encode, lambda text, offset, final: (self.__encrypt_text(text, offset), ''))
+
+    def decryptor(self) -> CipherStream:
+        """
+        Creates an incremental decryption stream, see Stream.CipherStream. The key position carries over between chunks.
+        """
+        return CipherStream(check_ciphertext, lambda text, offset, final: (self.__decrypt_text(text, offset), ''))
 
-        plaintext = []
+    def __encrypt_text(self, plaintext: str, offset: int = 0) -> str:
 
-        for x in range(len(ciphertext)):
-            toAdd = ((ord(ciphertext[x]) - ord(self.__key[x % keyLength]) + 26) % 26) + 65 # 65 is ASCII of A
-            plaintext.append(chr(toAdd))
+        plaintext = text_to_array(plaintext)
+        shifts = _repeat_key(self.__shifts, len(plaintext), offset)
 
-        return ''.join(plaintext)
+        return array_to_text((plaintext + shifts) % 26 + 65) # 65 is ASCII of A
+
+    def __decrypt_text(self, ciphertext: str, offset: int = 0) -> str:
+
+        ciphertext = text_to_array(ciphertext)
+        shifts = _repeat_key(self.__shifts, len(ciphertext), offset)
+
+        return array_to_text((ciphertext + 26 - shifts) % 26 + 65) # + 26 keeps the unsigned arithmetic from wrapping
     
+    # Parallel hooks, see Shard.Shardable
+    def _period(self) -> int:
+        return len(self.__shifts)
+
+    def _transform(self, text: str, offset: int, encrypt: bool) -> str:
+        return self.__encrypt_text(text, offset) if encrypt else self.__decrypt_text(text, offset)
+
     @staticmethod
     def generate_key(length : int) -> string:
        characters = string.ascii_uppercase
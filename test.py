@@ -3,27 +3,61 @@ from Caesar import Caesar
 import DH
 import ElGamal
 import RSA
+import Parallel
+import Shard
+import Cryptanalysis
+import Solvers
+import NGrams
+import Classifier
+import TwoTimePad
+import Primes
 from Hill import Hill
-from OTP import OTP
+from OTP import OTP, OTPPad
 from Playfair import Playfair
 from Sub import SimpleSubstitution
 from Transposition import RectangularTransposition
 from Vigenere import Vigenere
 import string
+import math
 import random
-from sympy import factorint
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from Encode import standard_encode, letter_values
+from Errors import SearchError, InputError
 
 test_p = 10320218115367600288400551792891159809760797028267953990358141197047679350550387485255857487116786974035314217183369639241205784634603955112324260653788107
 test_q = 13257097284859458686720086336676073705930751305914696876923749886308569400552934872514588389992051427044302345172591985408347033882535512548033299953497447
 test_g = 2
 
+# A sample of English text for the statistical attacks, both as the source of their n-gram tables and as their plaintexts
+ENGLISH_TEXT = """
+It was late in the autumn when the letters first began to arrive at the old house by the river, and nobody in the village could say who had sent them. Each one came in a plain brown envelope with no stamp and no return address, and each one held a single sheet of paper covered from edge to edge in rows of capital letters that made no sense at all. The postmaster said that they were simply left on the counter of his shop early in the morning, before he opened the doors, and that he had never once seen the person who brought them.
+
+The woman who lived in the house was a retired teacher of mathematics, and she was not the kind of person to let a puzzle go unsolved. She spread the pages across her kitchen table and began to count. She counted how often every letter appeared, and she wrote the totals in a small notebook that she kept in the pocket of her coat. In ordinary English writing the letter E is the most common of all, followed by T and A and O, and the rarest letters are Q and Z and J. If the writer of the letters had only replaced each letter of the alphabet with another one, then the most common letter in the pages ought to stand for E, and the second most common ought to stand for T.
+
+Her first attempt failed. The counts were far too even, as if every letter of the alphabet had been used almost exactly as often as every other one. That told her something important, because a simple substitution can hide the shape of the letters but it cannot hide how often they occur. The writer must have been using more than one alphabet, switching from one to the next in a fixed order, so that the same letter of the message could become a different letter of the cipher depending on where it stood in the line.
+
+She remembered reading about this method in a history of secret writing that she had borrowed from the library many years before. A short keyword decides which alphabet is used for each letter, and the keyword is repeated again and again along the length of the message. The trick to breaking it is to find out how long the keyword is. If the keyword has five letters, then every fifth letter of the message was written with the same alphabet, and those letters taken together behave exactly like a simple substitution again. She tried every length from two to twenty, and for each one she split the pages into columns and measured how uneven the counts were inside each column. At a length of seven the columns suddenly looked like English.
+
+After that the work went quickly. For each of the seven columns she tried all twenty six shifts and kept the one whose counts were closest to the counts of ordinary English, and the keyword appeared on the page in front of her one letter at a time. She read the first message slowly, and then she read it again, and then she put on her coat and walked down the hill to the village in the dark. The letters had been written by her brother, who had gone to sea forty years ago and had never come home, and the last line of the last letter said that he would be waiting for her at the harbour on the first morning of the new year.
+"""
+
 def random_string(length: int) -> string:
     return ''.join(random.choice("ABCDEFGHIJKLMNOPQRSTUVWYZ") for _ in range(length))
 
+def random_chunks(text: str, num_chunks = 10) -> list:
+    cuts = sorted(random.randint(0, len(text)) for _ in range(num_chunks - 1))
+    return [text[start:end] for start, end in zip([0] + cuts, cuts + [len(text)])]
+
+def english_string(length: int) -> string: # letters drawn with English frequencies, enough for the frequency based attacks
+    return ''.join(random.choices(string.ascii_uppercase, weights=Cryptanalysis.ENGLISH_FREQUENCIES, k=length))
+
 
 # Test the Classical Cryptosystems that are all encapsulated within a single class. 
 def test_classical(runs = 200, subtests = 20, string_size = 1000):
-    factor = random.choice(list(factorint(string_size).keys()))
+    factor = random.choice(Primes.prime_factors(string_size))
     for _ in range(runs):
         keylen = random.randint(1, 26)
         affine_key = Affine.generate_key()
@@ -34,6 +68,8 @@ def test_classical(runs = 200, subtests = 20, string_size = 1000):
                    Playfair(Playfair.generate_key(keylen)), 
                    SimpleSubstitution(SimpleSubstitution.generate_key()), 
                    RectangularTransposition(RectangularTransposition.generate_key(factor)), 
+                   RectangularTransposition(RectangularTransposition.generate_key(factor), "double",
+                                            RectangularTransposition.generate_key(random.choice(Primes.prime_factors(string_size)))),
                    Vigenere(Vigenere.generate_key(keylen))]
         for _ in range(subtests):
             test_string = random_string(string_size)
@@ -54,11 +90,524 @@ def test_classical(runs = 200, subtests = 20, string_size = 1000):
                 if test_string != plaintext:
                     raise ValueError(f'Failed on {test_string} with {cipher}, ciphertext = {ciphertext}, decrypted plaintext = {plaintext}')
         print('Passed one subtest!!')
+
+# Test the byte (Z_256) mode of the classical ciphers that support it
+def test_binary(runs = 200, data_size = 1000):
+    for _ in range(runs):
+        affine_key = Affine.generate_key()
+        ciphers = [Affine(affine_key[0], affine_key[1]),
+                   Caesar(Caesar.generate_key()),
+                   Hill(Hill.generate_key(random.randint(1, 8))),
+                   OTP(OTP.generate_key(data_size, True)),
+                   SimpleSubstitution(SimpleSubstitution.generate_key()),
+                   Vigenere(Vigenere.generate_key(random.randint(1, 26)))]
+        test_data = os.urandom(random.randint(0, data_size))
+
+        for cipher in ciphers:
+            ciphertext = cipher.encrypt(bytearray(test_data))
+            plaintext = cipher.decrypt(memoryview(ciphertext))
+
+            if test_data != plaintext:
+                raise ValueError(f'Failed on {test_data} with {cipher}, ciphertext = {ciphertext}, decrypted plaintext = {plaintext}')
+
+    # A letter key would only shift each byte by 0 - 25, so OTP refuses bytes without a byte key
+    try:
+        OTP(OTP.generate_key(data_size)).encrypt(bytes(data_size))
+        raise ValueError('OTP encrypted bytes with a letter key')
+    except InputError:
+        pass
+    if len(set(OTP(OTP.generate_key(100000, True)).encrypt(bytes(100000)))) != 256:
+        raise ValueError('OTP byte mode does not use every byte value')
+    print('Passed binary test!!')
+
+# Test Hill with large keys, whose inverses mod 26 are built exactly over the integers
+def test_hill_large_keys(runs = 3, blocks = 20):
+    for dim in (32, 64):
+        for _ in range(runs):
+            cipher = Hill(Hill.generate_key(dim))
+            test_string = random_string(dim * random.randint(1, blocks)) # whole blocks, so nothing is padded with Z
+            ciphertext = cipher.encrypt(test_string)
+            if cipher.decrypt(ciphertext) != test_string:
+                raise ValueError(f'Failed on {test_string} with a {dim}x{dim} Hill key, ciphertext = {ciphertext}')
+
+            test_data = os.urandom(random.randint(0, dim * blocks))
+            if cipher.decrypt(cipher.encrypt(test_data)) != test_data:
+                raise ValueError(f'Failed on {test_data} with a {dim}x{dim} Hill key in byte mode')
+    print('Passed large Hill key test!!')
+
+# Test that the incremental streams give the same result as the one shot methods
+def test_streaming(runs = 200, string_size = 1000):
+    for _ in range(runs):
+        keylen = random.randint(1, 26)
+        ciphers = [Hill(Hill.generate_key(random.randint(1, 5))),
+                   OTP(OTP.generate_key(string_size)),
+                   Playfair(Playfair.generate_key(keylen)),
+                   RectangularTransposition(RectangularTransposition.generate_key(keylen)),
+                   RectangularTransposition(RectangularTransposition.generate_key(keylen), "columnar"),
+                   RectangularTransposition(RectangularTransposition.generate_key(keylen), "double", RectangularTransposition.generate_key(random.randint(1, 26))),
+                   Vigenere(Vigenere.generate_key(keylen))]
+        test_string = random_string(string_size)
+
+        for cipher in ciphers:
+            encryptor = cipher.encryptor()
+            ciphertext = ''.join(encryptor.update(chunk) for chunk in random_chunks(test_string)) + encryptor.finalize()
+            if ciphertext != cipher.encrypt(test_string):
+                raise ValueError(f'Failed on {test_string} with {cipher}, streamed ciphertext = {ciphertext}')
+
+            decryptor = cipher.decryptor()
+            plaintext = ''.join(decryptor.update(chunk) for chunk in random_chunks(ciphertext)) + decryptor.finalize()
+            if plaintext != cipher.decrypt(ciphertext):
+                raise ValueError(f'Failed on {ciphertext} with {cipher}, streamed plaintext = {plaintext}')
+    print('Passed streaming test!!')
+
+# Test that two copies of a pad file stay in step, and that pad is never reused
+def test_otp_pad(runs = 200, string_size = 1000):
+    with tempfile.TemporaryDirectory() as directory:
+        OTPPad.generate(os.path.join(directory, 'alice.pad'), runs * string_size)
+        with open(os.path.join(directory, 'alice.pad'), 'rb') as src, open(os.path.join(directory, 'bob.pad'), 'wb') as dst:
+            dst.write(src.read())
+
+        alice = OTPPad(os.path.join(directory, 'alice.pad'))
+        bob = OTPPad(os.path.join(directory, 'bob.pad'))
+        for _ in range(runs):
+            test_string = random_string(string_size)
+            start = alice.offset()
+            ciphertext = alice.encrypt(test_string)
+            plaintext = bob.decrypt(ciphertext)
+
+            if test_string != plaintext or alice.offset() != start + string_size:
+                raise ValueError(f'Failed on {test_string} with OTPPad, ciphertext = {ciphertext}, decrypted plaintext = {plaintext}')
+
+        reopened = OTPPad(os.path.join(directory, 'alice.pad'))
+        if reopened.remaining() != 0:
+            raise ValueError('Failed to persist the pad offset')
+        for pad in (alice, bob, reopened):
+            pad.close()
+
+        # Two handles on one pad, and threads sharing it, must never be handed the same letters
+        OTPPad.generate(os.path.join(directory, 'shared.pad'), 100 * string_size)
+        handles = [OTPPad(os.path.join(directory, 'shared.pad')) for _ in range(2)]
+        used = []
+        for i in range(20):
+            start = handles[i % 2].offset()
+            ciphertext = handles[i % 2].encrypt(random_string(string_size))
+            used.append((start, len(ciphertext)))
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            for _ in pool.map(lambda i: handles[i % 2].encrypt('A' * string_size), range(40)):
+                pass
+        starts = sorted(start for start, _ in used)
+        if len(set(starts)) != len(starts) or any(b - a < string_size for a, b in zip(starts, starts[1:])) or handles[0].offset() != 60 * string_size or handles[1].remaining() != 40 * string_size:
+            raise ValueError(f'Pad was reused across handles: {used}, offset {handles[0].offset()}')
+        for pad in handles:
+            pad.close()
+
+        # The file methods read small chunks here: whitespace is only dropped around the ciphertext, not where a chunk ends
+        for name in ('carol.pad', 'dave.pad'):
+            with open(os.path.join(directory, 'shared.pad'), 'rb') as src, open(os.path.join(directory, name), 'wb') as dst:
+                dst.write(src.read())
+        carol, dave = OTPPad(os.path.join(directory, 'carol.pad')), OTPPad(os.path.join(directory, 'dave.pad'))
+        carol.CHUNK_SIZE = dave.CHUNK_SIZE = 7
+        names = [os.path.join(directory, name) for name in ('plain.txt', 'cipher.txt', 'decrypted.txt')]
+        test_string = random_string(string_size)
+        with open(names[0], 'w') as f:
+            f.write(test_string)
+        carol.encrypt_file(names[0], names[1])
+        with open(names[1], 'r') as f:
+            ciphertext = f.read()
+        with open(names[1], 'w') as f:
+            f.write('\n ' + ciphertext + ' \n' + ' ' * 20)
+        dave.decrypt_file(names[1], names[2])
+        with open(names[2], 'r') as f:
+            if f.read() != test_string:
+                raise ValueError('decrypt_file failed on a ciphertext surrounded by whitespace')
+        with open(names[1], 'w') as f:
+            f.write(ciphertext[:7] + ' ' + ciphertext[7:])
+        try:
+            dave.decrypt_file(names[1], names[2])
+            raise ValueError('decrypt_file accepted whitespace inside the ciphertext')
+        except InputError:
+            pass
+        for pad in (carol, dave):
+            pad.close()
+    print('Passed pad test!!')
+
+# Test that sharding across processes gives the same result as the serial methods
+def test_parallel(runs = 20, string_size = 100000):
+    for _ in range(runs):
+        keylen = random.randint(1, 26)
+        affine_key = Affine.generate_key()
+        ciphers = [Affine(affine_key[0], affine_key[1]),
+                   Caesar(Caesar.generate_key()),
+                   Hill(Hill.generate_key(random.randint(1, 5))),
+                   OTP(OTP.generate_key(string_size)),
+                   SimpleSubstitution(SimpleSubstitution.generate_key()),
+                   RectangularTransposition(RectangularTransposition.generate_key(keylen)),
+                   Vigenere(Vigenere.generate_key(keylen))]
+        test_string = random_string(random.randint(1, string_size))
+
+        for cipher in ciphers:
+            ciphertext = Parallel.encrypt(cipher, test_string, workers=3, threshold=0)
+            if ciphertext != cipher.encrypt(test_string):
+                raise ValueError(f'Failed on {test_string} with {cipher}, parallel ciphertext = {ciphertext}')
+
+            plaintext = Parallel.decrypt(cipher, ciphertext, workers=3, threshold=0)
+            if plaintext != cipher.decrypt(ciphertext):
+                raise ValueError(f'Failed on {ciphertext} with {cipher}, parallel plaintext = {plaintext}')
+
+    # Files are prepared a chunk at a time into shared memory, small chunks make the message span many of them
+    chunk = Parallel.FILE_CHUNK
+    Parallel.FILE_CHUNK = 1000
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            names = [os.path.join(directory, name) for name in ('plain.txt', 'cipher.txt', 'decrypted.txt')]
+            text = ENGLISH_TEXT[:string_size]
+            with open(names[0], 'w') as f:
+                f.write(text)
+            for cipher in ciphers:
+                Parallel.encrypt_file(cipher, names[0], names[1], workers=3, threshold=0)
+                with open(names[1], 'r') as f:
+                    ciphertext = f.read()
+                if ciphertext != cipher.encrypt(text):
+                    raise ValueError(f'encrypt_file with {cipher} gave {ciphertext[:100]}...')
+
+                with open(names[1], 'w') as f:
+                    f.write('\n ' + ciphertext + ' \n')
+                Parallel.decrypt_file(cipher, names[1], names[2], workers=3, threshold=0)
+                with open(names[2], 'r') as f:
+                    plaintext = f.read()
+                if plaintext != cipher.decrypt(ciphertext):
+                    raise ValueError(f'decrypt_file with {cipher} gave {plaintext[:100]}...')
+    finally:
+        Parallel.FILE_CHUNK = chunk
+
+    # A cipher must at least say how to transform a shard
+    try:
+        type('Unshardable', (Shard.Shardable,), {})()
+        raise ValueError('A Shardable without _transform should not be instantiable')
+    except TypeError:
+        pass
+    print('Passed parallel test!!')
+
+# Test that the frequency attacks recover the key of English-like texts
+def test_cryptanalysis(runs = 200, string_size = 500):
+    for _ in range(runs):
+        test_string = english_string(string_size)
+        shift = Caesar.generate_key()
+        a, b = Affine.generate_key()
+
+        for method in Cryptanalysis.METHODS:
+            ranking, plaintext = Cryptanalysis.break_caesar(Caesar(shift).encrypt(test_string), method)
+            if ranking[0][0] != shift or plaintext != test_string:
+                raise ValueError(f'Failed to break Caesar({shift}) with {method}, best keys = {ranking[:3]}')
+
+            ranking, plaintext = Cryptanalysis.break_affine(Affine(a, b).encrypt(test_string), method)
+            if ranking[0][0] != (a, b) or plaintext != test_string:
+                raise ValueError(f'Failed to break Affine({a}, {b}) with {method}, best keys = {ranking[:3]}')
+
+        test_string = english_string(string_size * 4)
+        key = Vigenere.generate_key(random.randint(1, 20))
+        recovered, plaintext = Cryptanalysis.break_vigenere(Vigenere(key).encrypt(test_string))
+        if plaintext != test_string: # keys like 'RR' and 'R' are equivalent
+            raise ValueError(f'Failed to break Vigenere({key}), recovered key = {recovered}')
+
+        # The known plaintext starts with dim blocks that are invertible mod 26 as a matrix, so they determine the key
+        dim = random.randint(1, 6)
+        key = Hill.generate_key(dim)
+        while True:
+            blocks = random_string(dim * dim)
+            try:
+                Hill(letter_values(blocks).reshape(dim, dim).tolist())
+                break
+            except InputError:
+                pass
+        test_string = blocks + random_string(dim * random.randint(0, 10))
+        if Cryptanalysis.hill_known_plaintext(test_string, Hill(key).encrypt(test_string), dim) != key:
+            raise ValueError(f'Failed to recover Hill({key}) from known plaintext {test_string}')
+
+        # Repeats of a single block (all A for dim 1) span too little to determine the key
+        test_string = (random_string(dim) if dim > 1 else 'A') * (dim + 10)
+        try:
+            Cryptanalysis.hill_known_plaintext(test_string, Hill(key).encrypt(test_string), dim)
+            raise ValueError(f'hill_known_plaintext accepted the repeated block {test_string}')
+        except InputError:
+            pass
+    print('Passed cryptanalysis test!!')
+
+# Test that the search based attacks recover excerpts of the sample text
+def test_solvers(runs = 5, string_size = 300):
+    quadgrams = Solvers.quadgram_table(ENGLISH_TEXT)
+    text = standard_encode(ENGLISH_TEXT)
+    for _ in range(runs):
+        start = random.randint(0, len(text) - string_size)
+        test_string = text[start:start + string_size]
+
+        key, plaintext = Solvers.break_substitution(SimpleSubstitution(SimpleSubstitution.generate_key()).encrypt(test_string), quadgrams, workers=2)
+        if plaintext != test_string:
+            raise ValueError(f'Failed to break SimpleSubstitution, recovered key = {key}, plaintext = {plaintext}')
+
+        key, plaintext = Solvers.break_hill(Hill(Hill.generate_key(2)).encrypt(test_string), quadgrams)
+        if plaintext != test_string:
+            raise ValueError(f'Failed to break Hill, recovered key = {key}, plaintext = {plaintext}')
+
+        for mode in ("rows", "columnar"):
+            cipher = RectangularTransposition(RectangularTransposition.generate_key(random.randint(2, 12)), mode)
+            ciphertext = cipher.encrypt(text[start:start + 2 * string_size])
+            key, plaintext = Solvers.break_transposition(ciphertext, quadgrams, mode)
+            if plaintext != cipher.decrypt(ciphertext) or RectangularTransposition(key, mode).encrypt(plaintext) != ciphertext:
+                raise ValueError(f'Failed to break RectangularTransposition in {mode} mode, recovered key = {key}, plaintext = {plaintext}')
+
+    # Playfair from scratch with the default settings, about 20 seconds on two workers. Annealing is stochastic and about one
+    # run in eight ends on a near miss, so one of a few attempts has to recover the plaintext
+    attempts = []
+    for _ in range(3):
+        start = random.randint(0, len(text) - 500)
+        cipher = Playfair(''.join(random.sample("ABCDEFGHIKLMNOPQRSTUVWXYZ", 25)))
+        ciphertext = cipher.encrypt(text[start:start + 500].replace('J', 'I'))
+        key, plaintext = Solvers.break_playfair(ciphertext, quadgrams, workers=2)
+        if plaintext == cipher.decrypt(ciphertext):
+            break
+        attempts.append((key, plaintext))
+    else:
+        raise ValueError(f'Failed to break Playfair in 3 attempts, recovered (key, plaintext) = {attempts}')
+    print('Passed solvers test!!')
+
+# Test that break_playfair resumes from a checkpoint a few swaps away from the key, and saves the square it finds
+def test_playfair_checkpoint(runs = 3, string_size = 300):
+    quadgrams = Solvers.quadgram_table(ENGLISH_TEXT)
+    text = standard_encode(ENGLISH_TEXT)
+    for _ in range(runs):
+        start = random.randint(0, len(text) - string_size)
+        square = random.sample("ABCDEFGHIKLMNOPQRSTUVWXYZ", 25)
+        cipher = Playfair(''.join(square))
+        ciphertext = cipher.encrypt(text[start:start + string_size].replace('J', 'I'))
+        for _ in range(2):
+            i, j = random.sample(range(25), 2)
+            square[i], square[j] = square[j], square[i]
+
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = os.path.join(directory, 'playfair.checkpoint')
+            with open(checkpoint, 'w') as f:
+                f.write(''.join(square) + '\n')
+
+            key, plaintext = Solvers.break_playfair(ciphertext, quadgrams, chains=4, iterations=10000, workers=2, checkpoint=checkpoint)
+            with open(checkpoint, 'r') as f:
+                saved = f.readline().strip()
+        if plaintext != cipher.decrypt(ciphertext) or saved != key:
+            raise ValueError(f'Failed to resume Playfair, recovered key = {key}, plaintext = {plaintext}')
+    print('Passed Playfair checkpoint test!!')
                 
+def test_ngrams(runs = 50, string_size = 100):
+    quadgrams = Solvers.quadgram_table(ENGLISH_TEXT)
+    text = standard_encode(ENGLISH_TEXT)
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'english.ngrams')
+        NGrams.build(ENGLISH_TEXT, filename)
+        store = NGrams.NGramStore(filename)
+
+        if not (store.table(4) == quadgrams).all() or store.letters != len(text):
+            raise ValueError('The stored quadgram table does not match Solvers.quadgram_table')
+
+        texts = []
+        for _ in range(runs):
+            start = random.randint(0, len(text) - string_size)
+            texts.append(text[start:start + random.randint(0, string_size)])
+        scores = store.score_many(texts, 3)
+        for test_string, score in zip(texts, scores):
+            expected = store.score(test_string, 3)
+            if abs(score - expected) > 1e-6 * max(abs(expected), 1):
+                raise ValueError(f'score_many gave {score} for {test_string}, score gave {expected}')
+
+        # Counting in random chunks, or in separate counters that are merged, gives the counts of the whole text
+        split = random.randint(0, len(ENGLISH_TEXT))
+        first, second = NGrams.NGramCounter(), NGrams.NGramCounter()
+        for part, counter in ((ENGLISH_TEXT[:split], first), (ENGLISH_TEXT[split:], second)):
+            i = 0
+            while i < len(part):
+                size = random.randint(0, 10)
+                counter.update(part[i:i + size])
+                i += size
+        merged = first + second
+        values = NGrams.text_values(ENGLISH_TEXT)
+        joined = len(NGrams.text_values(ENGLISH_TEXT[:split]))
+        for n in range(1, NGrams.MAX_N + 1):
+            expected = np.bincount(NGrams.ngram_codes(values, n), minlength=26 ** n)
+            for code in NGrams.ngram_codes(values[max(joined - n + 1, 0):joined + n - 1], n): # the n-grams across the split
+                expected[code] -= 1
+            if (merged.counts(n) != expected).any() or merged.letters != len(values):
+                raise ValueError(f'Merged {n}-gram counts do not match the counts of the text, split at {split}')
+
+        first.merge(second).update('')
+        first.save(os.path.join(directory, 'merged.ngrams'))
+        if (NGrams.NGramStore(os.path.join(directory, 'merged.ngrams')).table(1) != NGrams.log_probabilities(merged.counts(1))).any():
+            raise ValueError('The saved monogram table does not match the counts')
+
+        # The solvers' workers map the store's file instead of copying the table
+        test_string = texts[0] + text[:300]
+        key, plaintext = Solvers.break_substitution(SimpleSubstitution(SimpleSubstitution.generate_key()).encrypt(test_string), store.table(4), workers=2)
+        if plaintext != test_string:
+            raise ValueError(f'Failed to break SimpleSubstitution with a stored table, recovered key = {key}, plaintext = {plaintext}')
+        del store
+    print('Passed n-gram store test!!')
+
+# Test that the classifier tells the ciphers apart on excerpts of the sample text, and breaks the quick ones
+def test_classifier(runs = 20, string_size = 500):
+    quadgrams = Solvers.quadgram_table(ENGLISH_TEXT)
+    text = standard_encode(ENGLISH_TEXT)
+    ciphertexts, labels = [], []
+    for _ in range(runs):
+        start = random.randint(0, len(text) - string_size)
+        test_string = text[start:start + string_size]
+        ciphers = [Caesar(random.randint(1, 25)), # shift 0 leaves English, like a transposition
+                   Affine(random.choice([3, 5, 7, 9, 11, 15, 17, 19, 21, 23, 25]), random.randint(0, 25)), # a = 1 is a Caesar shift
+                   SimpleSubstitution(SimpleSubstitution.generate_key()),
+                   Vigenere(Vigenere.generate_key(random.randint(2, 8))),
+                   OTP(OTP.generate_key(string_size)),
+                   Hill(Hill.generate_key(2)),
+                   Playfair(Playfair.generate_key(10)),
+                   RectangularTransposition(RectangularTransposition.generate_key(random.randint(2, 12)), random.choice(["rows", "columnar"]))]
+        for cipher in ciphers:
+            ciphertexts.append(cipher.encrypt(test_string))
+            labels.append(type(cipher).__name__)
+
+    guesses = Classifier.classify(ciphertexts)
+    wrong = [(label, guess) for label, guess in zip(labels, guesses) if label != guess]
+    if len(wrong) > len(labels) // 20:
+        raise ValueError(f'Misclassified {len(wrong)} of {len(labels)} ciphertexts: {wrong}')
+
+    # The batches sort the texts by length, the rows still follow the order of the ciphertexts
+    mixed = [ciphertext[:random.randint(1, len(ciphertext))] for ciphertext in ciphertexts]
+    batch_letters, Classifier.BATCH_LETTERS = Classifier.BATCH_LETTERS, 1000
+    try:
+        batched = Classifier.features(mixed)
+    finally:
+        Classifier.BATCH_LETTERS = batch_letters
+    if not np.allclose(batched, np.concatenate([Classifier.features([ciphertext]) for ciphertext in mixed])):
+        raise ValueError('The features of a batch should match the features of its texts one at a time')
+
+    # The quick attacks, on the last excerpt
+    for i in (0, 3, 7):
+        cipher, key, plaintext = Classifier.break_ciphertext(ciphertexts[i - 8], quadgrams, labels[i - 8])
+        if plaintext != ciphers[i].decrypt(ciphertexts[i - 8]):
+            raise ValueError(f'Failed to break {cipher}, recovered key = {key}, plaintext = {plaintext}')
+
+    # break_hill only searches 2x2 keys, a 3x3 Hill ciphertext is classified but not attacked
+    ciphertext = Hill(Hill.generate_key(3)).encrypt(text[:3 * string_size])
+    if Classifier.break_ciphertexts([ciphertext], quadgrams) != [("Hill", None, None)]:
+        raise ValueError('A 3x3 Hill ciphertext should be classified as Hill and left unbroken')
+    print('Passed classifier test!!')
+
+# Test crib dragging on two excerpts of the sample text encrypted with the same OTP key
+def test_two_time_pad(runs = 20, string_size = 300):
+    quadgrams = Solvers.quadgram_table(ENGLISH_TEXT)
+    text = standard_encode(ENGLISH_TEXT)
+    words = sorted(set(standard_encode(word) for word in ENGLISH_TEXT.split()) - {''})
+    index = TwoTimePad.CribIndex(words)
+    dictionary = set(words)
+    for _ in range(runs):
+        first, second = random.sample(range(len(text) - string_size), 2)
+        plaintexts = [text[first:first + string_size], text[second:second + string_size]]
+        cipher = OTP(OTP.generate_key(string_size))
+        ciphertexts = [cipher.encrypt(plaintext) for plaintext in plaintexts]
+        differences = {(0, 1): TwoTimePad.difference(*ciphertexts), (1, 0): TwoTimePad.difference(*ciphertexts[::-1])}
+
+        results = TwoTimePad.drag_pairs(ciphertexts, words, quadgrams, top=10)
+        for score, i, j, offset, crib, fragment in results:
+            if TwoTimePad.difference(crib, fragment) != differences[i, j][offset:offset + len(crib)]:
+                raise ValueError(f'{crib} at {offset} of plaintext {i} cannot give {fragment}')
+        if not any(plaintexts[i][offset:offset + len(crib)] == crib for _, i, _, offset, crib, _ in results):
+            raise ValueError(f'No crib among the best results is in place: {results}')
+
+        # The trie walk of a CribIndex ranks like sliding every crib (results tied with the last one may be swapped)
+        indexed = TwoTimePad.drag_pairs(ciphertexts, index, quadgrams, top=10)
+        untied = lambda ranking: [result for result in ranking if result[0] > ranking[-1][0]]
+        if [result[0] for result in indexed] != [result[0] for result in results] or untied(indexed) != untied(results):
+            raise ValueError(f'Dragging through the CribIndex gave {indexed}, sliding the cribs gave {results}')
+
+        expected = sorted((offset, plaintexts[0][offset:offset + length], plaintexts[1][offset:offset + length])
+                          for length in range(TwoTimePad.MIN_WORD_LENGTH, 30) for offset in range(string_size - length + 1)
+                          if {plaintexts[0][offset:offset + length], plaintexts[1][offset:offset + length]} <= dictionary)
+        found = index.matches(differences[0, 1])
+        if not set(expected) <= set(found) or any(TwoTimePad.difference(word1, word2) != differences[0, 1][offset:offset + len(word1)] for offset, word1, word2 in found):
+            raise ValueError(f'CribIndex found {found}, expected at least {expected}')
+    print('Passed two time pad test!!')
+
+def test_primes(runs = 200, large_runs = 3):
+    for _ in range(runs):
+        bits = random.randint(2, 24)
+        prime = Primes.generate_prime(bits)
+        if prime.bit_length() != bits or any(prime % divisor == 0 for divisor in range(2, math.isqrt(prime) + 1)):
+            raise ValueError(f'generate_prime({bits}) gave {prime}')
+    for bits in (512, 1024):
+        for _ in range(large_runs):
+            prime = Primes.generate_prime(bits)
+            if prime.bit_length() != bits or not Primes.isPrime(prime) or any(prime % int(p) == 0 for p in Primes.SMALL_PRIMES):
+                raise ValueError(f'generate_prime({bits}) gave {prime}')
+            for method in Primes.PRIMALITY_METHODS:
+                if not Primes.isPrime(prime, method=method) or Primes.isPrime(prime * test_p, method=method):
+                    raise ValueError(f'isPrime with {method} failed on {prime}')
+
+    for workers in (1, 2):
+        primes, stats = Primes.generate_primes(512, 3, workers=workers)
+        if len(set(primes)) != 3 or any(prime.bit_length() != 512 or not Primes.isPrime(prime) for prime in primes) or sum(worker['primes'] for worker in stats) < 3:
+            raise ValueError(f'generate_primes gave {primes} with {stats}')
+        failures = 0
+        for _ in range(5):
+            try:
+                Primes.generate_primes(2048, 2, workers=workers, tries=1)
+            except SearchError as error:
+                failures += 1
+                if sum(worker['candidates'] for worker in error.stats) != 1:
+                    raise ValueError(f'generate_primes went over its tries: {error.stats}')
+        if not failures:
+            raise ValueError('generate_primes found 2 primes in 1 try')
+    try:
+        Primes.generate_prime(4096, timeout=0.01)
+        raise ValueError('generate_prime did not time out')
+    except SearchError:
+        pass
+
+    for bits, q_bits in ((64, None), (256, None), (512, 160), (1024, 256)):
+        p, q, g = Primes.generate_group(bits, q_bits)
+        if p.bit_length() != bits or not Primes.isPrime(p) or not Primes.isPrime(q) or q.bit_length() != (q_bits or bits - 1) or not Primes.is_generator(g, p, q):
+            raise ValueError(f'generate_group({bits}, {q_bits}) gave {p, q, g}')
+        if q_bits is None and (p != 2 * q + 1 or Primes.find_primitive_root(p) != Primes.find_primitive_root(p, [2, q])):
+            raise ValueError(f'{p} is not a safe prime')
+
+    for _ in range(runs):
+        n = random.randint(1, 10 ** random.randint(1, 10)) * random.choice([1, Primes.generate_prime(random.randint(64, 256))])
+        factors = Primes.factor(n)
+        if math.prod(prime ** power for prime, power in factors.items()) != n or not all(Primes.isPrime(prime) for prime in factors):
+            raise ValueError(f'factor({n}) gave {factors}')
+    if Primes.factor(2 ** 64 + 1) != {274177: 1, 67280421310721: 1} or Primes.factor(1) != {}:
+        raise ValueError('factor failed on a known factorization')
+
+    q1, q2 = Primes.generate_primes(128, 2)[0] # p - 1 = k * q1 * q2 is beyond factor, its factors are given instead
+    k = next(k for k in range(2, 10 ** 6, 2) if Primes.isPrime(k * q1 * q2 + 1))
+    p = k * q1 * q2 + 1
+    Primes.remember_factors(p, Primes.prime_factors(k) + [q1, q2])
+    if not Primes.is_primitive_root(Primes.find_primitive_root(p), p):
+        raise ValueError(f'find_primitive_root failed on {p}')
+    try:
+        Primes.remember_factors(p, [2, q1])
+        raise ValueError('remember_factors took an incomplete factorization')
+    except InputError:
+        pass
+
+    sieve = [False, False] + [all(n % divisor for divisor in range(2, math.isqrt(n) + 1)) for n in range(2, 20000)]
+    for n in list(range(20000)) + random.sample(range(Primes.SIEVE_LIMIT, 10 ** 6), runs):
+        if Primes.isPrime(n) != (sieve[n] if n < 20000 else all(n % divisor for divisor in range(2, math.isqrt(n) + 1))):
+            raise ValueError(f'isPrime is wrong about {n}')
+    # strong pseudoprimes to the first 1, 4, 8 and 12 prime bases, and the first strong Lucas pseudoprimes
+    for n in (2047, 3215031751, 341550071728321, 318665857834031151167461, 3317044064679887385961981, 5459, 5777, 10877):
+        if Primes.isPrime(n):
+            raise ValueError(f'isPrime passed the composite {n}')
+    print('Passed primes test!!')
+
 def test_RSA_EG(runs = 200, string_size=50):
 
     keys = [RSA.RSA_key([test_p, test_q]),
-            ElGamal.ElGamal_Key(p=test_p, g=test_g)]
+            ElGamal.ElGamal_Key(p=test_p, g=test_g),
+            ElGamal.ElGamal_Key(*ElGamal.generate_group_seed(1024, 160))]
     
     for _ in range(runs):
         test_string = random_string(string_size)
@@ -69,36 +618,51 @@ def test_RSA_EG(runs = 200, string_size=50):
         if test_string != plaintext:
             raise ValueError(f'Failed on {test_string} with RSA, ciphertext = {ciphertext}, decrypted plaintext = {plaintext}')
 
-        ciphertext = ElGamal.encrypt(test_string, keys[1])
-        plaintext = ElGamal.decrypt(ciphertext, keys[1])
+        for key in keys[1:]:
+            ciphertext = ElGamal.encrypt(test_string, key)
+            plaintext = ElGamal.decrypt(ciphertext, key)
 
-        if test_string != plaintext:
-            raise ValueError(f'Failed on {test_string} with RSA, ciphertext = {ciphertext}, decrypted plaintext = {plaintext}')
+            if test_string != plaintext:
+                raise ValueError(f'Failed on {test_string} with RSA, ciphertext = {ciphertext}, decrypted plaintext = {plaintext}')
 
         print('Passed run!!!')
 
 
 def test_DH(runs = 200): # Keep string_size fixed for this test, there isn't much tolerance because of prime bit sizes
 
-    alice = DH.DH(g=test_g, p = test_p)
-    bob = DH.DH(g=test_g, p = test_p)
+    group = DH.DH.generate_group(1024, 160)
+    pairs = [(DH.DH(g=test_g, p = test_p), DH.DH(g=test_g, p = test_p)), (DH.DH(*group), DH.DH(*group))]
     
     for _ in range(runs):
         
-        bob_comp = bob.send_component()
-        alice_comp = alice.send_component()
+        for alice, bob in pairs:
+            bob_comp = bob.send_component()
+            alice_comp = alice.send_component()
 
-        alice_secret = alice.get_secret(bob_comp)
-        bob_secret = bob.get_secret(alice_comp)
+            alice_secret = alice.get_secret(bob_comp)
+            bob_secret = bob.get_secret(alice_comp)
 
-        if alice_secret != bob_secret:
-            raise ValueError(f'Failed!')
+            if alice_secret != bob_secret:
+                raise ValueError(f'Failed!')
 
-        alice.change_private_param()
-        bob.change_private_param()
+            alice.change_private_param()
+            bob.change_private_param()
 
         print('Passed Run!!!')
 
-test_DH()
-test_RSA_EG()
-test_classical()
+if __name__ == '__main__': # worker processes of the parallel test may import this file
+    test_DH()
+    test_RSA_EG()
+    test_classical()
+    test_binary()
+    test_hill_large_keys()
+    test_streaming()
+    test_otp_pad()
+    test_parallel()
+    test_cryptanalysis()
+    test_solvers()
+    test_playfair_checkpoint()
+    test_ngrams()
+    test_classifier()
+    test_two_time_pad()
+    test_primes()